@@ -27,6 +27,7 @@ SlackAppOAuthConstructsStack(
     app,
     id=f"{app_name}-SlackChatAppSharing",
     oauth_table=app_stack.oauth_table,
+    access_control_table=app_stack.access_control_table,
     settings=stage_settings,
     env=Environment(account=stage_settings["account"], region=stage_settings["region"]),
 )
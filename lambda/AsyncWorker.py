@@ -1,66 +1,184 @@
 """
 For processing requests that will take longer than 3 seconds to process.
+The command matching the text is run through the command registry (see command_registry.py).
+
+Invoked either directly with one payload (`Event` invocation) or, in queue mode, with batches of
+payloads from SQS. Neither the retries of an Event invocation nor SQS send a message again after
+an error that may have come once it was posted, e.g. a read timeout.
+
+The Slack calls give up before the function times out. In queue mode a message waits at most
+`QUEUE_TIME_LIMIT_SECONDS` for the rate limit or Slack, then it is returned as a batch item failure
+and retried by SQS.
 """
-import json
-import logging
+import functools
 import os
-from urllib.parse import urlencode
+import time
 
 import boto3
 import urllib3
+from command_registry import registry
+from metrics import Metrics
+from priming import prime, warm_connection
+from profiling import Profiler
+from rate_limiter import RateLimiter
+from slack_client import INVALID_TOKEN_ERRORS, SlackClient, response_outcome
+from structured_logging import StructuredLogger
+from token_cache import BotTokenCache
+from tracing import Tracer
+from warmup import is_warmup_event, warmup_response
+from work_queue import is_sqs_event, process_batch
 
-logging.getLogger().setLevel(logging.INFO)
-
-SLACK_API_CHAT_POST_URL = "https://slack.com/api/chat.postMessage"
 OAUTH_DDB_TABLE_NAME = os.environ.get("OAuthDynamoDBTable")
+RATE_LIMIT_DDB_TABLE_NAME = os.environ.get("RateLimitDynamoDBTable")
+SLACK_APP_ID = os.environ.get("SlackAppId")
+SLACK_APP_OWNER_TEAM_ID = os.environ.get("SlackAppOwnerTeamId")
+TIME_MARGIN_SECONDS = 1.0  # Kept to finish the invocation after the Slack calls give up
+QUEUE_TIME_LIMIT_SECONDS = 3.0
 
-oauth_table = boto3.resource(
-    "dynamodb", region_name=os.environ.get("AWS_REGION", "ap-southeast-2")
-).Table(OAUTH_DDB_TABLE_NAME)
-http = urllib3.PoolManager()
+log = StructuredLogger("AsyncWorker")
+metrics = Metrics("AsyncWorker")
+tracer = Tracer("AsyncWorker")
+profiler = Profiler("AsyncWorker")
+dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "ap-southeast-2"))
+oauth_table = dynamodb.Table(OAUTH_DDB_TABLE_NAME)
+token_cache = BotTokenCache(oauth_table)
+slack_client = SlackClient(
+    rate_limiter=RateLimiter(
+        dynamodb.Table(RATE_LIMIT_DDB_TABLE_NAME) if RATE_LIMIT_DDB_TABLE_NAME else None
+    )
+)
 
 
+@metrics.timed("get_bot_token", outcome=lambda token: "ok" if token else "missing")
+@tracer.traced("get_bot_token")
 def get_bot_token(app_id, team_id):
     try:
-        return oauth_table.get_item(Key={"app_id": app_id, "team_id": team_id})["Item"][
-            "access_token"
-        ]
+        return token_cache.get(app_id, team_id)
     except Exception as e:
-        logging.error(e)
+        log.error("Bot token lookup failed: %s", e, team_id=team_id)
 
 
-def call_slack_chat_post(channel_id, thread_ts, bot_token, response_text):
-    data = urlencode(
-        (
-            ("token", bot_token),
-            ("channel", channel_id),
-            ("thread_ts", thread_ts),
-            ("text", response_text),
-        )
-    ).encode("ascii")
-    resp = http.request(
-        "POST",
-        SLACK_API_CHAT_POST_URL,
-        body=data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
+@metrics.timed("call_slack_chat_post", outcome=response_outcome)
+@tracer.traced("call_slack_chat_post")
+def call_slack_chat_post(
+    channel_id, thread_ts, bot_token, response_text, team_id=None, time_limit_seconds=None
+):
+    resp = slack_client.chat_post_message(
+        bot_token,
+        channel_id,
+        response_text,
+        thread_ts=thread_ts,
+        team_id=team_id,
+        time_limit_seconds=time_limit_seconds,
     )
-    logging.info(resp.read())
+    if not resp.ok:
+        log.error("Failed to post message: %s", resp, team_id=team_id)
+    return resp
 
 
-def lambda_handler(event, context):
-    logging.info(json.dumps(event, indent=2))
+def invocation_deadline(context):
+    """Monotonic time by which the Slack calls must give up, or None without a Lambda context"""
+    if context is None:
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - TIME_MARGIN_SECONDS
 
+
+def time_left(deadline, limit=None):
+    """Seconds left until the deadline, at most `limit`; None if neither is set"""
+    limits = [] if limit is None else [limit]
+    if deadline is not None:
+        limits.append(deadline - time.monotonic())
+    return min(limits) if limits else None
+
+
+def process_request(event, time_limit_seconds=None):
     app_id = event["app_id"]
     channel_id = event["channel_id"]
     team_id = event["team_id"]
-    text_msg = event.get("text")
     thread_ts = event["ts"]
-    user_id = event["user_id"]
 
-    message = f"AsyncWorker: <@{user_id}> said `{text_msg}`"
-    logging.info(message)
-    call_slack_chat_post(channel_id, thread_ts, get_bot_token(app_id, team_id), message)
+    # Continue the trace of ImmediateResponse, and its debug override
+    tracer.start_trace(event.get("trace_id"), event.get("span_id"))
+    log.begin_request(debug=event.get("debug", False), trace_id=tracer.trace_id)
+    with tracer.span("process_request", team_id=team_id):
+        # A reply deferred by ImmediateResponse in ack-first mode is posted as is
+        message = event.get("reply")
+        if not message:
+            with tracer.span("command"):
+                message = f"AsyncWorker: {registry.dispatch(event)}"
+        log.debug("Reply", text=message)
+        resp = call_slack_chat_post(
+            channel_id,
+            thread_ts,
+            get_bot_token(app_id, team_id),
+            message,
+            team_id=team_id,
+            time_limit_seconds=time_limit_seconds,
+        )
+    metrics.count("requests", team_id, response_outcome(resp))
+    if resp is not None and resp.error in INVALID_TOKEN_ERRORS:
+        # The app may have been re-installed with a new token, so re-read it next time
+        token_cache.invalidate(app_id, team_id)
+    return resp
+
+
+def process_at_most_once(event, time_limit_seconds=None):
+    """
+    Process a request, raising only errors after which the message was surely not posted, so that
+    a retry of the invocation or of the queue message cannot post it twice
+    """
+    try:
+        return process_request(event, time_limit_seconds)
+    except urllib3.exceptions.HTTPError as e:
+        if isinstance(e, urllib3.exceptions.ConnectTimeoutError):
+            raise
+        log.error("Not retrying a message that may have been posted: %s", e)
+
+
+def process_queued_request(payload, deadline=None):
+    """Process one message of a queue batch; raise to have the message retried"""
+    time_limit_seconds = time_left(deadline, QUEUE_TIME_LIMIT_SECONDS)
+    if time_limit_seconds <= 0:
+        raise RuntimeError("Out of time for the rest of the batch")
+    resp = process_at_most_once(payload, time_limit_seconds)
+    # Only retried when Slack did not post it, see slack_client.NON_IDEMPOTENT_METHODS
+    if resp is not None and resp.error == "ratelimited":
+        raise RuntimeError(f"Retryable Slack API error: {resp}")
+
+
+@metrics.flush_after
+@tracer.flush_after
+@log.scoped
+@profiler.profiled
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(event)
+
+    log.begin_request()
+    log.debug("Received event", event=event)
+
+    deadline = invocation_deadline(context)
+    if is_sqs_event(event):
+        # Queue mode, token lookups and HTTP connections are shared across the batch
+        return process_batch(event, functools.partial(process_queued_request, deadline=deadline))
+
+    # Lambda retries a failed Event invocation
+    process_at_most_once(event, time_left(deadline))
 
     return {
         "statusCode": 200,
     }
+
+
+# Opt-in priming during INIT (InitPriming=true), see priming.py
+prime(
+    [
+        ("slack_connection", lambda: warm_connection(slack_client.http, slack_client.base_url)),
+        (
+            "owner_bot_token",
+            (lambda: token_cache.get(SLACK_APP_ID, SLACK_APP_OWNER_TEAM_ID))
+            if SLACK_APP_ID and SLACK_APP_OWNER_TEAM_ID
+            else None,
+        ),
+    ]
+)
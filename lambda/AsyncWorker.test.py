@@ -1,17 +1,30 @@
 """
 Unit tests for AsyncWorker.py
 """
+import json
 import os
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+import urllib3
 
 os.environ["OAuthDynamoDBTable"] = "DummyDDB"
 
 func = __import__("AsyncWorker")
+work_queue = __import__("work_queue")
+
+
+class MockContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
 
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
 
-def mock_event(text_value=""):
+
+def mock_event(text_value="", **kwargs):
     return {
+        **kwargs,
         "app_id": "APIID123456",
         "channel_id": "C1111111111",
         "team_id": "T1111111111",
@@ -22,6 +35,9 @@ def mock_event(text_value=""):
 
 
 class TestFunction(unittest.TestCase):
+    def setUp(self):
+        func.token_cache.clear()
+
     def test_lambda_handler(self):
         with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
             "AsyncWorker.call_slack_chat_post"
@@ -34,7 +50,178 @@ class TestFunction(unittest.TestCase):
                 "1634873264.005100",
                 "dummy-bot-token",
                 "AsyncWorker: <@test_user_id> said `async`",
+                team_id="T1111111111",
+                time_limit_seconds=None,
+            )
+            self.assertEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_time_limit(self):
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            func.lambda_handler(mock_event(text_value="async"), MockContext(60000))
+
+            # The Slack call gives up before the function times out
+            time_limit_seconds = mock_post.call_args.kwargs["time_limit_seconds"]
+            self.assertLessEqual(time_limit_seconds, 60 - func.TIME_MARGIN_SECONDS)
+            self.assertGreater(time_limit_seconds, 55)
+
+    def test_lambda_handler_continues_trace(self):
+        exported = []
+        with patch.object(func.tracer.exporter, "export", exported.append), patch(
+            "AsyncWorker.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch("AsyncWorker.call_slack_chat_post"):
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            func.lambda_handler(
+                mock_event(
+                    text_value="async",
+                    trace_id="0af7651916cd43dd8448eb211c80319c",
+                    span_id="b7ad6b7169203331",
+                ),
+                None,
+            )
+
+            spans = {span.name: span for span in exported[0]}
+            self.assertEqual(set(spans), {"process_request", "command", "get_bot_token"})
+            self.assertEqual(spans["process_request"].parent_span_id, "b7ad6b7169203331")
+            self.assertEqual(spans["command"].parent_span_id, spans["process_request"].span_id)
+            self.assertTrue(
+                all(span.trace_id == "0af7651916cd43dd8448eb211c80319c" for span in exported[0])
+            )
+
+    def test_lambda_handler_deferred_reply(self):
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            ret = func.lambda_handler(mock_event(reply="Hello <@test_user_id>!"), None)
+            mock_post.assert_called_once_with(
+                "C1111111111",
+                "1634873264.005100",
+                "dummy-bot-token",
+                "Hello <@test_user_id>!",
+                team_id="T1111111111",
+                time_limit_seconds=None,
+            )
+            self.assertEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_invalid_token(self):
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_post.return_value = MagicMock(error="token_revoked")
+
+            func.lambda_handler(mock_event(text_value="async"), None)
+            func.lambda_handler(mock_event(text_value="async"), None)
+
+            # The revoked token is not served from the cache again
+            self.assertEqual(mock_ddb_get_item.call_count, 2)
+
+    def test_lambda_handler_not_retried_when_maybe_posted(self):
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            # The message may have been posted, so the invocation succeeds and is not retried
+            for error in [
+                urllib3.exceptions.ReadTimeoutError(None, "/api/chat.postMessage", "Read timed out"),
+                urllib3.exceptions.ProtocolError("Connection aborted."),
+            ]:
+                mock_post.side_effect = error
+                ret = func.lambda_handler(mock_event(text_value="async"), None)
+                self.assertEqual(ret, {"statusCode": 200})
+
+            # Not sent at all, so the invocation fails and Lambda retries it
+            mock_post.side_effect = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+            with self.assertRaises(urllib3.exceptions.NewConnectionError):
+                func.lambda_handler(mock_event(text_value="async"), None)
+
+    def test_lambda_handler_queue_batch(self):
+        queue = work_queue.LocalQueue()
+        for text_value in ["first", "second", "third"]:
+            queue.send_message(QueueUrl="local", MessageBody=json.dumps(mock_event(text_value)))
+
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_post.side_effect = [
+                MagicMock(error=None, status=200),
+                MagicMock(error="ratelimited", status=429),
+                MagicMock(error=None, status=200),
+            ]
+
+            event = queue.receive_event(batch_size=10)
+            ret = func.lambda_handler(event, None)
+
+            # One token lookup for the whole batch, only the rate limited message is retried
+            mock_ddb_get_item.assert_called_once()
+            self.assertEqual(mock_post.call_count, 3)
+            self.assertEqual(
+                ret, {"batchItemFailures": [{"itemIdentifier": event["Records"][1]["messageId"]}]}
+            )
+
+    def test_lambda_handler_queue_batch_not_retried_when_maybe_posted(self):
+        queue = work_queue.LocalQueue()
+        for text_value in ["first", "second", "third"]:
+            queue.send_message(QueueUrl="local", MessageBody=json.dumps(mock_event(text_value)))
+
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_post.side_effect = [
+                urllib3.exceptions.ReadTimeoutError(None, "/api/chat.postMessage", "Read timed out"),
+                MagicMock(error="internal_error", status=500),
+                urllib3.exceptions.NewConnectionError(None, "Connection refused"),
+            ]
+
+            event = queue.receive_event(batch_size=10)
+            ret = func.lambda_handler(event, None)
+
+            # Only the message that was surely not sent is retried
+            self.assertEqual(
+                ret, {"batchItemFailures": [{"itemIdentifier": event["Records"][2]["messageId"]}]}
             )
+
+    def test_lambda_handler_queue_batch_time_limit(self):
+        queue = work_queue.LocalQueue()
+        for text_value in ["first", "second"]:
+            queue.send_message(QueueUrl="local", MessageBody=json.dumps(mock_event(text_value)))
+
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_post.return_value = MagicMock(error=None, status=200)
+
+            event = queue.receive_event(batch_size=10)
+            ret = func.lambda_handler(event, MockContext(60000))
+            self.assertEqual(ret, {"batchItemFailures": []})
+            # A message does not wait long for the rate limit, SQS retries it instead
+            self.assertEqual(
+                mock_post.call_args.kwargs["time_limit_seconds"], func.QUEUE_TIME_LIMIT_SECONDS
+            )
+
+            # Messages left when the invocation is about to time out are not attempted
+            mock_post.reset_mock()
+            ret = func.lambda_handler(event, MockContext(func.TIME_MARGIN_SECONDS * 1000))
+            mock_post.assert_not_called()
+            self.assertEqual(len(ret["batchItemFailures"]), 2)
+
+    def test_lambda_handler_warmup(self):
+        with patch("AsyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "AsyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            ret = func.lambda_handler({"source": "slack-chat-app.warmup"}, None)
+            mock_ddb_get_item.assert_not_called()
+            mock_post.assert_not_called()
             self.assertEqual(ret, {"statusCode": 200})
 
 
@@ -3,51 +3,171 @@ ImmediateResponse aims to do
 - authentication and authorization,
 - invoke AsyncWorker or SyncWorker
 - return an immedate response to caller within 3 seconds
+
+In ack-first mode (`AckFirst=true`) only cheap checks run inline; the bot token lookup and any
+replies to the user (greetings, authentication/authorization errors) are handed to AsyncWorker.
+
+Otherwise sync-capable requests (see request_router.py) are run by SyncWorker with a
+`RequestResponse` invoke, or in this container when `SyncWorkerInProcess=true` and they fit the budget.
+
+Each request is traced (see tracing.py), and the workers continue the trace from their payload.
 """
+import base64
+import importlib
 import json
-import logging
 import os
-from urllib.parse import urlencode
 
 import boto3
-import urllib3
+from access_control import AccessControl
+from botocore.config import Config
+from event_dedup import EventDeduplicator
+from metrics import Metrics
+from priming import prime, warm_connection
+from profiling import Profiler
+from rate_limiter import RateLimiter
+from request_budget import DEFAULT_SAFETY_MARGIN_MS, SLACK_ACK_DEADLINE_MS, RequestBudget
+from request_router import SYNC, classify
+from secrets_cache import SecretsCache
+from slack_client import INVALID_TOKEN_ERRORS, SlackClient, response_outcome
+from slack_signature import verify_signature
+from structured_logging import StructuredLogger
+from token_cache import BotTokenCache
+from tracing import Tracer
+from warmup import is_warmup_event, warmup_response
 
-logging.getLogger().setLevel(logging.INFO)
-
-SLACK_API_CHAT_POST_URL = "https://slack.com/api/chat.postMessage"
 SLACK_APP_ID = os.environ.get("SlackAppId")
+SLACK_APP_OWNER_TEAM_ID = os.environ.get("SlackAppOwnerTeamId")
 SLACK_CHANNEL_IDS = list(map(str.strip, os.environ.get("SlackChannelIds", "").split(",")))
 SLACK_TEAM_IDS = list(map(str.strip, os.environ.get("SlackTeamIds", "").split(",")))
 SLACK_VERIFICATION_TOKEN_SSM_PARAMETER_KEY = os.environ.get("SlackVerificationTokenParameterKey")
+SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY = os.environ.get("SlackSigningSecretParameterKey")
 
 CHILD_ASYNC_FUNCTION_NAME = os.environ.get("AsyncWorkerLambdaFunctionName")
 CHILD_SYNC_FUNCTION_NAME = os.environ.get("SyncWorkerLambdaFunctionName")
+# Queue mode: AsyncWorker payloads are enqueued to SQS and consumed in batches
+ASYNC_WORKER_QUEUE_URL = os.environ.get("AsyncWorkerQueueUrl")
 OAUTH_DDB_TABLE_NAME = os.environ.get("OAuthDynamoDBTable")
+EVENT_DEDUP_DDB_TABLE_NAME = os.environ.get("EventDedupDynamoDBTable")
+RATE_LIMIT_DDB_TABLE_NAME = os.environ.get("RateLimitDynamoDBTable")
+ACCESS_CONTROL_DDB_TABLE_NAME = os.environ.get("AccessControlDynamoDBTable")
+
+# Only run cheap checks before acknowledging; token lookup and replies are done by AsyncWorker
+ACK_FIRST = os.environ.get("AckFirst") == "true"
+# Run sync-capable requests by calling SyncWorker.lambda_handler in this container when they fit
+SYNC_WORKER_IN_PROCESS = os.environ.get("SyncWorkerInProcess") == "true"
 
 IS_AWS_SAM_LOCAL = os.environ.get("AWS_SAM_LOCAL") == "true"
 TARGET_REGION = os.environ.get("AWS_REGION", "ap-southeast-2")
 
+log = StructuredLogger("ImmediateResponse")
+metrics = Metrics("ImmediateResponse")
+tracer = Tracer("ImmediateResponse")
+profiler = Profiler("ImmediateResponse")
 lambda_client = boto3.client("lambda", region_name=TARGET_REGION)
-oauth_table = boto3.resource("dynamodb", region_name=TARGET_REGION).Table(OAUTH_DDB_TABLE_NAME)
+# RequestResponse invokes of SyncWorker: a single attempt, bounded by the budget of a whole request
+sync_lambda_client = boto3.client(
+    "lambda",
+    region_name=TARGET_REGION,
+    config=Config(
+        connect_timeout=1,
+        read_timeout=(SLACK_ACK_DEADLINE_MS - DEFAULT_SAFETY_MARGIN_MS) / 1000,
+        retries={"max_attempts": 0},
+    ),
+)
+sqs_client = boto3.client("sqs", region_name=TARGET_REGION) if ASYNC_WORKER_QUEUE_URL else None
+dynamodb = boto3.resource("dynamodb", region_name=TARGET_REGION)
+oauth_table = dynamodb.Table(OAUTH_DDB_TABLE_NAME)
+event_dedup = EventDeduplicator(
+    dynamodb.Table(EVENT_DEDUP_DDB_TABLE_NAME) if EVENT_DEDUP_DDB_TABLE_NAME else None
+)
+access_control = AccessControl(
+    dynamodb.Table(ACCESS_CONTROL_DDB_TABLE_NAME) if ACCESS_CONTROL_DDB_TABLE_NAME else None,
+    static_team_ids=SLACK_TEAM_IDS,
+    static_channel_ids=SLACK_CHANNEL_IDS,
+)
 ssm_client = boto3.client("ssm", region_name=TARGET_REGION)
-http = urllib3.PoolManager()
-
-
+secrets = SecretsCache(ssm_client)
+token_cache = BotTokenCache(oauth_table)
+# Keep waits short, this function must respond to Slack within 3 seconds
+slack_client = SlackClient(
+    max_retries=1,
+    max_retry_wait_seconds=1.0,
+    rate_limiter=RateLimiter(
+        dynamodb.Table(RATE_LIMIT_DDB_TABLE_NAME) if RATE_LIMIT_DDB_TABLE_NAME else None,
+        max_wait_seconds=0.5,
+    ),
+)
+sync_worker = None
+if SYNC_WORKER_IN_PROCESS is True:
+    # Imported during INIT rather than on the first request, and using the clients of this container
+    sync_worker = importlib.import_module("SyncWorker")
+    sync_worker.use_clients(slack_client, token_cache)
+
+
+@metrics.timed("authenticate", outcome=lambda ok: "ok" if ok else "denied")
+@tracer.traced("authenticate")
 def authenticate(token):
     """Verify the token passed in"""
     if IS_AWS_SAM_LOCAL is True:
         return True
 
     try:
-        expected_token = ssm_client.get_parameter(
-            Name=SLACK_VERIFICATION_TOKEN_SSM_PARAMETER_KEY, WithDecryption=True
-        )["Parameter"]["Value"]
+        expected_token = secrets.get(SLACK_VERIFICATION_TOKEN_SSM_PARAMETER_KEY)
     except Exception as e:
-        logging.error(f"Unable to retrieve data from parameter store: {e}")
+        log.error("Unable to retrieve data from parameter store: %s", e)
         return False
 
     if token != expected_token:
-        logging.error(f"Request token ({token}) does not match expected")
+        log.error("Request token does not match expected")
+        return False
+
+    return True
+
+
+def get_header(event, name):
+    """Return a request header; header names are case-insensitive"""
+    name = name.lower()
+    for k, v in (event.get("headers") or {}).items():
+        if k.lower() == name:
+            return v
+
+
+def get_body(event):
+    """
+    Return the raw request body of a REST API, HTTP API (payload format 1.0 or 2.0) or Function URL
+    event; HTTP APIs and Function URLs may base64-encode it.
+    """
+    body = event.get("body")
+    if body and event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8")
+    return body
+
+
+@tracer.traced("verify_request")
+def verify_request(event):
+    """
+    Verify X-Slack-Signature of the raw request body with the signing secret held in memory.
+    Return None if the signing secret parameter does not exist, to check the verification token.
+    """
+    if IS_AWS_SAM_LOCAL is True:
+        return True
+
+    try:
+        signing_secret = secrets.get(SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY)
+    except KeyError:
+        log.warning("Signing secret parameter not found, checking the verification token instead")
+        return None
+    except Exception as e:
+        log.error("Unable to retrieve data from parameter store: %s", e)
+        return False
+
+    if not verify_signature(
+        signing_secret,
+        get_header(event, "X-Slack-Request-Timestamp"),
+        get_body(event),
+        get_header(event, "X-Slack-Signature"),
+    ):
+        log.error("Request signature does not match expected or request is too old")
         return False
 
     return True
@@ -59,141 +179,291 @@ def authorize(app_id, channel_id, team_id):
     if app_id != SLACK_APP_ID:
         return f"app ID {app_id}"
 
-    if team_id not in SLACK_TEAM_IDS:
-        return f"team ID {team_id}"
-
-    if channel_id not in SLACK_CHANNEL_IDS:
-        return f"channel ID {channel_id}"
+    # Teams and channels in the access control table, or in the environment
+    return access_control.check(team_id, channel_id)
 
 
+@metrics.timed("invoke_lambda", outcome=lambda resp: "ok" if invoke_succeeded(resp) else "failed")
+@tracer.traced("invoke_lambda")
 def invoke_lambda(function_namme, payload_json, is_async):
     payload_str = json.dumps(payload_json)
+    if is_async and ASYNC_WORKER_QUEUE_URL and function_namme == CHILD_ASYNC_FUNCTION_NAME:
+        return sqs_client.send_message(QueueUrl=ASYNC_WORKER_QUEUE_URL, MessageBody=payload_str)
+
     payload_bytes_arr = bytes(payload_str, encoding="utf8")
-    return lambda_client.invoke(
+    return (lambda_client if is_async else sync_lambda_client).invoke(
         FunctionName=function_namme,
         InvocationType="Event" if is_async else "RequestResponse",
         Payload=payload_bytes_arr,
     )
 
 
+def sync_worker_cost_ms(route, budget, bot_token=None, cold_start=False):
+    """
+    Estimated cost of a request in SyncWorker: its command, the token lookup unless the token is
+    passed in, the post, and the INIT of a new SyncWorker container if the invoke may need one
+    """
+    estimates = budget.stage_estimates_ms
+    cost_ms = route.cost_ms + estimates["slack_post"] + (0 if bot_token else estimates["dynamodb"])
+    return cost_ms + (estimates["sync_worker_cold_start"] if cold_start else 0)
+
+
+def invoke_result(resp):
+    """The response of the handler of a RequestResponse invoke, {} if there is none"""
+    payload = resp.get("Payload")
+    return json.loads(payload.read() or b"{}") if payload else {}
+
+
+def run_sync_worker(payload, route, budget, bot_token=None):
+    """
+    Run a sync-capable request in SyncWorker, in this container or with a RequestResponse invoke,
+    with the bot token if already looked up, and within the remaining budget.
+    Return False if it does not fit in the budget or its reply was not posted, so it can go async instead.
+    """
+    if SYNC_WORKER_IN_PROCESS is True and budget.can_afford(
+        "sync_worker", sync_worker_cost_ms(route, budget, bot_token)
+    ):
+        try:
+            with budget.stage("sync_worker"), tracer.span("sync_worker"):
+                resp = sync_worker.lambda_handler(payload, sync_worker.InProcessContext(budget, bot_token))
+            if resp.get("statusCode") == 200:
+                return True
+            log.error("SyncWorker failed in process", response=resp)
+            # The token came from the cache of this container
+            invalidate_rejected_token(payload["app_id"], payload["team_id"], resp.get("error"))
+        except Exception as e:
+            log.error("SyncWorker failed in process: %s", e)
+        return False
+
+    # SyncWorker looks up the token itself, and may have to start a container
+    if budget.can_afford("invoke", sync_worker_cost_ms(route, budget, cold_start=True)):
+        time_limit_ms = int(budget.remaining_ms() - budget.stage_estimates_ms["invoke"])
+        try:
+            with budget.stage("invoke"):
+                resp = invoke_lambda(
+                    CHILD_SYNC_FUNCTION_NAME, {**payload, "time_limit_ms": time_limit_ms}, is_async=False
+                )
+            if invoke_succeeded(resp) and not resp.get("FunctionError") and invoke_result(resp).get("statusCode") == 200:
+                return True
+            log.error("SyncWorker invoke failed", response=resp)
+        except Exception as e:
+            # e.g. throttled or timed out
+            log.error("SyncWorker invoke failed: %s", e)
+
+    return False
+
+
+@metrics.timed("get_bot_token", outcome=lambda token: "ok" if token else "missing")
+@tracer.traced("get_bot_token")
 def get_bot_token(app_id, team_id):
     try:
-        return oauth_table.get_item(Key={"app_id": app_id, "team_id": team_id})["Item"][
-            "access_token"
-        ]
+        return token_cache.get(app_id, team_id)
     except Exception as e:
-        logging.error(e)
+        log.error("Bot token lookup failed: %s", e, team_id=team_id)
+
 
+def invalidate_rejected_token(app_id, team_id, error):
+    """Re-read the bot token next time if Slack rejected it, e.g. after the app was re-installed"""
+    if error in INVALID_TOKEN_ERRORS:
+        token_cache.invalidate(app_id, team_id)
 
-def call_slack_chat_post(channel_id, thread_ts, bot_token, response_text):
-    logging.info("Started call_slack_chat_post")
+
+@metrics.timed("call_slack_chat_post", outcome=response_outcome)
+@tracer.traced("call_slack_chat_post")
+def call_slack_chat_post(channel_id, thread_ts, bot_token, response_text, team_id=None):
+    log.debug("Started call_slack_chat_post")
 
     if IS_AWS_SAM_LOCAL is True:
         return
 
-    data = urlencode(
-        (
-            ("token", bot_token),
-            ("channel", channel_id),
-            ("thread_ts", thread_ts),
-            ("text", response_text),
-        )
-    ).encode("ascii")
-    resp = http.request(
-        "POST",
-        SLACK_API_CHAT_POST_URL,
-        body=data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    resp = slack_client.chat_post_message(
+        bot_token, channel_id, response_text, thread_ts=thread_ts, team_id=team_id
     )
-    logging.info(resp.read())
+    if not resp.ok:
+        log.error("Failed to post message: %s", resp, team_id=team_id)
+    return resp
+
+
+def get_text(slack_msg):
+    """The text after the mention, from the first rich text section of the message"""
+    try:
+        return slack_msg["event"]["blocks"][0]["elements"][0]["elements"][1]["text"]
+    except (KeyError, IndexError, TypeError):
+        return None
 
 
-def create_immediate_response(body):
-    resp = {"statusCode": 200}
+def create_immediate_response(body, status_code=200):
+    resp = {"statusCode": status_code}
     if body:
         resp["body"] = body
 
-    logging.info(f"Sending immediate response: {resp}")
+    log.info("Sending immediate response", status_code=status_code)
     return resp
 
 
-def app_mention_handler(slack_msg):
-    """app_mentions:read handler"""
+def inject_context(payload):
+    """Add the trace context, and the debug override of the request if set, to a worker payload"""
+    if log.debug_enabled:
+        payload["debug"] = True
+    return tracer.inject(payload)
+
+
+def invoke_succeeded(resp):
+    return resp["ResponseMetadata"]["HTTPStatusCode"] in [200, 201, 202]
+
+
+def reply_to_user(app_id, channel_id, team_id, thread_ts, user_id, bot_token, message, budget):
+    """
+    Post a reply to the thread. The reply is handed to AsyncWorker in ack-first mode, when the bot
+    token has not been looked up, or when posting it would not fit in the remaining budget.
+    """
+    if ACK_FIRST is True or bot_token is None or not budget.can_afford("slack_post"):
+        payload = inject_context(
+            {
+                "app_id": app_id,
+                "channel_id": channel_id,
+                "team_id": team_id,
+                "reply": message,
+                "ts": thread_ts,
+                "user_id": user_id,
+            }
+        )
+        with budget.stage("invoke"):
+            resp = invoke_lambda(CHILD_ASYNC_FUNCTION_NAME, payload, is_async=True)
+        if invoke_succeeded(resp):
+            return
+        log.error("AsyncWorker invoke failed", response=resp)
+        with budget.stage("dynamodb"):
+            bot_token = bot_token or get_bot_token(app_id, team_id)
+
+    with budget.stage("slack_post"):
+        resp = call_slack_chat_post(channel_id, thread_ts, bot_token, message, team_id=team_id)
+    if resp is not None:
+        invalidate_rejected_token(app_id, team_id, resp.error)
+
+
+@tracer.traced("app_mention_handler")
+def app_mention_handler(slack_msg, authenticated=True, budget=None):
+    """app_mentions:read handler; return False if the mention could not be handled"""
+    budget = budget or RequestBudget()
     try:
-        token = slack_msg["token"]
         team_id = slack_msg["team_id"]
         app_id = slack_msg["api_app_id"]
         channel_id = slack_msg["event"]["channel"]
         user_id = slack_msg["event"]["user"]
         thread_ts = slack_msg["event"]["ts"]
 
-        bot_token = get_bot_token(app_id, team_id)
-
-        if authenticate(token) is False:
-            call_slack_chat_post(
-                channel_id,
-                thread_ts,
-                bot_token,
+        # In ack-first mode, or when short of time, the bot token is looked up by the worker
+        bot_token = None
+        if ACK_FIRST is False and budget.can_afford("dynamodb"):
+            with budget.stage("dynamodb"):
+                bot_token = get_bot_token(app_id, team_id)
+        reply_args = (app_id, channel_id, team_id, thread_ts, user_id, bot_token)
+
+        if authenticated is False:
+            metrics.count("mentions", team_id, "unauthenticated")
+            reply_to_user(
+                *reply_args,
                 f"Sorry <@{user_id}>, an authentication error occurred. Please contact your admin.",
+                budget,
             )
-            return False
+            return True
 
-        result = authorize(app_id, channel_id, team_id)
+        with budget.stage("access_control"), tracer.span("access_control"):
+            result = authorize(app_id, channel_id, team_id)
         if result is not None:
-            call_slack_chat_post(
-                channel_id,
-                thread_ts,
-                bot_token,
+            metrics.count("mentions", team_id, "unauthorized")
+            reply_to_user(
+                *reply_args,
                 f"Sorry <@{user_id}>, this app does not support this {result}.",
+                budget,
             )
-            return False
-
-        try:
-            text_msg = slack_msg["event"]["blocks"][0]["elements"][0]["elements"][1]["text"]
-        except Exception:
-            text_msg = None
+            return True
 
-        logging.info(
-            f"{user_id} invoked {app_id} in {channel_id} with the following text: {text_msg}"
-        )
+        text_msg = get_text(slack_msg)
 
-        message = None
+        log.info("Mention", app_id=app_id, channel_id=channel_id, team_id=team_id, user_id=user_id)
+        log.debug("Mention text", text=text_msg)
 
         if text_msg:
-            payload = {
-                "app_id": app_id,
-                "channel_id": channel_id,
-                "team_id": team_id,
-                "text": text_msg,
-                "ts": thread_ts,
-                "user_id": user_id,
-            }
+            # The workers continue the trace from the span of this handler
+            payload = inject_context(
+                {
+                    "app_id": app_id,
+                    "channel_id": channel_id,
+                    "team_id": team_id,
+                    "text": text_msg,
+                    "ts": thread_ts,
+                    "user_id": user_id,
+                }
+            )
 
-            resp = invoke_lambda(CHILD_ASYNC_FUNCTION_NAME, payload, is_async=True)
-            if resp["ResponseMetadata"]["HTTPStatusCode"] not in [200, 201, 202]:
-                logging.error(resp)
-                message = (
-                    f"<@{user_id}>, your request ({text_msg}) cannot be"
-                    " processed at the moment. Please try again later."
-                )
+            # Sync-capable requests skip the AsyncWorker hop, unless acknowledging first
+            route = classify(text_msg)
+            if route.mode == SYNC and ACK_FIRST is False:
+                if run_sync_worker(payload, route, budget, bot_token):
+                    metrics.count("mentions", team_id, "sync")
+                    return True
+
+            with budget.stage("invoke"):
+                resp = invoke_lambda(CHILD_ASYNC_FUNCTION_NAME, payload, is_async=True)
+            if invoke_succeeded(resp):
+                metrics.count("mentions", team_id, "async")
+            else:
+                metrics.count("mentions", team_id, "worker_unavailable")
+                log.error("AsyncWorker invoke failed", response=resp)
+                # The worker cannot be reached, so reply from here
+                with budget.stage("slack_post"):
+                    resp = call_slack_chat_post(
+                        channel_id,
+                        thread_ts,
+                        bot_token or get_bot_token(app_id, team_id),
+                        f"<@{user_id}>, your request ({text_msg}) cannot be"
+                        " processed at the moment. Please try again later.",
+                        team_id=team_id,
+                    )
+                if resp is not None:
+                    invalidate_rejected_token(app_id, team_id, resp.error)
 
         else:
-            message = f"Hello <@{user_id}>!"
-
-        if message:
-            call_slack_chat_post(channel_id, thread_ts, bot_token, message)
+            metrics.count("mentions", team_id, "greeting")
+            reply_to_user(*reply_args, f"Hello <@{user_id}>!", budget)
 
     except Exception as e:
-        logging.error(e)
+        metrics.count("mentions", slack_msg.get("team_id"), "error")
+        log.error("Failed to handle mention: %s", e)
         return False
     return True
 
 
+@metrics.flush_after
+@tracer.flush_after
+@log.scoped
+@profiler.profiled
 def lambda_handler(event, context):
-    event_body = event.get("body")
-    logging.info(f"Received event[body]: {event_body}")
+    if is_warmup_event(event):
+        return warmup_response(event)
+
+    budget = RequestBudget(context)
+    tracer.start_trace()
+    log.begin_request(trace_id=tracer.trace_id)
+
+    event_body = get_body(event)
+
+    signature_verified = False
+    if SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY:
+        with budget.stage("ssm"):
+            verified = verify_request(event)
+        if verified is False:
+            metrics.count("mentions", outcome="invalid_signature")
+            return create_immediate_response(None, status_code=401)
+        signature_verified = verified is True
 
     slack_msg = json.loads(event_body)
+    if log.is_debug_user((slack_msg.get("event") or {}).get("user")):
+        # Log this request in full, here and in the workers
+        log.begin_request(debug=True, trace_id=tracer.trace_id)
+    log.debug("Received event", event=slack_msg)
 
     resp_body = None
 
@@ -202,6 +472,51 @@ def lambda_handler(event, context):
         resp_body = slack_msg.get("challenge")
 
     else:
-        app_mention_handler(slack_msg)
+        # The legacy verification token is only checked when the request signature was not verified
+        authenticated = signature_verified
+        if signature_verified is False:
+            with budget.stage("ssm"):
+                authenticated = authenticate(slack_msg.get("token"))
+
+        # Only authenticated deliveries are recorded, so that forged events cannot fill the table
+        is_duplicate = False
+        if authenticated is True:
+            with budget.stage("dynamodb"), tracer.span("event_dedup"):
+                is_duplicate = event_dedup.is_duplicate(slack_msg.get("event_id"))
+
+        if is_duplicate:
+            # Acknowledge retried deliveries without invoking the workers again
+            metrics.count("mentions", slack_msg.get("team_id"), "duplicate")
+            log.info(
+                "Skipped duplicate event",
+                event_id=slack_msg.get("event_id"),
+                retry_num=get_header(event, "X-Slack-Retry-Num"),
+            )
+        elif app_mention_handler(slack_msg, authenticated, budget) is False and authenticated is True:
+            # Handle Slack's next retry of this delivery
+            event_dedup.release(slack_msg.get("event_id"))
 
+    log.info("Stage timings", timings=budget.timings, total_ms=budget.elapsed_ms())
+    metrics.record_time("request.duration", budget.elapsed_ms())
     return create_immediate_response(resp_body)
+
+
+def prime_secrets():
+    keys = [SLACK_VERIFICATION_TOKEN_SSM_PARAMETER_KEY, SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY]
+    secrets.get_many([k for k in keys if k])
+
+
+# Opt-in priming during INIT (InitPriming=true), see priming.py
+prime(
+    [
+        ("secrets", prime_secrets),
+        ("slack_connection", lambda: warm_connection(slack_client.http, slack_client.base_url)),
+        ("access_control", access_control.refresh),
+        (
+            "owner_bot_token",
+            (lambda: token_cache.get(SLACK_APP_ID, SLACK_APP_OWNER_TEAM_ID))
+            if SLACK_APP_OWNER_TEAM_ID
+            else None,
+        ),
+    ]
+)
@@ -1,10 +1,13 @@
 """
 Unit tests for handling Slack Chat in ImmediateResponse.py
 """
+import base64
+import io
 import json
 import os
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 os.environ["SlackAppId"] = "APIID123456"
 os.environ["SlackChannelIds"] = "C1111111111,C2222222222"
@@ -15,9 +18,16 @@ os.environ["SyncWorkerLambdaFunctionName"] = "Dummy-SyncWorker"
 os.environ["OAuthDynamoDBTable"] = "DummyDDB"
 
 func = __import__("ImmediateResponse")
+slack_signature = __import__("slack_signature")
+sync_worker = __import__("SyncWorker")
+work_queue = __import__("work_queue")
 
+SIGNING_SECRET_KEY = "/apps/slack_app/dummy/signing_secret"
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+SPAN_ID = "b7ad6b7169203331"
 
-def mock_event(custom_data={}, channel="C1111111111"):
+
+def mock_event(custom_data={}, channel="C1111111111", text=" what\nline 2\nline 3"):
     data = {
         "token": "dummy-token",
         "team_id": "T1111111111",
@@ -38,7 +48,7 @@ def mock_event(custom_data={}, channel="C1111111111"):
                             "type": "rich_text_section",
                             "elements": [
                                 {"type": "user", "user_id": "UB111111111"},
-                                {"type": "text", "text": " what\nline 2\nline 3"},
+                                {"type": "text", "text": text},
                             ],
                         }
                     ],
@@ -68,19 +78,49 @@ def mock_event(custom_data={}, channel="C1111111111"):
     return {"body": json.dumps(data)}
 
 
-def payload_in_bytes():
+def signed_event(event, signing_secret="dummy-signing-secret", timestamp=None):
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    event["headers"] = {
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": slack_signature.compute_signature(
+            signing_secret, timestamp, event["body"]
+        ),
+    }
+    return event
+
+
+def http_api_event(event):
+    """Convert a REST API event to the shape of an HTTP API (payload format 2.0) or Function URL event"""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": "/",
+        "headers": {k.lower(): v for k, v in event.get("headers", {}).items()},
+        "body": base64.b64encode(event["body"].encode("utf-8")).decode("utf-8"),
+        "isBase64Encoded": True,
+    }
+
+
+def payload_in_bytes(text=" what\nline 2\nline 3"):
     payload_json = {
         "app_id": "APIID123456",
         "channel_id": "C1111111111",
         "team_id": "T1111111111",
-        "text": " what\nline 2\nline 3",
+        "text": text,
         "ts": "1634873264.005100",
         "user_id": "U2222222222",
+        "trace_id": TRACE_ID,
+        "span_id": SPAN_ID,
     }
     payload_str = json.dumps(payload_json)
     return bytes(payload_str, encoding="utf8")
 
 
+MOCK_SSM_GET_PARAMETERS_SIGNING_SECRET_RESPONSE = {
+    "Parameters": [{"Name": SIGNING_SECRET_KEY, "Value": "dummy-signing-secret"}],
+    "InvalidParameters": [],
+}
+
 MOCK_LAMBDA_INVOKE_RESPONSE = {
     "ResponseMetadata": {
         "HTTPStatusCode": 200,
@@ -88,11 +128,27 @@ MOCK_LAMBDA_INVOKE_RESPONSE = {
 }
 
 
+def sync_worker_invoke_response(result):
+    return {**MOCK_LAMBDA_INVOKE_RESPONSE, "Payload": io.BytesIO(json.dumps(result).encode())}
+
+
+MOCK_SSM_GET_PARAMETERS_RESPONSE = {
+    "Parameters": [{"Name": "/apps/slack_app/dummy/token", "Value": "dummy-token"}],
+    "InvalidParameters": [],
+}
+
+
 class TestFunction(unittest.TestCase):
+    def setUp(self):
+        func.secrets.clear()
+        func.token_cache.clear()
+        func.event_dedup.clear()
+        func.tracer.id_generator = lambda nbytes: TRACE_ID if nbytes == 16 else SPAN_ID
+
     def test_lambda_handler_all_good(self):
         with patch(
-            "ImmediateResponse.ssm_client.get_parameter",
-            return_value={"Parameter": {"Value": "dummy-token"}},
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
         ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
             "ImmediateResponse.lambda_client.invoke"
         ) as mock_lambda_invoke:
@@ -102,7 +158,8 @@ class TestFunction(unittest.TestCase):
             ret = func.lambda_handler(mock_event(), None)
 
             mock_ddb_get_item.assert_called_once_with(
-                Key={"app_id": "APIID123456", "team_id": "T1111111111"}
+                Key={"app_id": "APIID123456", "team_id": "T1111111111"},
+                ProjectionExpression="access_token",
             )
 
             mock_lambda_invoke.assert_called_once_with(
@@ -115,17 +172,23 @@ class TestFunction(unittest.TestCase):
 
     def test_lambda_handler_failed_invalid_token(self):
         with patch(
-            "ImmediateResponse.ssm_client.get_parameter",
-            return_value={"Parameter": {"Value": "dummy-token"}},
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
         ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
             "ImmediateResponse.call_slack_chat_post"
-        ) as mock_chat_post:
+        ) as mock_chat_post, patch(
+            "ImmediateResponse.event_dedup.is_duplicate"
+        ) as mock_is_duplicate:
             mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
 
             ret = func.lambda_handler(mock_event({"token": "invalid-token"}), None)
 
+            # Not authenticated, so the delivery is not recorded
+            mock_is_duplicate.assert_not_called()
+
             mock_ddb_get_item.assert_called_once_with(
-                Key={"app_id": "APIID123456", "team_id": "T1111111111"}
+                Key={"app_id": "APIID123456", "team_id": "T1111111111"},
+                ProjectionExpression="access_token",
             )
 
             mock_chat_post.assert_called_once_with(
@@ -133,14 +196,49 @@ class TestFunction(unittest.TestCase):
                 "1634873264.005100",
                 "dummy-bot-token",
                 "Sorry <@U2222222222>, an authentication error occurred. Please contact your admin.",
+                team_id="T1111111111",
             )
 
             self.assertDictEqual(ret, {"statusCode": 200})
 
+    def test_lambda_handler_rejected_bot_token(self):
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.call_slack_chat_post"
+        ) as mock_chat_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_chat_post.return_value = MagicMock(error="token_revoked")
+
+            func.lambda_handler(mock_event({"token": "invalid-token"}), None)
+            func.event_dedup.clear()
+            func.lambda_handler(mock_event({"token": "invalid-token"}), None)
+
+            # The revoked token is not served from the cache again
+            self.assertEqual(mock_ddb_get_item.call_count, 2)
+
+    def test_lambda_handler_sync_in_process_rejected_bot_token(self):
+        with patch("ImmediateResponse.SYNC_WORKER_IN_PROCESS", True), patch(
+            "ImmediateResponse.sync_worker", sync_worker
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke", return_value=MOCK_LAMBDA_INVOKE_RESPONSE
+        ), patch(
+            "SyncWorker.lambda_handler", return_value={"statusCode": 502, "error": "invalid_auth"}
+        ):
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            func.lambda_handler(mock_event(text=" sync"), None)
+
+            self.assertNotIn(("APIID123456", "T1111111111"), func.token_cache._entries)
+
     def test_lambda_handler_failed_no_bot_token(self):
         with patch(
-            "ImmediateResponse.ssm_client.get_parameter",
-            return_value={"Parameter": {"Value": "dummy-token"}},
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
         ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
             "ImmediateResponse.call_slack_chat_post"
         ) as mock_chat_post:
@@ -150,7 +248,8 @@ class TestFunction(unittest.TestCase):
             ret = func.lambda_handler(mock_event(), None)
 
             mock_ddb_get_item.assert_called_once_with(
-                Key={"app_id": "APIID123456", "team_id": "T1111111111"}
+                Key={"app_id": "APIID123456", "team_id": "T1111111111"},
+                ProjectionExpression="access_token",
             )
 
             mock_chat_post.assert_not_called()
@@ -159,8 +258,8 @@ class TestFunction(unittest.TestCase):
 
     def test_lambda_handler_failed_invalid_app_id(self):
         with patch(
-            "ImmediateResponse.ssm_client.get_parameter",
-            return_value={"Parameter": {"Value": "dummy-token"}},
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
         ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
             "ImmediateResponse.call_slack_chat_post"
         ) as mock_chat_post:
@@ -169,7 +268,8 @@ class TestFunction(unittest.TestCase):
             ret = func.lambda_handler(mock_event({"api_app_id": "invalid-app-id"}), None)
 
             mock_ddb_get_item.assert_called_once_with(
-                Key={"app_id": "invalid-app-id", "team_id": "T1111111111"}
+                Key={"app_id": "invalid-app-id", "team_id": "T1111111111"},
+                ProjectionExpression="access_token",
             )
 
             mock_chat_post.assert_called_once_with(
@@ -177,14 +277,15 @@ class TestFunction(unittest.TestCase):
                 "1634873264.005100",
                 "dummy-bot-token",
                 "Sorry <@U2222222222>, this app does not support this app ID invalid-app-id.",
+                team_id="T1111111111",
             )
 
             self.assertDictEqual(ret, {"statusCode": 200})
 
     def test_lambda_handler_failed_invalid_team_id(self):
         with patch(
-            "ImmediateResponse.ssm_client.get_parameter",
-            return_value={"Parameter": {"Value": "dummy-token"}},
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
         ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
             "ImmediateResponse.call_slack_chat_post"
         ) as mock_chat_post:
@@ -193,7 +294,8 @@ class TestFunction(unittest.TestCase):
             ret = func.lambda_handler(mock_event({"team_id": "invalid-team-id"}), None)
 
             mock_ddb_get_item.assert_called_once_with(
-                Key={"app_id": "APIID123456", "team_id": "invalid-team-id"}
+                Key={"app_id": "APIID123456", "team_id": "invalid-team-id"},
+                ProjectionExpression="access_token",
             )
 
             mock_chat_post.assert_called_once_with(
@@ -201,14 +303,15 @@ class TestFunction(unittest.TestCase):
                 "1634873264.005100",
                 "dummy-bot-token",
                 "Sorry <@U2222222222>, this app does not support this team ID invalid-team-id.",
+                team_id="invalid-team-id",
             )
 
             self.assertDictEqual(ret, {"statusCode": 200})
 
     def test_lambda_handler_failed_invalid_channel_id(self):
         with patch(
-            "ImmediateResponse.ssm_client.get_parameter",
-            return_value={"Parameter": {"Value": "dummy-token"}},
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
         ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
             "ImmediateResponse.call_slack_chat_post"
         ) as mock_chat_post:
@@ -217,7 +320,8 @@ class TestFunction(unittest.TestCase):
             ret = func.lambda_handler(mock_event(channel="invalid-channel-id"), None)
 
             mock_ddb_get_item.assert_called_once_with(
-                Key={"app_id": "APIID123456", "team_id": "T1111111111"}
+                Key={"app_id": "APIID123456", "team_id": "T1111111111"},
+                ProjectionExpression="access_token",
             )
 
             mock_chat_post.assert_called_once_with(
@@ -225,10 +329,453 @@ class TestFunction(unittest.TestCase):
                 "1634873264.005100",
                 "dummy-bot-token",
                 "Sorry <@U2222222222>, this app does not support this channel ID invalid-channel-id.",
+                team_id="T1111111111",
+            )
+
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_duplicate_event(self):
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(), None)
+
+            retry_event = mock_event()
+            retry_event["headers"] = {"X-Slack-Retry-Num": "1", "X-Slack-Retry-Reason": "http_timeout"}
+            ret_retry = func.lambda_handler(retry_event, None)
+
+            mock_lambda_invoke.assert_called_once()
+            self.assertDictEqual(ret, {"statusCode": 200})
+            self.assertDictEqual(ret_retry, {"statusCode": 200})
+
+    def test_lambda_handler_retry_after_failure(self):
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.side_effect = [Exception("Service unavailable"), MOCK_LAMBDA_INVOKE_RESPONSE]
+
+            func.lambda_handler(mock_event(), None)
+
+            # The failed delivery is not recorded, so Slack's retry is handled
+            retry_event = mock_event()
+            retry_event["headers"] = {"X-Slack-Retry-Num": "1", "X-Slack-Retry-Reason": "http_error"}
+            ret_retry = func.lambda_handler(retry_event, None)
+
+            self.assertEqual(mock_lambda_invoke.call_count, 2)
+            self.assertDictEqual(ret_retry, {"statusCode": 200})
+
+    def test_lambda_handler_ack_first_all_good(self):
+        with patch("ImmediateResponse.ACK_FIRST", True), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(), None)
+
+            mock_ddb_get_item.assert_not_called()
+            mock_lambda_invoke.assert_called_once_with(
+                FunctionName="Dummy-AsyncWorker",
+                InvocationType="Event",
+                Payload=payload_in_bytes(),
+            )
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_ack_first_reply_deferred(self):
+        with patch("ImmediateResponse.ACK_FIRST", True), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke, patch(
+            "ImmediateResponse.call_slack_chat_post"
+        ) as mock_chat_post:
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(channel="invalid-channel-id"), None)
+
+            mock_ddb_get_item.assert_not_called()
+            mock_chat_post.assert_not_called()
+            mock_lambda_invoke.assert_called_once()
+            self.assertDictEqual(
+                json.loads(mock_lambda_invoke.call_args.kwargs["Payload"]),
+                {
+                    "app_id": "APIID123456",
+                    "channel_id": "invalid-channel-id",
+                    "team_id": "T1111111111",
+                    "reply": "Sorry <@U2222222222>, this app does not support this channel ID invalid-channel-id.",
+                    "ts": "1634873264.005100",
+                    "user_id": "U2222222222",
+                    "trace_id": TRACE_ID,
+                    "span_id": SPAN_ID,
+                },
+            )
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_budget_nearly_spent(self):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 550
+
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke, patch(
+            "ImmediateResponse.call_slack_chat_post"
+        ) as mock_chat_post:
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(channel="invalid-channel-id"), context)
+
+            # Token lookup and posting are skipped, the reply is deferred to AsyncWorker
+            mock_ddb_get_item.assert_not_called()
+            mock_chat_post.assert_not_called()
+            mock_lambda_invoke.assert_called_once()
+            self.assertIn("reply", json.loads(mock_lambda_invoke.call_args.kwargs["Payload"]))
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_queue_mode(self):
+        queue = work_queue.LocalQueue()
+        with patch("ImmediateResponse.ASYNC_WORKER_QUEUE_URL", "https://sqs/dummy-queue"), patch(
+            "ImmediateResponse.sqs_client", queue
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            ret = func.lambda_handler(mock_event(), None)
+
+            mock_lambda_invoke.assert_not_called()
+            event = queue.receive_event()
+            self.assertEqual(len(event["Records"]), 1)
+            self.assertEqual(event["Records"][0]["body"].encode(), payload_in_bytes())
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_sync_request_response(self):
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.sync_lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = sync_worker_invoke_response({"statusCode": 200})
+
+            ret = func.lambda_handler(mock_event(text=" sync"), None)
+
+            mock_lambda_invoke.assert_called_once()
+            kwargs = mock_lambda_invoke.call_args.kwargs
+            self.assertEqual(kwargs["FunctionName"], "Dummy-SyncWorker")
+            self.assertEqual(kwargs["InvocationType"], "RequestResponse")
+            # SyncWorker must post within the time left before the acknowledgement
+            payload = json.loads(kwargs["Payload"])
+            time_limit_ms = payload.pop("time_limit_ms")
+            self.assertGreater(time_limit_ms, 0)
+            self.assertLessEqual(time_limit_ms, 3000 - 500 - 200)
+            self.assertEqual(payload, json.loads(payload_in_bytes(text=" sync")))
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_sync_post_failed(self):
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.sync_lambda_client.invoke"
+        ) as mock_sync_invoke, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_sync_invoke.return_value = sync_worker_invoke_response(
+                {"statusCode": 502, "error": "ratelimited"}
+            )
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(text=" sync"), None)
+
+            # The reply was not posted, so the request goes to AsyncWorker
+            mock_sync_invoke.assert_called_once()
+            mock_lambda_invoke.assert_called_once_with(
+                FunctionName="Dummy-AsyncWorker",
+                InvocationType="Event",
+                Payload=payload_in_bytes(text=" sync"),
+            )
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_sync_invoke_failed(self):
+        with patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.sync_lambda_client.invoke"
+        ) as mock_sync_invoke, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_sync_invoke.side_effect = Exception("TooManyRequestsException: Rate Exceeded.")
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(text=" sync"), None)
+
+            # The invoke of SyncWorker was throttled, so the request goes to AsyncWorker
+            mock_lambda_invoke.assert_called_once_with(
+                FunctionName="Dummy-AsyncWorker",
+                InvocationType="Event",
+                Payload=payload_in_bytes(text=" sync"),
+            )
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_sync_in_process(self):
+        with patch("ImmediateResponse.SYNC_WORKER_IN_PROCESS", True), patch(
+            "ImmediateResponse.sync_worker", sync_worker
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke, patch(
+            "SyncWorker.lambda_handler", return_value={"statusCode": 200}
+        ) as mock_sync_worker:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            ret = func.lambda_handler(mock_event(text=" sync"), None)
+
+            mock_lambda_invoke.assert_not_called()
+            # One token lookup, passed on to SyncWorker with the budget
+            mock_ddb_get_item.assert_called_once()
+            mock_sync_worker.assert_called_once()
+            payload, context = mock_sync_worker.call_args.args
+            self.assertEqual(payload, json.loads(payload_in_bytes(text=" sync")))
+            self.assertEqual(context.bot_token, "dummy-bot-token")
+            self.assertGreater(context.get_remaining_time_in_millis(), 0)
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_sync_over_budget(self):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 700
+
+        with patch("ImmediateResponse.SYNC_WORKER_IN_PROCESS", True), patch(
+            "ImmediateResponse.sync_worker", sync_worker
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch("ImmediateResponse.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke, patch(
+            "SyncWorker.lambda_handler"
+        ) as mock_sync_worker:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(mock_event(text=" sync"), context)
+
+            # Neither the in-process call nor a RequestResponse invoke fits, so go async
+            mock_sync_worker.assert_not_called()
+            mock_lambda_invoke.assert_called_once_with(
+                FunctionName="Dummy-AsyncWorker",
+                InvocationType="Event",
+                Payload=payload_in_bytes(text=" sync"),
             )
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_signature_all_good(self):
+        with patch(
+            "ImmediateResponse.SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY", SIGNING_SECRET_KEY
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_SIGNING_SECRET_RESPONSE,
+        ) as mock_ssm_get_parameters, patch(
+            "ImmediateResponse.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            # The verification token is not checked when the signature is verified
+            ret = func.lambda_handler(signed_event(mock_event({"token": "unused-token"})), None)
+            ret2 = func.lambda_handler(
+                signed_event(mock_event({"token": "unused-token", "event_id": "Ev02JGDEJTCO"})),
+                None,
+            )
+
+            # The signing secret is loaded once and then held in memory
+            mock_ssm_get_parameters.assert_called_once_with(
+                Names=[SIGNING_SECRET_KEY], WithDecryption=True
+            )
+            self.assertEqual(mock_lambda_invoke.call_count, 2)
+            self.assertDictEqual(ret, {"statusCode": 200})
+            self.assertDictEqual(ret2, {"statusCode": 200})
+
+    def test_lambda_handler_signing_secret_not_found(self):
+        with patch(
+            "ImmediateResponse.SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY", SIGNING_SECRET_KEY
+        ), patch("ImmediateResponse.ssm_client.get_parameters") as mock_ssm_get_parameters, patch(
+            "ImmediateResponse.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ssm_get_parameters.side_effect = [
+                {"Parameters": [], "InvalidParameters": [SIGNING_SECRET_KEY]},
+                MOCK_SSM_GET_PARAMETERS_RESPONSE,
+            ]
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            # Falls back to the verification token of the unsigned request
+            ret = func.lambda_handler(mock_event(), None)
 
+            self.assertEqual(mock_ssm_get_parameters.call_count, 2)
+            mock_lambda_invoke.assert_called_once()
             self.assertDictEqual(ret, {"statusCode": 200})
 
+    def test_lambda_handler_http_api_event(self):
+        with patch(
+            "ImmediateResponse.SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY", SIGNING_SECRET_KEY
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_SIGNING_SECRET_RESPONSE,
+        ), patch(
+            "ImmediateResponse.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            ret = func.lambda_handler(http_api_event(signed_event(mock_event())), None)
+
+            mock_lambda_invoke.assert_called_once_with(
+                FunctionName="Dummy-AsyncWorker",
+                InvocationType="Event",
+                Payload=payload_in_bytes(),
+            )
+            self.assertDictEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_http_api_challenge(self):
+        event = http_api_event({"body": json.dumps({"challenge": "dummy-challenge"})})
+        ret = func.lambda_handler(event, None)
+        self.assertDictEqual(ret, {"statusCode": 200, "body": "dummy-challenge"})
+
+    def test_lambda_handler_signature_failed(self):
+        for event in [
+            mock_event(),
+            signed_event(mock_event(), signing_secret="invalid-signing-secret"),
+            signed_event(mock_event(), timestamp=int(time.time()) - 600),
+        ]:
+            with patch(
+                "ImmediateResponse.SLACK_SIGNING_SECRET_SSM_PARAMETER_KEY", SIGNING_SECRET_KEY
+            ), patch(
+                "ImmediateResponse.ssm_client.get_parameters",
+                return_value=MOCK_SSM_GET_PARAMETERS_SIGNING_SECRET_RESPONSE,
+            ), patch(
+                "ImmediateResponse.lambda_client.invoke"
+            ) as mock_lambda_invoke, patch(
+                "ImmediateResponse.call_slack_chat_post"
+            ) as mock_chat_post:
+                ret = func.lambda_handler(event, None)
+
+                mock_lambda_invoke.assert_not_called()
+                mock_chat_post.assert_not_called()
+                self.assertDictEqual(ret, {"statusCode": 401})
+
+    def test_lambda_handler_warmup(self):
+        with patch("ImmediateResponse.ssm_client.get_parameters") as mock_ssm, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke, patch("ImmediateResponse.log.info") as mock_logging_info:
+            ret = func.lambda_handler({"source": "slack-chat-app.warmup", "hold_ms": 1}, None)
+            mock_ssm.assert_not_called()
+            mock_lambda_invoke.assert_not_called()
+            mock_logging_info.assert_not_called()
+            self.assertEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_emits_metrics(self):
+        stream = io.StringIO()
+        with patch.object(func.metrics, "enabled", True), patch.object(
+            func.metrics, "stream", stream
+        ), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch(
+            "ImmediateResponse.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            func.lambda_handler(mock_event(), None)
+
+            # Flushed once, as EMF documents on one line each
+            docs = [json.loads(line) for line in stream.getvalue().splitlines()]
+            timings = docs[0]
+            for name in ["authenticate", "get_bot_token", "invoke_lambda", "request"]:
+                self.assertEqual(len(timings[f"{name}.duration"]), 1)
+            mentions = [d for d in docs if "mentions" in d]
+            self.assertEqual(len(mentions), 1)
+            self.assertEqual(mentions[0]["TeamId"], "T1111111111")
+            self.assertEqual(mentions[0]["Outcome"], "async")
+
+    def test_lambda_handler_debug_user(self):
+        with patch.object(func.log, "debug_user_ids", {"U2222222222"}), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch(
+            "ImmediateResponse.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke, patch.object(
+            func.log.logger, "log"
+        ) as mock_log:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            func.lambda_handler(mock_event(), None)
+
+            # The request is logged in full, and the workers are asked to do the same
+            self.assertIn("Received event", [c.args[1] for c in mock_log.call_args_list])
+            payload = json.loads(mock_lambda_invoke.call_args.kwargs["Payload"])
+            self.assertEqual(payload, {**json.loads(payload_in_bytes()), "debug": True})
+
+    def test_lambda_handler_exports_spans(self):
+        exported = []
+        with patch.object(func.tracer.exporter, "export", exported.append), patch(
+            "ImmediateResponse.ssm_client.get_parameters",
+            return_value=MOCK_SSM_GET_PARAMETERS_RESPONSE,
+        ), patch(
+            "ImmediateResponse.oauth_table.get_item"
+        ) as mock_ddb_get_item, patch(
+            "ImmediateResponse.lambda_client.invoke"
+        ) as mock_lambda_invoke:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_lambda_invoke.return_value = MOCK_LAMBDA_INVOKE_RESPONSE
+
+            func.lambda_handler(mock_event(), None)
+
+            # Exported once, all in the trace carried to the worker
+            self.assertEqual(len(exported), 1)
+            spans = {span.name: span for span in exported[0]}
+            for name in ["get_bot_token", "access_control", "invoke_lambda"]:
+                self.assertEqual(spans[name].parent_span_id, spans["app_mention_handler"].span_id)
+            self.assertTrue(all(span.trace_id == TRACE_ID for span in exported[0]))
+            self.assertIsNone(spans["authenticate"].parent_span_id)
+            self.assertIsNone(spans["event_dedup"].parent_span_id)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,8 +13,15 @@ from urllib.parse import urlencode
 
 import boto3
 import urllib3
+from access_control import AccessControl
+from metrics import Metrics
+from priming import prime, warm_connection
+from profiling import Profiler
+from secrets_cache import SecretsCache
+from structured_logging import StructuredLogger
+from tracing import Tracer
+from warmup import is_warmup_event, warmup_response
 
-logging.getLogger().setLevel(logging.INFO)
 logging.getLogger("botocore").setLevel(logging.CRITICAL)
 logging.getLogger("boto3").setLevel(logging.CRITICAL)
 logging.getLogger("urllib3.connectionpool").setLevel(logging.CRITICAL)
@@ -25,53 +32,76 @@ SLACK_APP_CLIENT_SECRET_PARAMETER_KEY = os.environ.get("SlackAppClientSecretPara
 SLACK_API_OAUTH_V2_URL = "https://slack.com/api/oauth.v2.access"
 SLACK_TEAM_IDS = list(map(str.strip, os.environ.get("SlackTeamIds", "").split(",")))
 OAUTH_DDB_TABLE_NAME = os.environ.get("OAuthDynamoDBTable")
+ACCESS_CONTROL_DDB_TABLE_NAME = os.environ.get("AccessControlDynamoDBTable")
 
 IS_AWS_SAM_LOCAL = os.environ.get("AWS_SAM_LOCAL") == "true"
 TARGET_REGION = os.environ.get("AWS_REGION", "ap-southeast-2")
 
-oauth_table = boto3.resource("dynamodb", region_name=TARGET_REGION).Table(OAUTH_DDB_TABLE_NAME)
+log = StructuredLogger("OAuth")
+metrics = Metrics("OAuth")
+tracer = Tracer("OAuth")
+profiler = Profiler("OAuth")
+dynamodb = boto3.resource("dynamodb", region_name=TARGET_REGION)
+oauth_table = dynamodb.Table(OAUTH_DDB_TABLE_NAME)
+access_control = AccessControl(
+    dynamodb.Table(ACCESS_CONTROL_DDB_TABLE_NAME) if ACCESS_CONTROL_DDB_TABLE_NAME else None,
+    static_team_ids=SLACK_TEAM_IDS,
+)
+ssm_client = boto3.client("ssm", region_name=TARGET_REGION)
+secrets = SecretsCache(ssm_client)
 http = urllib3.PoolManager()
 
 
-def retrieve_client_credentials():
+def client_credentials():
+    """Return CLIENT_ID, CLIENT_SECRET, fetched in one batched call and cached across invocations"""
     try:
-        ssm_client = boto3.client("ssm", region_name=TARGET_REGION)
-        v1 = ssm_client.get_parameter(Name=SLACK_APP_CLIENT_ID_PARAMETER_KEY, WithDecryption=True)[
-            "Parameter"
-        ]["Value"]
-        v2 = ssm_client.get_parameter(
-            Name=SLACK_APP_CLIENT_SECRET_PARAMETER_KEY, WithDecryption=True
-        )["Parameter"]["Value"]
-        return v1, v2
+        values = secrets.get_many(
+            [SLACK_APP_CLIENT_ID_PARAMETER_KEY, SLACK_APP_CLIENT_SECRET_PARAMETER_KEY]
+        )
+        return (
+            values[SLACK_APP_CLIENT_ID_PARAMETER_KEY],
+            values[SLACK_APP_CLIENT_SECRET_PARAMETER_KEY],
+        )
     except Exception as e:
         if IS_AWS_SAM_LOCAL is False:
-            logging.error(e)
+            log.error("Unable to retrieve client credentials: %s", e)
     return None, None
 
 
-CLIENT_ID, CLIENT_SECRET = retrieve_client_credentials()
-
-
-def client_credentials():
-    """Return CLIENT_ID, CLIENT_SECRET. Defined for mocking CLIENT_ID, CLIENT_SECRET content"""
-    return CLIENT_ID, CLIENT_SECRET
+@metrics.timed(
+    "oauth_v2_access", outcome=lambda resp: "ok" if resp[1].get("ok") else resp[1].get("error")
+)
+@tracer.traced("oauth_v2_access")
+def oauth_v2_access(auth_code):
+    """Turn the auth code into access token; return the HTTP status and the response data"""
+    client_id, client_secret = client_credentials()
+    data = {
+        "code": auth_code,
+        "client_id": client_id,
+        "client_secret": client_secret,
+    }
+    encoded_args = urlencode(data)
+    url = f"{SLACK_API_OAUTH_V2_URL}?{encoded_args}"
+    resp = http.request("POST", url, headers={"Content-Type": "application/x-www-form-urlencoded"})
+    return resp.status, json.loads(resp.data.decode("utf-8"))
 
 
 def authorize(response_data):
-    """Check if app is invoked from the expected domain channel"""
+    """Check if the app is installed in a team of the allowlist, see access_control.py"""
     try:
         app_id = response_data["app_id"]
         team_id = response_data["team"]["id"]
 
-        if app_id == SLACK_APP_ID and team_id in SLACK_TEAM_IDS:
+        if app_id == SLACK_APP_ID and access_control.check_team(team_id) is None:
             return True
 
     except Exception as e:
-        logging.error(f"Failed to do authorization check: {e}")
+        log.error("Failed to do authorization check: %s", e)
 
     return False
 
 
+@tracer.traced("put_data_to_dynamodb")
 def put_data_to_dynamodb(response_data):
     try:
         data = {"request_utc": datetime.utcnow().isoformat()}  # Add current timestamp
@@ -84,42 +114,40 @@ def put_data_to_dynamodb(response_data):
 
         oauth_table.put_item(TableName=OAUTH_DDB_TABLE_NAME, Item=data)
     except Exception as e:
-        logging.error(e)
+        log.error("Failed to store the installation: %s", e)
 
 
+@metrics.flush_after
+@tracer.flush_after
+@log.scoped
+@profiler.profiled
 def lambda_handler(event, context):
-    logging.info(json.dumps(event))
+    if is_warmup_event(event):
+        return warmup_response(event)
 
-    auth_code = event.get("queryStringParameters", {}).get("code")
-    logging.info(auth_code)
+    log.begin_request()
+
+    # The auth code is not logged, it can be exchanged for a token until it expires
+    auth_code = (event.get("queryStringParameters") or {}).get("code")
+    log.info("Installation request", has_code=auth_code is not None)
 
     if auth_code:
         # Turn the auth code into access token
+        status, resp_data = oauth_v2_access(auth_code)
+        log.debug("oauth.v2.access response", response=resp_data)
 
-        client_id, client_secret = client_credentials()
-        data = {
-            "code": auth_code,
-            "client_id": client_id,
-            "client_secret": client_secret,
-        }
-        encoded_args = urlencode(data)
-        url = f"{SLACK_API_OAUTH_V2_URL}?{encoded_args}"
-        resp = http.request(
-            "POST", url, headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
-
-        status = resp.status
-        resp_data = json.loads(resp.data.decode("utf-8"))
-        logging.info(resp_data)
-
+        team_id = (resp_data.get("team") or {}).get("id")
         if resp_data.get("ok", False) is True:
             if authorize(resp_data):
+                metrics.count("installations", team_id, "accepted")
                 message = "Installation request accepted and registration completed."
                 put_data_to_dynamodb(resp_data)
             else:
+                metrics.count("installations", team_id, "forbidden")
                 status = 403  # Forbidden
                 message = "Error: Installation forbidden. Please contact the app owner."
         else:
+            metrics.count("installations", outcome="failed")
             status = 500
             message = resp_data.get("error")
 
@@ -131,3 +159,18 @@ def lambda_handler(event, context):
         "statusCode": status,
         "body": json.dumps(message),
     }
+
+
+# Opt-in priming during INIT (InitPriming=true), see priming.py
+prime(
+    [
+        (
+            "secrets",
+            lambda: secrets.get_many(
+                [SLACK_APP_CLIENT_ID_PARAMETER_KEY, SLACK_APP_CLIENT_SECRET_PARAMETER_KEY]
+            ),
+        ),
+        ("access_control", access_control.refresh),
+        ("slack_connection", lambda: warm_connection(http, SLACK_API_OAUTH_V2_URL)),
+    ]
+)
@@ -5,7 +5,7 @@ import json
 import os
 import unittest
 from dataclasses import dataclass
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 os.environ["SlackAppId"] = "APIID123456"
 os.environ["SlackAppClientIdParameterKey"] = "/apps/slack_app/dummy/client_id"
@@ -50,6 +50,13 @@ class TestFunction(unittest.TestCase):
             ret, {"body": '"Error: The required code is missing."', "statusCode": 500}
         )
 
+    def test_lambda_handler_no_query_string(self):
+        # API Gateway passes null query string parameters when there are none
+        ret = func.lambda_handler({"queryStringParameters": None}, None)
+        self.assertEqual(
+            ret, {"body": '"Error: The required code is missing."', "statusCode": 500}
+        )
+
     def test_lambda_handler_all_good(self):
         with patch("OAuth.client_credentials", return_value=MOCK_CLIENT_CREDENTIALS), patch(
             "urllib3.PoolManager.request"
@@ -116,6 +123,25 @@ class TestFunction(unittest.TestCase):
                 },
             )
 
+    def test_lambda_handler_team_in_access_control_table(self):
+        table = MagicMock()
+        table.get_item.return_value = {"Item": {"team_id": "#version", "version": 100}}
+        table.query.return_value = {"Items": [{"team_id": "TA3333333", "updated_at": 100}]}
+        access_control = func.AccessControl(table, static_team_ids=func.SLACK_TEAM_IDS)
+
+        with patch("OAuth.client_credentials", return_value=MOCK_CLIENT_CREDENTIALS), patch(
+            "urllib3.PoolManager.request"
+        ) as mock_http_request, patch("OAuth.oauth_table.put_item") as mock_table_put_item, patch(
+            "OAuth.access_control", access_control
+        ):
+            mock_http_request.return_value = mock_http_response(200, team_id="TA3333333")
+
+            ret = func.lambda_handler(mock_event(), None)
+
+            mock_table_put_item.assert_called_once()
+            table.query.assert_called_once()
+            self.assertEqual(ret["statusCode"], 200)
+
     def test_lambda_handler_invalid_app_id(self):
         with patch("OAuth.client_credentials", return_value=MOCK_CLIENT_CREDENTIALS), patch(
             "urllib3.PoolManager.request"
@@ -140,6 +166,15 @@ class TestFunction(unittest.TestCase):
                 },
             )
 
+    def test_lambda_handler_warmup(self):
+        with patch("OAuth.client_credentials") as mock_client_credentials, patch(
+            "OAuth.log.info"
+        ) as mock_logging_info:
+            ret = func.lambda_handler({"source": "slack-chat-app.warmup"}, None)
+            mock_client_credentials.assert_not_called()
+            mock_logging_info.assert_not_called()
+            self.assertEqual(ret, {"statusCode": 200})
+
 
 if __name__ == "__main__":
     unittest.main()
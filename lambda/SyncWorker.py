@@ -1,65 +1,162 @@
 """
 For processing requests that will take less than 3 seconds to process.
+The command matching the text is run through the command registry (see command_registry.py).
+
+ImmediateResponse runs it on the path of its acknowledgement to Slack, in its own container with an
+`InProcessContext` or with a RequestResponse invoke carrying `time_limit_ms`. The post to Slack then
+has to fit in the time left, and its outcome is returned so ImmediateResponse can go async instead.
+
+In the container of ImmediateResponse (`SyncWorkerInProcess=true`) this module is imported during
+INIT, creates no clients and skips priming; ImmediateResponse hands it its own with `use_clients`.
 """
-import json
-import logging
 import os
-from urllib.parse import urlencode
-import boto3
-import urllib3
+import time
 
-logging.getLogger().setLevel(logging.INFO)
+import boto3
+from command_registry import registry
+from metrics import Metrics
+from priming import prime, warm_connection
+from profiling import Profiler
+from rate_limiter import RateLimiter
+from slack_client import INVALID_TOKEN_ERRORS, SlackClient, response_outcome
+from structured_logging import StructuredLogger
+from token_cache import BotTokenCache
+from tracing import Tracer
+from warmup import is_warmup_event, warmup_response
 
-SLACK_API_CHAT_POST_URL = "https://slack.com/api/chat.postMessage"
 OAUTH_DDB_TABLE_NAME = os.environ.get("OAuthDynamoDBTable")
+RATE_LIMIT_DDB_TABLE_NAME = os.environ.get("RateLimitDynamoDBTable")
+SLACK_APP_ID = os.environ.get("SlackAppId")
+SLACK_APP_OWNER_TEAM_ID = os.environ.get("SlackAppOwnerTeamId")
+# Imported by ImmediateResponse to run requests in its container
+IN_PROCESS = os.environ.get("SyncWorkerInProcess") == "true"
+
+log = StructuredLogger("SyncWorker")
+metrics = Metrics("SyncWorker")
+tracer = Tracer("SyncWorker")
+profiler = Profiler("SyncWorker")
+if IN_PROCESS is True:
+    # Set by ImmediateResponse, see use_clients
+    token_cache = None
+    slack_client = None
+else:
+    dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("AWS_REGION", "ap-southeast-2"))
+    oauth_table = dynamodb.Table(OAUTH_DDB_TABLE_NAME)
+    token_cache = BotTokenCache(oauth_table)
+    slack_client = SlackClient(
+        rate_limiter=RateLimiter(
+            dynamodb.Table(RATE_LIMIT_DDB_TABLE_NAME) if RATE_LIMIT_DDB_TABLE_NAME else None
+        )
+    )
+
+
+def use_clients(client, cache):
+    """Use the Slack client and bot token cache of ImmediateResponse, when run in its container"""
+    global slack_client, token_cache
+    slack_client = client
+    token_cache = cache
+
+
+class InProcessContext:
+    """Context of a request run in the container of ImmediateResponse, within its request budget"""
 
-oauth_table = boto3.resource(
-    "dynamodb", region_name=os.environ.get("AWS_REGION", "ap-southeast-2")
-).Table(OAUTH_DDB_TABLE_NAME)
-http = urllib3.PoolManager()
+    def __init__(self, budget, bot_token=None):
+        self.budget = budget
+        self.bot_token = bot_token  # Already looked up by ImmediateResponse, if not None
 
+    def get_remaining_time_in_millis(self):
+        return self.budget.remaining_ms()
 
+
+def ack_deadline(event, context):
+    """Monotonic deadline of a request run for ImmediateResponse, None for any other request"""
+    if isinstance(context, InProcessContext):
+        return time.monotonic() + context.get_remaining_time_in_millis() / 1000
+    if event.get("time_limit_ms"):
+        return time.monotonic() + event["time_limit_ms"] / 1000
+    return None
+
+
+@metrics.timed("get_bot_token", outcome=lambda token: "ok" if token else "missing")
+@tracer.traced("get_bot_token")
 def get_bot_token(app_id, team_id):
     try:
-        return oauth_table.get_item(Key={"app_id": app_id, "team_id": team_id})["Item"][
-            "access_token"
-        ]
+        return token_cache.get(app_id, team_id)
     except Exception as e:
-        logging.error(e)
+        log.error("Bot token lookup failed: %s", e, team_id=team_id)
 
 
-def call_slack_chat_post(channel_id, thread_ts, bot_token, response_text):
-    data = urlencode(
-        (
-            ("token", bot_token),
-            ("channel", channel_id),
-            ("thread_ts", thread_ts),
-            ("text", response_text),
-        )
-    ).encode("ascii")
-    resp = http.request(
-        "POST",
-        SLACK_API_CHAT_POST_URL,
-        body=data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
+@metrics.timed("call_slack_chat_post", outcome=response_outcome)
+@tracer.traced("call_slack_chat_post")
+def call_slack_chat_post(channel_id, thread_ts, bot_token, response_text, team_id=None, time_limit_seconds=None):
+    resp = slack_client.chat_post_message(
+        bot_token,
+        channel_id,
+        response_text,
+        thread_ts=thread_ts,
+        team_id=team_id,
+        time_limit_seconds=time_limit_seconds,
     )
-    logging.info(resp.read())
+    if not resp.ok:
+        log.error("Failed to post message: %s", resp, team_id=team_id)
+    return resp
 
 
+@metrics.flush_after
+@tracer.flush_after
+@log.scoped
+@profiler.profiled
 def lambda_handler(event, context):
-    logging.info(json.dumps(event, indent=2))
+    if is_warmup_event(event):
+        return warmup_response(event)
 
     app_id = event["app_id"]
     channel_id = event["channel_id"]
     team_id = event["team_id"]
-    text_msg = event.get("text")
     thread_ts = event["ts"]
-    user_id = event["user_id"]
+    deadline = ack_deadline(event, context)
+    bot_token = context.bot_token if isinstance(context, InProcessContext) else None
 
-    message = f"SyncWorker: <@{user_id}> said `{text_msg}`"
-    logging.info(message)
-    call_slack_chat_post(channel_id, thread_ts, get_bot_token(app_id, team_id), message)
+    # Continue the trace of ImmediateResponse, and its debug override
+    tracer.start_trace(event.get("trace_id"), event.get("span_id"))
+    log.begin_request(debug=event.get("debug", False), trace_id=tracer.trace_id)
+    log.debug("Received event", event=event)
+    with tracer.span("process_request", team_id=team_id):
+        with tracer.span("command"):
+            message = f"SyncWorker: {registry.dispatch(event)}"
+        log.debug("Reply", text=message)
+        resp = call_slack_chat_post(
+            channel_id,
+            thread_ts,
+            bot_token or get_bot_token(app_id, team_id),
+            message,
+            team_id=team_id,
+            time_limit_seconds=None if deadline is None else deadline - time.monotonic(),
+        )
+    outcome = response_outcome(resp)
+    metrics.count("requests", team_id, outcome)
+    if resp is not None and resp.error in INVALID_TOKEN_ERRORS:
+        # The app may have been re-installed with a new token, so re-read it next time
+        token_cache.invalidate(app_id, team_id)
 
+    if resp is None or not resp.ok:
+        return {"statusCode": 502, "error": outcome}
     return {
         "statusCode": 200,
     }
+
+
+# Opt-in priming during INIT (InitPriming=true), see priming.py
+# In process the clients are the ones of ImmediateResponse, primed by it
+if IN_PROCESS is False:
+    prime(
+        [
+            ("slack_connection", lambda: warm_connection(slack_client.http, slack_client.base_url)),
+            (
+                "owner_bot_token",
+                (lambda: token_cache.get(SLACK_APP_ID, SLACK_APP_OWNER_TEAM_ID))
+                if SLACK_APP_ID and SLACK_APP_OWNER_TEAM_ID
+                else None,
+            ),
+        ]
+    )
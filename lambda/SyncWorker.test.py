@@ -3,13 +3,21 @@ Unit tests for SyncWorker.py
 """
 import os
 import unittest
-from unittest.mock import patch
+from dataclasses import dataclass, field
+from unittest.mock import MagicMock, patch
 
 os.environ["OAuthDynamoDBTable"] = "DummyDDB"
 
 func = __import__("SyncWorker")
 
 
+@dataclass
+class HttpResponse:
+    status: int = 200
+    data: bytes = b'{"ok": true}'
+    headers: dict = field(default_factory=dict)
+
+
 def mock_event(text_value=""):
     return {
         "app_id": "APIID123456",
@@ -22,6 +30,9 @@ def mock_event(text_value=""):
 
 
 class TestFunction(unittest.TestCase):
+    def setUp(self):
+        func.token_cache.clear()
+
     def test_lambda_handler(self):
         with patch("SyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
             "SyncWorker.call_slack_chat_post"
@@ -34,9 +45,76 @@ class TestFunction(unittest.TestCase):
                 "1634873264.005100",
                 "dummy-bot-token",
                 "SyncWorker: <@test_user_id> said `sync`",
+                team_id="T1111111111",
+                time_limit_seconds=None,
             )
             self.assertEqual(ret, {"statusCode": 200})
 
+    def test_lambda_handler_in_process(self):
+        budget = MagicMock()
+        budget.remaining_ms.return_value = 1500
+        context = func.InProcessContext(budget, bot_token="dummy-bot-token")
+
+        with patch("SyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "SyncWorker.slack_client.http.request"
+        ) as mock_request:
+            mock_request.return_value = HttpResponse()
+            ret = func.lambda_handler(mock_event(text_value="sync"), context)
+
+            # The token of ImmediateResponse is used, and the post is bounded by its budget
+            mock_ddb_get_item.assert_not_called()
+            timeout = mock_request.call_args.kwargs["timeout"]
+            self.assertLessEqual(timeout.total, 1.5)
+            self.assertEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_clients_of_immediate_response(self):
+        client, cache = MagicMock(), MagicMock()
+        client.chat_post_message.return_value.ok = True
+        cache.get.return_value = "dummy-bot-token"
+        own_clients = (func.slack_client, func.token_cache)
+
+        func.use_clients(client, cache)
+        try:
+            ret = func.lambda_handler(mock_event(text_value="sync"), None)
+        finally:
+            func.use_clients(*own_clients)
+
+        cache.get.assert_called_once_with("APIID123456", "T1111111111")
+        self.assertEqual(client.chat_post_message.call_args.args[0], "dummy-bot-token")
+        self.assertEqual(ret, {"statusCode": 200})
+
+    def test_lambda_handler_post_failed(self):
+        with patch("SyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "SyncWorker.slack_client.http.request"
+        ) as mock_request:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+            mock_request.return_value = HttpResponse(200, b'{"ok": false, "error": "channel_not_found"}')
+
+            ret = func.lambda_handler(dict(mock_event(text_value="sync"), time_limit_ms=2000), None)
+
+            self.assertLessEqual(mock_request.call_args.kwargs["timeout"].total, 2.0)
+            self.assertEqual(ret, {"statusCode": 502, "error": "channel_not_found"})
+
+    def test_lambda_handler_help_command(self):
+        with patch("SyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "SyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            mock_ddb_get_item.return_value = {"Item": {"access_token": "dummy-bot-token"}}
+
+            func.lambda_handler(mock_event(text_value=" help"), None)
+            message = mock_post.call_args[0][3]
+            self.assertTrue(message.startswith("SyncWorker: Commands:"))
+            self.assertIn("`sync` Echo the text from SyncWorker", message)
+
+    def test_lambda_handler_warmup(self):
+        with patch("SyncWorker.oauth_table.get_item") as mock_ddb_get_item, patch(
+            "SyncWorker.call_slack_chat_post"
+        ) as mock_post:
+            ret = func.lambda_handler({"source": "slack-chat-app.warmup"}, None)
+            mock_ddb_get_item.assert_not_called()
+            mock_post.assert_not_called()
+            self.assertEqual(ret, {"statusCode": 200})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+"""
+Allowlist of the workspaces (teams) and channels the app may be used in.
+
+The allowlist is stored in a DynamoDB table with one item per team:
+
+    {"team_id": "T1111111111", "channel_ids": {"C1111111111", ...}, "enabled": true,
+     "updated_at": 1700000000000, "entry_type": "team"}
+
+A team without `channel_ids` may use the app in any channel. A team is removed by setting `enabled`
+to false, not by deleting the item, so that the change is picked up by incremental refreshes.
+Every change also raises the version stamp in the `VERSION_KEY` item, which is set to the
+`updated_at` of the change.
+
+Each container compiles the items into a set of teams and a map of team => set of channels. It
+checks the version stamp at most every `refresh_interval_seconds` and only reads the items updated
+since the version it already has, with a Query on the `UPDATES_INDEX` index (partition key
+`entry_type`, sort key `updated_at`), so a refresh reads only the changed items rather than the
+whole table. Teams and channels given in the environment are also allowed, unless the team is
+disabled in the table.
+"""
+import logging
+import os
+import time
+
+DEFAULT_REFRESH_INTERVAL_SECONDS = int(os.environ.get("AccessControlRefreshSeconds", "60"))
+VERSION_KEY = "#version"
+ENTRY_TYPE = "team"
+UPDATES_INDEX = "entry_type-updated_at-index"
+
+
+class AccessControl:
+    def __init__(
+        self,
+        table=None,
+        static_team_ids=(),
+        static_channel_ids=(),
+        refresh_interval_seconds=DEFAULT_REFRESH_INTERVAL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.table = table
+        self.static_team_ids = frozenset(t for t in static_team_ids if t)
+        self.static_channel_ids = frozenset(c for c in static_channel_ids if c)
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.clock = clock
+        self.clear()
+
+    def check(self, team_id, channel_id):
+        """Return None if allowed, or a description of what is not allowed"""
+        team_denied = self.check_team(team_id)
+        if team_denied:
+            return team_denied
+
+        if team_id in self._teams:
+            channels = self._channels.get(team_id)
+            if channels is not None and channel_id not in channels:
+                return f"channel ID {channel_id}"
+            return None
+
+        if channel_id not in self.static_channel_ids:
+            return f"channel ID {channel_id}"
+
+    def check_team(self, team_id):
+        """Return None if the team is allowed in some channel, or a description of what is not"""
+        self.refresh()
+
+        if team_id in self._disabled_teams:
+            return f"team ID {team_id}"
+        if team_id not in self._teams and team_id not in self.static_team_ids:
+            return f"team ID {team_id}"
+
+    def refresh(self, force=False):
+        """Apply the changes made since the loaded version; keep the loaded index on errors"""
+        if self.table is None or (not force and self.clock() < self._next_refresh_at):
+            return
+
+        self._next_refresh_at = self.clock() + self.refresh_interval_seconds
+        try:
+            item = self.table.get_item(Key={"team_id": VERSION_KEY}).get("Item") or {}
+            version = int(item.get("version", 0))
+            if version <= self.version:
+                return
+
+            for item in self._query_updated_since(self.version):
+                self._apply(item)
+            self.version = version
+        except Exception as e:
+            logging.error(f"Unable to refresh the access control list: {e}")
+
+    def clear(self):
+        self.version = 0
+        self._teams = set()
+        self._channels = {}  # team_id => set of channel IDs, or None for all channels
+        self._disabled_teams = set()  # Also denied when given in the environment
+        self._next_refresh_at = 0
+
+    def _query_updated_since(self, version):
+        kwargs = {
+            "IndexName": UPDATES_INDEX,
+            "KeyConditionExpression": "entry_type = :entry_type AND updated_at > :version",
+            "ExpressionAttributeValues": {":entry_type": ENTRY_TYPE, ":version": version},
+        }
+        while True:
+            resp = self.table.query(**kwargs)
+            yield from resp.get("Items", [])
+            if "LastEvaluatedKey" not in resp:
+                return
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def _apply(self, item):
+        team_id = item["team_id"]
+        if item.get("enabled", True) is False:
+            self._teams.discard(team_id)
+            self._channels.pop(team_id, None)
+            self._disabled_teams.add(team_id)
+            return
+
+        self._disabled_teams.discard(team_id)
+        self._teams.add(team_id)
+        channel_ids = item.get("channel_ids")
+        self._channels[team_id] = frozenset(channel_ids) if channel_ids else None
@@ -0,0 +1,142 @@
+"""
+Unit tests for access_control.py
+"""
+import unittest
+from unittest.mock import MagicMock
+
+func = __import__("access_control")
+
+
+def version_item(version):
+    return {"Item": {"team_id": func.VERSION_KEY, "version": version}}
+
+
+class TestAccessControl(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.clock = MagicMock(return_value=1000.0)
+        self.access_control = func.AccessControl(
+            self.table,
+            static_team_ids=["T0000000000"],
+            static_channel_ids=["C0000000000"],
+            refresh_interval_seconds=60,
+            clock=self.clock,
+        )
+
+    def test_check_without_table(self):
+        access_control = func.AccessControl(
+            None, static_team_ids=["T1", ""], static_channel_ids=["C1"]
+        )
+        self.assertIsNone(access_control.check("T1", "C1"))
+        self.assertEqual(access_control.check("T2", "C1"), "team ID T2")
+        self.assertEqual(access_control.check("T1", "C2"), "channel ID C2")
+        self.assertEqual(access_control.check("", "C1"), "team ID ")
+
+    def test_check_table_and_static(self):
+        self.table.get_item.return_value = version_item(100)
+        self.table.query.return_value = {
+            "Items": [
+                {"team_id": "T1", "channel_ids": {"C1", "C2"}, "updated_at": 90},
+                {"team_id": "T2", "updated_at": 100},
+            ]
+        }
+
+        self.assertIsNone(self.access_control.check("T1", "C2"))
+        self.assertEqual(self.access_control.check("T1", "C3"), "channel ID C3")
+        # A team without channel_ids may use any channel
+        self.assertIsNone(self.access_control.check("T2", "C3"))
+        # Teams and channels given in the environment are still allowed
+        self.assertIsNone(self.access_control.check("T0000000000", "C0000000000"))
+        self.assertEqual(self.access_control.check("T3", "C1"), "team ID T3")
+
+        self.table.query.assert_called_once_with(
+            IndexName="entry_type-updated_at-index",
+            KeyConditionExpression="entry_type = :entry_type AND updated_at > :version",
+            ExpressionAttributeValues={":entry_type": "team", ":version": 0},
+        )
+
+    def test_check_team(self):
+        self.table.get_item.return_value = version_item(100)
+        self.table.query.return_value = {
+            "Items": [
+                {"team_id": "T1", "channel_ids": {"C1"}, "updated_at": 90},
+                {"team_id": "T2", "enabled": False, "updated_at": 100},
+            ]
+        }
+
+        self.assertIsNone(self.access_control.check_team("T1"))
+        self.assertIsNone(self.access_control.check_team("T0000000000"))
+        self.assertEqual(self.access_control.check_team("T2"), "team ID T2")
+        self.assertEqual(self.access_control.check_team("T3"), "team ID T3")
+        self.assertEqual(self.table.get_item.call_count, 1)
+
+    def test_disabled_team_in_environment(self):
+        self.table.get_item.return_value = version_item(100)
+        self.table.query.return_value = {
+            "Items": [{"team_id": "T0000000000", "enabled": False, "updated_at": 100}]
+        }
+
+        # Disabled in the table, so denied although given in the environment
+        self.assertEqual(self.access_control.check_team("T0000000000"), "team ID T0000000000")
+        self.assertEqual(
+            self.access_control.check("T0000000000", "C0000000000"), "team ID T0000000000"
+        )
+
+        self.clock.return_value += 60
+        self.table.get_item.return_value = version_item(200)
+        self.table.query.return_value = {"Items": [{"team_id": "T0000000000", "updated_at": 200}]}
+        self.assertIsNone(self.access_control.check("T0000000000", "C0000000000"))
+
+    def test_refresh_incremental(self):
+        self.table.get_item.return_value = version_item(100)
+        self.table.query.return_value = {"Items": [{"team_id": "T1", "updated_at": 100}]}
+        self.assertIsNone(self.access_control.check("T1", "C1"))
+
+        # Not checked again within the refresh interval
+        self.clock.return_value += 59
+        self.access_control.check("T1", "C1")
+        self.assertEqual(self.table.get_item.call_count, 1)
+
+        # Unchanged version, no query
+        self.clock.return_value += 1
+        self.access_control.check("T1", "C1")
+        self.assertEqual(self.table.get_item.call_count, 2)
+        self.assertEqual(self.table.query.call_count, 1)
+
+        # Only the changes since the loaded version are read
+        self.clock.return_value += 60
+        self.table.get_item.return_value = version_item(200)
+        self.table.query.return_value = {
+            "Items": [
+                {"team_id": "T1", "enabled": False, "updated_at": 150},
+                {"team_id": "T2", "channel_ids": {"C2"}, "updated_at": 200},
+            ]
+        }
+        self.assertEqual(self.access_control.check("T1", "C1"), "team ID T1")
+        self.assertIsNone(self.access_control.check("T2", "C2"))
+        self.assertEqual(self.table.query.call_args[1]["ExpressionAttributeValues"][":version"], 100)
+
+    def test_refresh_paginated(self):
+        self.table.get_item.return_value = version_item(100)
+        self.table.query.side_effect = [
+            {"Items": [{"team_id": "T1", "updated_at": 10}], "LastEvaluatedKey": {"team_id": "T1"}},
+            {"Items": [{"team_id": "T2", "updated_at": 20}]},
+        ]
+
+        self.access_control.refresh()
+        self.assertIsNone(self.access_control.check("T2", "C1"))
+        self.assertEqual(self.table.query.call_args[1]["ExclusiveStartKey"], {"team_id": "T1"})
+
+    def test_refresh_error_keeps_index(self):
+        self.table.get_item.return_value = version_item(100)
+        self.table.query.return_value = {"Items": [{"team_id": "T1", "updated_at": 100}]}
+        self.access_control.refresh()
+
+        self.clock.return_value += 60
+        self.table.get_item.side_effect = Exception("Service unavailable")
+        self.assertIsNone(self.access_control.check("T1", "C1"))
+        self.assertEqual(self.access_control.version, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Registry of the commands handled by AsyncWorker and SyncWorker.
+
+Each command declares its trigger (the leading word(s) of the text extracted by ImmediateResponse),
+whether it is sync-capable, and the module implementing it. The triggers are compiled into a prefix
+trie of words once per container, so matching does not import anything; a command module is only
+imported the first time the command is dispatched, so the cold start cost of a worker scales with
+the commands it actually runs, not with the number of commands installed.
+
+A command module provides `run(request, args)`, returning the text to reply with. `request` is the
+worker payload and `args` is the text following the trigger.
+"""
+import importlib
+import logging
+from dataclasses import dataclass
+
+SYNC = "sync"
+ASYNC = "async"
+
+
+@dataclass(frozen=True)
+class Command:
+    trigger: str
+    mode: str
+    module: str
+    cost_ms: int = 0  # Estimated time to run a sync-capable command
+    description: str = ""
+
+
+COMMANDS = [
+    Command("help", SYNC, "commands.help", cost_ms=100, description="List the commands"),
+    Command("sync", SYNC, "commands.echo", cost_ms=300, description="Echo the text from SyncWorker"),
+]
+DEFAULT_COMMAND = Command("", ASYNC, "commands.echo", description="Echo the text")
+
+
+class CommandRegistry:
+    def __init__(self, commands, default=DEFAULT_COMMAND):
+        self.commands = list(commands)
+        self.default = default
+        self._trie = {}
+        self._handlers = {}  # module => run function, filled on first dispatch
+        for command in self.commands:
+            node = self._trie
+            for word in command.trigger.lower().split():
+                node = node.setdefault(word, {})
+            node[None] = command
+
+    def match(self, text):
+        """Return the command with the longest trigger matching the text, and the remaining text"""
+        words = (text or "").split()
+        command, matched = self.default, 0
+        node = self._trie
+        for i, word in enumerate(words):
+            node = node.get(word.lower())
+            if node is None:
+                break
+            if None in node:
+                command, matched = node[None], i + 1
+        return command, " ".join(words[matched:])
+
+    def handler(self, command):
+        """Import the module of the command on first use"""
+        run = self._handlers.get(command.module)
+        if run is None:
+            logging.info(f"Loading command module {command.module}")
+            run = importlib.import_module(command.module).run
+            self._handlers[command.module] = run
+        return run
+
+    def dispatch(self, request):
+        """Run the command matching the text of a worker payload; return the reply text"""
+        command, args = self.match(request.get("text"))
+        return self.handler(command)(request, args)
+
+    def clear(self):
+        self._handlers.clear()
+
+
+registry = CommandRegistry(COMMANDS)
@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+func = __import__("command_registry")
+
+REQUEST = {"user_id": "U2222222222", "text": " sync what"}
+
+
+class TestFunction(unittest.TestCase):
+    def setUp(self):
+        self.registry = func.CommandRegistry(
+            [
+                func.Command("report", func.ASYNC, "commands.report"),
+                func.Command("report weekly", func.ASYNC, "commands.weekly"),
+                func.Command("ping", func.SYNC, "commands.ping", cost_ms=50),
+            ]
+        )
+
+    def test_match_longest_trigger(self):
+        command, args = self.registry.match(" Report weekly  for team")
+        self.assertEqual(command.module, "commands.weekly")
+        self.assertEqual(args, "for team")
+
+        command, args = self.registry.match("report daily")
+        self.assertEqual(command.module, "commands.report")
+        self.assertEqual(args, "daily")
+
+    def test_match_default(self):
+        for text in [" what\nline 2", "pingpong", "", None]:
+            command, _ = self.registry.match(text)
+            self.assertEqual(command, func.DEFAULT_COMMAND)
+
+    def test_dispatch_imports_module_on_first_use_only(self):
+        module = MagicMock()
+        module.run.return_value = "pong"
+
+        with patch("command_registry.importlib.import_module", return_value=module) as mock_import:
+            self.assertEqual(self.registry.dispatch({"text": "ping"}), "pong")
+            self.assertEqual(self.registry.dispatch({"text": "ping now"}), "pong")
+
+            mock_import.assert_called_once_with("commands.ping")
+            module.run.assert_called_with({"text": "ping now"}, "now")
+
+    def test_match_does_not_import(self):
+        with patch("command_registry.importlib.import_module") as mock_import:
+            self.registry.match("report weekly")
+            mock_import.assert_not_called()
+
+    def test_default_registry(self):
+        func.registry.clear()
+        self.assertEqual(func.registry.dispatch(REQUEST), "<@U2222222222> said ` sync what`")
+        self.assertIn("`sync`", func.registry.dispatch({"text": "help"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
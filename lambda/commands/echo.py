@@ -0,0 +1,7 @@
+"""
+Echo the text of the mention back to the user.
+"""
+
+
+def run(request, args):
+    return f"<@{request['user_id']}> said `{request.get('text')}`"
@@ -0,0 +1,9 @@
+"""
+List the commands of the app.
+"""
+from command_registry import registry
+
+
+def run(request, args):
+    lines = [f"`{c.trigger}` {c.description}".rstrip() for c in registry.commands]
+    return "\n".join(["Commands:"] + lines)
@@ -0,0 +1,80 @@
+"""
+De-duplicate Slack event deliveries by `event_id`.
+
+Slack retries an event (with `X-Slack-Retry-Num`) when it has not been acknowledged within 3 seconds.
+A small in-process set of recent IDs catches retries landing on the same container, and a
+conditional write to a DynamoDB table (with TTL) catches retries landing on any other container.
+The ID is recorded before the event is handled, so a retry arriving while it is still being handled
+is skipped, and released when handling it failed, so that the next retry is handled.
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("EventDedupTtlSeconds", "3600"))
+DEFAULT_MAX_LOCAL_IDS = 1024
+
+
+class EventDeduplicator:
+    def __init__(
+        self,
+        table=None,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        max_local_ids=DEFAULT_MAX_LOCAL_IDS,
+        clock=time.time,
+    ):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_local_ids = max_local_ids
+        self.clock = clock
+        self._recent = OrderedDict()
+
+    def is_duplicate(self, event_id):
+        """Record the event ID and return True if it has been seen before"""
+        if not event_id:
+            return False
+
+        if event_id in self._recent:
+            return True
+
+        self._recent[event_id] = None
+        while len(self._recent) > self.max_local_ids:
+            self._recent.popitem(last=False)
+
+        if self.table is None:
+            return False
+
+        try:
+            self.table.put_item(
+                Item={"event_id": event_id, "expires_at": int(self.clock()) + self.ttl_seconds},
+                ConditionExpression="attribute_not_exists(event_id)",
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return True
+            logging.error(f"Unable to record event {event_id}: {e}")
+        except Exception as e:
+            # Fail open, processing an event twice is better than dropping it
+            logging.error(f"Unable to record event {event_id}: {e}")
+
+        return False
+
+    def release(self, event_id):
+        """Forget an event ID whose handling failed"""
+        if not event_id:
+            return
+
+        self._recent.pop(event_id, None)
+        if self.table is None:
+            return
+
+        try:
+            self.table.delete_item(Key={"event_id": event_id})
+        except Exception as e:
+            logging.error(f"Unable to release event {event_id}: {e}")
+
+    def clear(self):
+        self._recent.clear()
@@ -0,0 +1,69 @@
+"""
+Unit tests for event_dedup.py
+"""
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+func = __import__("event_dedup")
+
+
+def conditional_check_failed_error(operation):
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+        operation,
+    )
+
+
+class TestEventDeduplicator(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.dedup = func.EventDeduplicator(self.table, ttl_seconds=3600, clock=lambda: 1000)
+
+    def test_first_delivery(self):
+        self.assertFalse(self.dedup.is_duplicate("Ev1"))
+        self.table.put_item.assert_called_once_with(
+            Item={"event_id": "Ev1", "expires_at": 4600},
+            ConditionExpression="attribute_not_exists(event_id)",
+        )
+
+    def test_retry_on_same_container(self):
+        self.dedup.is_duplicate("Ev1")
+        self.assertTrue(self.dedup.is_duplicate("Ev1"))
+        self.table.put_item.assert_called_once()
+
+    def test_retry_on_other_container(self):
+        self.table.put_item.side_effect = conditional_check_failed_error("PutItem")
+        self.assertTrue(self.dedup.is_duplicate("Ev1"))
+
+    def test_fail_open_when_table_unavailable(self):
+        self.table.put_item.side_effect = Exception("Service unavailable")
+        self.assertFalse(self.dedup.is_duplicate("Ev1"))
+
+    def test_release_after_failure(self):
+        self.dedup.is_duplicate("Ev1")
+        self.dedup.release("Ev1")
+
+        self.table.delete_item.assert_called_once_with(Key={"event_id": "Ev1"})
+        self.assertFalse(self.dedup.is_duplicate("Ev1"))
+        self.assertEqual(self.table.put_item.call_count, 2)
+
+    def test_release_error(self):
+        self.table.delete_item.side_effect = Exception("Service unavailable")
+        self.dedup.release("Ev1")
+        self.dedup.release(None)
+        self.table.delete_item.assert_called_once()
+
+    def test_local_only(self):
+        dedup = func.EventDeduplicator(table=None, max_local_ids=2)
+        self.assertFalse(dedup.is_duplicate("Ev1"))
+        self.assertTrue(dedup.is_duplicate("Ev1"))
+        self.assertFalse(dedup.is_duplicate(None))
+        dedup.is_duplicate("Ev2")
+        dedup.is_duplicate("Ev3")
+        self.assertFalse(dedup.is_duplicate("Ev1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Per-invocation timings and counts, written to stdout once per invocation in the CloudWatch
+Embedded Metric Format (EMF), so CloudWatch extracts the metrics from the logs without any API call.
+
+- `timed(name)` records the duration of each call of the wrapped function as `<name>.duration`,
+  and counts the calls as `<name>.count` by outcome (`error` if it raised).
+- `count(name, team_id, outcome)` counts events, e.g. requests by team and outcome.
+- `flush_after` writes and resets the metrics of the invocation when the handler returns.
+
+For the format see
+https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+import functools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+DEFAULT_NAMESPACE = os.environ.get("MetricsNamespace", "SlackChatApp")
+METRICS_ENABLED = os.environ.get("MetricsEnabled", "true") == "true"
+MAX_VALUES_PER_METRIC = 100  # EMF limit of values in one metric array
+
+
+class Metrics:
+    def __init__(
+        self,
+        service,
+        namespace=DEFAULT_NAMESPACE,
+        enabled=METRICS_ENABLED,
+        stream=None,
+        clock=time.perf_counter,
+    ):
+        self.service = service
+        self.namespace = namespace
+        self.enabled = enabled
+        self.stream = stream
+        self.clock = clock
+        self.clear()
+
+    def record_time(self, name, elapsed_ms):
+        self._timings[name].append(round(elapsed_ms, 3))
+
+    def count(self, name, team_id=None, outcome=None, value=1):
+        self._counts[(team_id, outcome)][name] += value
+
+    def timed(self, name, outcome=None):
+        """
+        Decorator timing each call of a function; `outcome(result)` names the outcome of a call,
+        "ok" by default.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started_at = self.clock()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    self._record_call(name, started_at, "error")
+                    raise
+                self._record_call(name, started_at, outcome(result) if outcome else "ok")
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def flush_after(self, handler):
+        """Decorator flushing the metrics when a Lambda handler returns or raises"""
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                self.flush()
+
+        return wrapper
+
+    def flush(self):
+        """Write the metrics recorded since the last flush as EMF documents, one per line"""
+        try:
+            if self.enabled:
+                stream = self.stream or sys.stdout
+                for doc in self.documents():
+                    stream.write(json.dumps(doc) + "\n")
+                stream.flush()
+        finally:
+            self.clear()
+
+    def documents(self):
+        timestamp = int(time.time() * 1000)
+        docs = []
+
+        if self._timings:
+            doc = self._document(timestamp, [["Service"]], {}, "Milliseconds", self._timings)
+            docs.append(doc)
+
+        for (team_id, outcome), counts in self._counts.items():
+            dimensions = {}
+            if outcome is not None:
+                dimensions["Outcome"] = outcome
+            if team_id is not None:
+                dimensions["TeamId"] = team_id
+            dimension_sets = [["Service", *dimensions]]
+            if "TeamId" in dimensions and len(dimensions) > 1:
+                # Also aggregate by outcome across teams
+                dimension_sets.append(["Service", "Outcome"])
+            docs.append(self._document(timestamp, dimension_sets, dimensions, "Count", counts))
+
+        return docs
+
+    def clear(self):
+        self._timings = defaultdict(list)
+        self._counts = defaultdict(lambda: defaultdict(int))
+
+    def _record_call(self, name, started_at, outcome):
+        self.record_time(f"{name}.duration", (self.clock() - started_at) * 1000)
+        self.count(f"{name}.count", outcome=outcome)
+
+    def _document(self, timestamp, dimension_sets, dimensions, unit, values):
+        doc = {
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": dimension_sets,
+                        "Metrics": [{"Name": name, "Unit": unit} for name in values],
+                    }
+                ],
+            },
+            "Service": self.service,
+            **dimensions,
+        }
+        for name, value in values.items():
+            doc[name] = value[-MAX_VALUES_PER_METRIC:] if isinstance(value, list) else value
+        return doc
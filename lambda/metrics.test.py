@@ -0,0 +1,101 @@
+"""
+Unit tests for metrics.py
+"""
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock
+
+func = __import__("metrics")
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.clock = MagicMock(return_value=1000.0)
+        self.metrics = func.Metrics("TestService", namespace="TestNamespace", enabled=True, clock=self.clock)
+
+    def flush(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.metrics.flush()
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_timed(self):
+        @self.metrics.timed("lookup", outcome=lambda result: "ok" if result else "missing")
+        def lookup(value):
+            self.clock.return_value += 0.025
+            return value
+
+        self.assertEqual(lookup("x"), "x")
+        lookup(None)
+
+        timings, ok, missing = self.flush()
+        self.assertEqual(timings["lookup.duration"], [25.0, 25.0])
+        self.assertEqual(timings["Service"], "TestService")
+        self.assertEqual(
+            timings["_aws"]["CloudWatchMetrics"],
+            [
+                {
+                    "Namespace": "TestNamespace",
+                    "Dimensions": [["Service"]],
+                    "Metrics": [{"Name": "lookup.duration", "Unit": "Milliseconds"}],
+                }
+            ],
+        )
+        self.assertEqual((ok["Outcome"], ok["lookup.count"]), ("ok", 1))
+        self.assertEqual((missing["Outcome"], missing["lookup.count"]), ("missing", 1))
+        self.assertEqual(missing["_aws"]["CloudWatchMetrics"][0]["Dimensions"], [["Service", "Outcome"]])
+
+    def test_timed_error(self):
+        @self.metrics.timed("post")
+        def post():
+            raise RuntimeError("Connection reset")
+
+        with self.assertRaises(RuntimeError):
+            post()
+
+        _, error = self.flush()
+        self.assertEqual((error["Outcome"], error["post.count"]), ("error", 1))
+
+    def test_count_by_team_and_outcome(self):
+        self.metrics.count("mentions", "T1", "async")
+        self.metrics.count("mentions", "T1", "async")
+        self.metrics.count("mentions", "T2", "unauthorized")
+        self.metrics.count("mentions", outcome="invalid_signature")
+
+        docs = self.flush()
+        self.assertEqual(
+            [(d.get("TeamId"), d["Outcome"], d["mentions"]) for d in docs],
+            [("T1", "async", 2), ("T2", "unauthorized", 1), (None, "invalid_signature", 1)],
+        )
+        self.assertEqual(
+            docs[0]["_aws"]["CloudWatchMetrics"][0]["Dimensions"],
+            [["Service", "Outcome", "TeamId"], ["Service", "Outcome"]],
+        )
+
+    def test_flush_after_once_per_invocation(self):
+        @self.metrics.flush_after
+        def handler(event, context):
+            self.metrics.count("requests", outcome="ok")
+            return {"statusCode": 200}
+
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(handler({}, None), {"statusCode": 200})
+            handler({}, None)
+        docs = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([d["requests"] for d in docs], [1, 1])
+
+    def test_flush_empty_or_disabled(self):
+        self.assertEqual(self.flush(), [])
+
+        self.metrics.enabled = False
+        self.metrics.count("requests")
+        self.assertEqual(self.flush(), [])
+        self.metrics.enabled = True
+        self.assertEqual(self.flush(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
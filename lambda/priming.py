@@ -0,0 +1,69 @@
+"""
+Opt-in priming of a handler during the Lambda INIT phase (`InitPriming=true`).
+
+Each step, e.g. prefetching secrets or opening the TLS connection to slack.com, runs in its own
+thread with its own timeout while the module is imported, so the first event does not pay for it.
+A step that fails or times out is only logged; the handler then does the work on first use as usual.
+"""
+import logging
+import os
+import threading
+import time
+
+PRIMING_ENABLED = os.environ.get("InitPriming") == "true"
+DEFAULT_STEP_TIMEOUT_SECONDS = float(os.environ.get("InitPrimingStepTimeoutSeconds", "2.0"))
+
+
+class PrimingStep(threading.Thread):
+    def __init__(self, name, func, timeout_seconds):
+        super().__init__(name=f"priming-{name}", daemon=True)
+        self.step_name = name
+        self.func = func
+        self.timeout_seconds = timeout_seconds
+        self.result = "timeout"
+        self.elapsed_ms = None
+
+    def run(self):
+        started_at = time.perf_counter()
+        try:
+            self.func()
+            self.result = "ok"
+        except Exception as e:
+            self.result = f"error: {e}"
+        finally:
+            self.elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+
+def prime(steps, timeout_seconds=DEFAULT_STEP_TIMEOUT_SECONDS, enabled=None):
+    """
+    Run the (name, callable[, timeout_seconds]) steps concurrently, waiting for each up to its timeout.
+    Return step name => (result, elapsed ms); the elapsed time is None if the step timed out.
+    """
+    if not (PRIMING_ENABLED if enabled is None else enabled):
+        return {}
+
+    started_at = time.perf_counter()
+    threads = [
+        PrimingStep(step[0], step[1], step[2] if len(step) > 2 else timeout_seconds)
+        for step in steps
+        if step[1]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(0.0, started_at + thread.timeout_seconds - time.perf_counter()))
+
+    report = {t.step_name: (t.result, t.elapsed_ms) for t in threads}
+    logging.info(
+        "Init priming: "
+        + " ".join(
+            f"{name}={result}" + (f"({elapsed:.1f}ms)" if elapsed is not None else "")
+            for name, (result, elapsed) in report.items()
+        )
+    )
+    return report
+
+
+def warm_connection(http, url, timeout_seconds=DEFAULT_STEP_TIMEOUT_SECONDS):
+    """Open a keep-alive connection (DNS, TCP and TLS) to the host of the URL in the pool"""
+    http.request("HEAD", url, timeout=timeout_seconds, retries=False)
@@ -0,0 +1,44 @@
+"""
+Unit tests for priming.py
+"""
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+func = __import__("priming")
+
+
+class TestPriming(unittest.TestCase):
+    def test_prime_disabled(self):
+        step = MagicMock()
+        self.assertEqual(func.prime([("step", step)], enabled=False), {})
+        step.assert_not_called()
+
+    def test_prime_steps(self):
+        release = threading.Event()
+        steps = [
+            ("ok", MagicMock()),
+            ("error", MagicMock(side_effect=Exception("Access denied"))),
+            ("timeout", lambda: release.wait(5), 0.05),
+            ("skipped", None),
+        ]
+
+        report = func.prime(steps, timeout_seconds=1.0, enabled=True)
+        release.set()
+
+        self.assertEqual(sorted(report), ["error", "ok", "timeout"])
+        self.assertEqual(report["ok"][0], "ok")
+        self.assertGreaterEqual(report["ok"][1], 0)
+        self.assertEqual(report["error"][0], "error: Access denied")
+        self.assertEqual(report["timeout"], ("timeout", None))
+
+    def test_warm_connection(self):
+        http = MagicMock()
+        func.warm_connection(http, "https://slack.com/api", timeout_seconds=1.5)
+        http.request.assert_called_once_with(
+            "HEAD", "https://slack.com/api", timeout=1.5, retries=False
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Opt-in CPU and memory profiling of a sampled share of the invocations of a Lambda handler.
+
+- `ProfilingSampleRate` (0 to 1, 0 by default) sets the share of invocations that are profiled,
+  e.g. `0.01` for one in a hundred. With 0 the handler is called as is, at no cost.
+- A profiled invocation runs under cProfile and tracemalloc, and its summary holds the functions
+  with the most cumulative time, the peak of the memory allocated during the invocation, and the
+  lines that allocated the most memory still held when it returns (growth of a warm container).
+- `ProfilingOutput` selects where the summaries go: `log` (default) writes each as one JSON line to
+  stdout, a directory writes `<service>-<request id>.json` and the full cProfile stats
+  `<service>-<request id>.pstats` there, e.g. `/tmp/profiles`.
+- `ProfilingTop` sets the number of functions and allocators in a summary, 15 by default.
+
+The full stats of a file can be browsed with `python -m pstats <file>.pstats`.
+"""
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+PROFILING_SAMPLE_RATE = float(os.environ.get("ProfilingSampleRate") or 0)
+PROFILING_OUTPUT = os.environ.get("ProfilingOutput") or "log"
+PROFILING_TOP = int(os.environ.get("ProfilingTop") or 15)
+TRACEMALLOC_FRAMES = 1
+
+logger = logging.getLogger(__name__)
+
+
+def top_functions(profile, top):
+    """The `top` functions with the most cumulative time, in ms"""
+    stats = pstats.Stats(profile).stats
+    ordered = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in ordered[:top]
+    ]
+
+
+def top_allocators(snapshot, top):
+    """The `top` lines holding the most memory allocated during the invocation, in KiB"""
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [
+        {
+            "line": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            "size_kib": round(stat.size / 1024, 1),
+            "blocks": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:top]
+    ]
+
+
+def max_rss_kib():
+    # ru_maxrss is in KiB on Linux, as in Lambda
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Profiler:
+    def __init__(
+        self,
+        service,
+        sample_rate=PROFILING_SAMPLE_RATE,
+        output=PROFILING_OUTPUT,
+        top=PROFILING_TOP,
+        draw=random.random,
+        stream=None,
+        clock=time.perf_counter,
+    ):
+        self.service = service
+        self.sample_rate = sample_rate
+        self.output = output
+        self.top = top
+        self.draw = draw
+        self.stream = stream
+        self.clock = clock
+        self.invocations = 0
+
+    def profiled(self, handler):
+        """Decorator profiling a sampled share of the invocations of a Lambda handler"""
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            self.invocations += 1
+            if not self.sample_rate or self.draw() >= self.sample_rate:
+                return handler(event, context)
+            return self.profile(handler, event, context)
+
+        return wrapper
+
+    def profile(self, handler, event, context):
+        profile = cProfile.Profile()
+        tracing_memory = not tracemalloc.is_tracing()
+        if tracing_memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        started_at = self.clock()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active, e.g. a debugger; profile the memory only
+            profile = None
+        try:
+            return handler(event, context)
+        finally:
+            if profile:
+                profile.disable()
+            duration_ms = (self.clock() - started_at) * 1000
+            snapshot, peak = None, None
+            if tracing_memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            self.emit(self.summary(context, duration_ms, profile, snapshot, peak), profile, context)
+
+    def summary(self, context, duration_ms, profile, snapshot, peak):
+        return {
+            "profile": self.service,
+            "aws_request_id": getattr(context, "aws_request_id", None),
+            "invocation": self.invocations,
+            "duration_ms": round(duration_ms, 3),
+            "max_rss_kib": max_rss_kib(),
+            "cpu": top_functions(profile, self.top) if profile else [],
+            "memory": {
+                "peak_kib": round(peak / 1024, 1) if peak is not None else None,
+                "top_allocators": top_allocators(snapshot, self.top) if snapshot else [],
+            },
+        }
+
+    def emit(self, summary, profile, context):
+        try:
+            if self.output == "log":
+                stream = self.stream or sys.stdout
+                stream.write(json.dumps(summary) + "\n")
+                stream.flush()
+                return
+
+            os.makedirs(self.output, exist_ok=True)
+            name = f"{self.service}-{getattr(context, 'aws_request_id', None) or int(time.time() * 1000)}"
+            with open(os.path.join(self.output, f"{name}.json"), "w") as f:
+                f.write(json.dumps(summary, indent=2) + "\n")
+            if profile:
+                profile.dump_stats(os.path.join(self.output, f"{name}.pstats"))
+        except Exception as e:
+            # Profiling must never fail the invocation
+            logger.error(f"Failed to write the profile of {self.service}: {e}")
@@ -0,0 +1,122 @@
+"""
+Unit tests for profiling.py
+"""
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock
+
+func = __import__("profiling")
+
+
+class MockContext:
+    aws_request_id = "dummy_request_id"
+
+
+def handler(event, context):
+    # Some work and some memory still held when the invocation returns
+    event["held"] = [bytearray(64 * 1024) for _ in range(4)]
+    return {"statusCode": 200, "total": sum(range(1000))}
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.clock = MagicMock(return_value=1000.0)
+
+    def profiler(self, **kwargs):
+        return func.Profiler("TestService", stream=self.stream, clock=self.clock, **kwargs)
+
+    def summaries(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_disabled(self):
+        draws = []
+        profiled = self.profiler(sample_rate=0, draw=lambda: draws.append(1) or 0.0).profiled(handler)
+
+        self.assertEqual(profiled({}, MockContext())["statusCode"], 200)
+        self.assertEqual(draws, [])
+        self.assertEqual(self.summaries(), [])
+
+    def test_not_sampled(self):
+        profiled = self.profiler(sample_rate=0.1, draw=lambda: 0.5).profiled(handler)
+
+        self.assertEqual(profiled({}, MockContext())["statusCode"], 200)
+        self.assertEqual(self.summaries(), [])
+
+    def test_sampled(self):
+        profiler = self.profiler(sample_rate=0.1, top=5, draw=lambda: 0.05)
+
+        @profiler.profiled
+        def timed_handler(event, context):
+            self.clock.return_value += 0.25
+            return handler(event, context)
+
+        self.assertEqual(timed_handler({}, MockContext())["statusCode"], 200)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        (summary,) = self.summaries()
+        self.assertEqual(summary["profile"], "TestService")
+        self.assertEqual(summary["aws_request_id"], "dummy_request_id")
+        self.assertEqual(summary["invocation"], 1)
+        self.assertEqual(summary["duration_ms"], 250.0)
+        self.assertGreater(summary["max_rss_kib"], 0)
+
+        self.assertEqual(len(summary["cpu"]), 5)
+        self.assertIn("timed_handler", summary["cpu"][0]["function"])
+        self.assertTrue(any("handler" in f["function"] for f in summary["cpu"][1:]))
+
+        memory = summary["memory"]
+        self.assertGreaterEqual(memory["peak_kib"], 256)
+        top = memory["top_allocators"][0]
+        self.assertTrue(top["line"].startswith("profiling.test.py:"))
+        self.assertGreaterEqual(top["size_kib"], 256)
+
+    def test_handler_error(self):
+        @self.profiler(sample_rate=1).profiled
+        def failing_handler(event, context):
+            raise RuntimeError("Connection reset")
+
+        with self.assertRaises(RuntimeError):
+            failing_handler({}, MockContext())
+        self.assertEqual(len(self.summaries()), 1)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_tracemalloc_already_tracing(self):
+        tracemalloc.start()
+        try:
+            self.profiler(sample_rate=1).profiled(handler)({}, MockContext())
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+        (summary,) = self.summaries()
+        self.assertIsNone(summary["memory"]["peak_kib"])
+        self.assertTrue(summary["cpu"])
+
+    def test_output_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "profiles")
+            self.profiler(sample_rate=1, output=output).profiled(handler)({}, MockContext())
+
+            self.assertEqual(
+                sorted(os.listdir(output)),
+                ["TestService-dummy_request_id.json", "TestService-dummy_request_id.pstats"],
+            )
+            with open(os.path.join(output, "TestService-dummy_request_id.json")) as f:
+                self.assertEqual(json.load(f)["profile"], "TestService")
+        self.assertEqual(self.stream.getvalue(), "")
+
+    def test_output_error(self):
+        with tempfile.NamedTemporaryFile() as not_a_directory:
+            profiled = self.profiler(sample_rate=1, output=not_a_directory.name).profiled(handler)
+            with self.assertLogs("profiling", "ERROR") as logs:
+                self.assertEqual(profiled({}, MockContext())["statusCode"], 200)
+        self.assertIn("Failed to write the profile of TestService", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+Per-workspace rate limiter for Slack Web API calls, shared by concurrent Lambda containers.
+
+Each (team_id, method) pair gets a bucket of tokens that is refilled every `window_seconds`, sized
+just under Slack's rate limit of the method in a workspace. Methods also limited per channel, e.g.
+chat.postMessage at about 1 message per second, take a token from a bucket per (team_id,
+channel_id, method) refilled every second as well. Tokens are taken from a bucket with an atomic
+counter on a DynamoDB item per window, a few at a time, and handed out from memory until the local
+lease runs out. Without a table, the buckets are only kept in memory.
+"""
+import logging
+import math
+import os
+import time
+
+from botocore.exceptions import ClientError
+from slack_client import PER_CHANNEL_RATE_LIMITS, rate_limit_per_minute
+
+DEFAULT_WINDOW_SECONDS = 10
+DEFAULT_HEADROOM = 0.9  # Stay just under Slack's limits
+DEFAULT_LEASE_SIZE = int(os.environ.get("RateLimitLeaseSize", "2"))
+DEFAULT_MAX_WAIT_SECONDS = 30.0
+PER_CHANNEL_WINDOW_SECONDS = 1
+MAX_LEASES = 1000  # Leases of past windows are dropped beyond this, e.g. with many channels
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        table=None,
+        window_seconds=DEFAULT_WINDOW_SECONDS,
+        headroom=DEFAULT_HEADROOM,
+        lease_size=DEFAULT_LEASE_SIZE,
+        max_wait_seconds=DEFAULT_MAX_WAIT_SECONDS,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        self.table = table
+        self.window_seconds = window_seconds
+        self.headroom = headroom
+        self.lease_size = lease_size
+        self.max_wait_seconds = max_wait_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self._leases = {}  # (scope, method) => [window, tokens left, window length in seconds]
+
+    def window_of(self, per_channel=False):
+        """Length of the windows of the workspace or channel buckets, in seconds"""
+        return PER_CHANNEL_WINDOW_SECONDS if per_channel else self.window_seconds
+
+    def capacity(self, method, per_channel=False):
+        """Number of tokens in a workspace or channel bucket of the method per window"""
+        per_minute = PER_CHANNEL_RATE_LIMITS[method] if per_channel else rate_limit_per_minute(method)
+        per_window = per_minute * self.window_of(per_channel) / 60 * self.headroom
+        return max(1, math.floor(per_window))
+
+    def acquire(self, team_id, method, max_wait_seconds=None, channel_id=None):
+        """
+        Take one token of the workspace, and of the channel for methods also limited per channel,
+        waiting up to `max_wait_seconds` (at most the limiter's own) in all for the next windows;
+        return False if none
+        """
+        if max_wait_seconds is None or max_wait_seconds > self.max_wait_seconds:
+            max_wait_seconds = self.max_wait_seconds
+        buckets = [(team_id, False)]
+        if method in PER_CHANNEL_RATE_LIMITS and channel_id:
+            buckets.insert(0, (f"{team_id}#{channel_id}", True))
+
+        waited = 0.0
+        for scope, per_channel in buckets:
+            window_seconds = self.window_of(per_channel)
+            while True:
+                now = self.clock()
+                window = int(now // window_seconds)
+                if self._take(scope, method, window, per_channel):
+                    break
+
+                delay = (window + 1) * window_seconds - now
+                if waited + delay > max_wait_seconds:
+                    logging.warning(f"Rate limit reached for {method} in {scope}")
+                    return False
+                self.sleep(delay)
+                waited += delay
+        return True
+
+    def clear(self):
+        self._leases.clear()
+
+    def _take(self, scope, method, window, per_channel):
+        lease = self._leases.get((scope, method))
+        if lease is None or lease[0] != window:
+            if len(self._leases) >= MAX_LEASES:
+                self._drop_past_leases()
+            # Without a table the whole bucket of the window is held in memory
+            lease = [
+                window,
+                0 if self.table is not None else self.capacity(method, per_channel),
+                self.window_of(per_channel),
+            ]
+            self._leases[(scope, method)] = lease
+
+        if lease[1] == 0 and self.table is not None:
+            lease[1] = self._lease(scope, method, window, per_channel)
+
+        if lease[1] == 0:
+            return False
+
+        lease[1] -= 1
+        return True
+
+    def _drop_past_leases(self):
+        now = self.clock()
+        self._leases = {
+            key: lease for key, lease in self._leases.items() if (lease[0] + 1) * lease[2] > now
+        }
+
+    def _lease(self, scope, method, window, per_channel):
+        """Take up to `lease_size` tokens of the window from the shared bucket"""
+        capacity = self.capacity(method, per_channel)
+        for count in sorted({min(self.lease_size, capacity), 1}, reverse=True):
+            try:
+                self.table.update_item(
+                    Key={"bucket": f"{scope}#{method}#{window}"},
+                    UpdateExpression="ADD used :count SET expires_at = :expires_at",
+                    ConditionExpression="attribute_not_exists(used) OR used <= :max_used",
+                    ExpressionAttributeValues={
+                        ":count": count,
+                        ":max_used": capacity - count,
+                        ":expires_at": (window + 2) * self.window_of(per_channel),
+                    },
+                )
+                return count
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                    logging.error(f"Unable to acquire rate limit tokens, continuing without: {e}")
+                    return 1
+            except Exception as e:
+                # Fail open, Slack's own rate limiting still applies
+                logging.error(f"Unable to acquire rate limit tokens, continuing without: {e}")
+                return 1
+        return 0
@@ -0,0 +1,143 @@
+"""
+Unit tests for rate_limiter.py
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+func = __import__("rate_limiter")
+
+
+def conditional_check_failed_error(operation):
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+        operation,
+    )
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.clock = MagicMock(return_value=1000.0)
+        self.limiter = func.RateLimiter(
+            self.table, window_seconds=10, lease_size=2, clock=self.clock, sleep=self.sleep
+        )
+
+    def sleep(self, seconds):
+        self.clock.return_value += seconds
+
+    def test_capacity_under_slack_limit(self):
+        # chat.update allows about 50 per minute, i.e. 8 per 10-second window
+        self.assertEqual(self.limiter.capacity("chat.update"), 7)
+        # chat.postMessage allows several hundred per minute in a workspace, about 1 per second per channel
+        self.assertEqual(self.limiter.capacity("chat.postMessage"), 45)
+        self.assertEqual(self.limiter.window_of(per_channel=True), 1)
+        self.assertEqual(self.limiter.capacity("chat.postMessage", per_channel=True), 1)
+
+    def test_acquire_leases_tokens_from_table(self):
+        self.assertTrue(self.limiter.acquire("T1", "chat.update"))
+        self.assertTrue(self.limiter.acquire("T1", "chat.update"))
+
+        # The second token comes from the local lease
+        self.table.update_item.assert_called_once_with(
+            Key={"bucket": "T1#chat.update#100"},
+            UpdateExpression="ADD used :count SET expires_at = :expires_at",
+            ConditionExpression="attribute_not_exists(used) OR used <= :max_used",
+            ExpressionAttributeValues={":count": 2, ":max_used": 5, ":expires_at": 1020},
+        )
+
+        self.limiter.acquire("T1", "chat.update")
+        self.assertEqual(self.table.update_item.call_count, 2)
+
+    def test_acquire_per_channel(self):
+        self.assertTrue(self.limiter.acquire("T1", "chat.postMessage", channel_id="C1"))
+        self.assertTrue(self.limiter.acquire("T1", "chat.postMessage", channel_id="C2"))
+
+        # A token of each channel, and two of the workspace leased at once
+        self.assertEqual(
+            [c.kwargs["Key"] for c in self.table.update_item.call_args_list],
+            [
+                {"bucket": "T1#C1#chat.postMessage#1000"},
+                {"bucket": "T1#chat.postMessage#100"},
+                {"bucket": "T1#C2#chat.postMessage#1000"},
+            ],
+        )
+        self.assertEqual(
+            self.table.update_item.call_args.kwargs["ExpressionAttributeValues"],
+            {":count": 1, ":max_used": 0, ":expires_at": 1002},
+        )
+
+    def test_acquire_per_channel_within_workspace_limit(self):
+        limiter = func.RateLimiter(max_wait_seconds=0, clock=self.clock, sleep=self.sleep)
+        for n in range(45):
+            self.assertTrue(limiter.acquire("T1", "chat.postMessage", channel_id=f"C{n}"))
+
+        # The workspace bucket is empty, although the channel has not been posted to
+        self.assertFalse(limiter.acquire("T1", "chat.postMessage", channel_id="C45"))
+        self.assertTrue(limiter.acquire("T2", "chat.postMessage", channel_id="C45"))
+
+    def test_acquire_waits_for_next_window(self):
+        self.table.update_item.side_effect = [
+            conditional_check_failed_error("UpdateItem"),
+            conditional_check_failed_error("UpdateItem"),
+            None,
+        ]
+        self.clock.return_value = 1004.0
+
+        self.assertTrue(self.limiter.acquire("T1", "chat.update"))
+        self.assertEqual(self.clock.return_value, 1010.0)
+        self.assertEqual(
+            self.table.update_item.call_args.kwargs["Key"], {"bucket": "T1#chat.update#101"}
+        )
+
+    def test_acquire_gives_up_after_max_wait(self):
+        self.table.update_item.side_effect = conditional_check_failed_error("UpdateItem")
+        limiter = func.RateLimiter(
+            self.table, max_wait_seconds=0.5, clock=self.clock, sleep=self.sleep
+        )
+
+        self.assertFalse(limiter.acquire("T1", "chat.update"))
+        self.assertEqual(self.clock.return_value, 1000.0)
+
+    def test_acquire_max_wait_of_call(self):
+        self.table.update_item.side_effect = conditional_check_failed_error("UpdateItem")
+        self.clock.return_value = 1004.0
+
+        # The default wait of the limiter would reach the next window, the one of the call does not
+        self.assertFalse(self.limiter.acquire("T1", "chat.update", max_wait_seconds=1.0))
+        self.assertEqual(self.clock.return_value, 1004.0)
+
+    def test_fail_open_when_table_unavailable(self):
+        self.table.update_item.side_effect = Exception("Service unavailable")
+        self.assertTrue(self.limiter.acquire("T1", "chat.update"))
+
+    def test_local_only(self):
+        limiter = func.RateLimiter(max_wait_seconds=0, clock=self.clock, sleep=self.sleep)
+        for _ in range(7):
+            self.assertTrue(limiter.acquire("T1", "chat.update"))
+        self.assertFalse(limiter.acquire("T1", "chat.update"))
+        self.assertTrue(limiter.acquire("T2", "chat.update"))
+
+        # One message per second in each channel
+        self.assertTrue(limiter.acquire("T1", "chat.postMessage", channel_id="C1"))
+        self.assertFalse(limiter.acquire("T1", "chat.postMessage", channel_id="C1"))
+        self.assertTrue(limiter.acquire("T1", "chat.postMessage", channel_id="C2"))
+        self.clock.return_value += 1
+        self.assertTrue(limiter.acquire("T1", "chat.postMessage", channel_id="C1"))
+
+    def test_past_leases_dropped(self):
+        limiter = func.RateLimiter(max_wait_seconds=0, clock=self.clock, sleep=self.sleep)
+        with patch.object(func, "MAX_LEASES", 2):
+            limiter.acquire("T1", "chat.postMessage", channel_id="C1")
+            limiter.acquire("T1", "chat.postMessage", channel_id="C2")
+            self.clock.return_value += 1
+            limiter.acquire("T1", "chat.postMessage", channel_id="C3")
+        # The lease of the workspace is still in its window
+        self.assertEqual(
+            sorted(limiter._leases), [("T1", "chat.postMessage"), ("T1#C3", "chat.postMessage")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Track the latency budget of a request that Slack expects to be acknowledged within 3 seconds.
+
+The budget starts when the handler is entered and is bounded by both Slack's deadline and the
+Lambda invocation's remaining time. Each stage checks whether its estimated cost still fits before
+running, and records the time it used.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+SLACK_ACK_DEADLINE_MS = 3000
+DEFAULT_SAFETY_MARGIN_MS = int(os.environ.get("RequestBudgetSafetyMarginMs", "500"))
+
+# Rough upper estimates of the warm latency of each stage
+DEFAULT_STAGE_ESTIMATES_MS = {
+    "ssm": 200,
+    "dynamodb": 100,
+    "invoke": 200,
+    "slack_post": 800,
+    "sync_worker": 0,  # Plus the estimated cost of the request
+    "sync_worker_cold_start": 700,  # INIT of a SyncWorker container started by an invoke
+}
+
+
+class RequestBudget:
+    def __init__(
+        self,
+        context=None,
+        deadline_ms=SLACK_ACK_DEADLINE_MS,
+        safety_margin_ms=DEFAULT_SAFETY_MARGIN_MS,
+        stage_estimates_ms=None,
+        clock=time.monotonic,
+    ):
+        self.context = context
+        self.deadline_ms = deadline_ms
+        self.safety_margin_ms = safety_margin_ms
+        self.stage_estimates_ms = stage_estimates_ms or DEFAULT_STAGE_ESTIMATES_MS
+        self.clock = clock
+        self.started_at = clock()
+        self.timings = {}
+
+    def elapsed_ms(self):
+        return (self.clock() - self.started_at) * 1000
+
+    def remaining_ms(self):
+        """Milliseconds left before the deadline, less the safety margin"""
+        remaining = self.deadline_ms - self.elapsed_ms()
+        if self.context is not None:
+            remaining = min(remaining, self.context.get_remaining_time_in_millis())
+        return remaining - self.safety_margin_ms
+
+    def can_afford(self, stage_name, extra_ms=0):
+        """Return True if the estimated cost of the stage (plus extra_ms) fits in the remaining budget"""
+        return self.remaining_ms() >= self.stage_estimates_ms.get(stage_name, 0) + extra_ms
+
+    @contextmanager
+    def stage(self, stage_name):
+        """Record the time used by a stage; repeated stages are accumulated"""
+        started_at = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = (self.clock() - started_at) * 1000
+            self.timings[stage_name] = self.timings.get(stage_name, 0) + elapsed
@@ -0,0 +1,48 @@
+"""
+Unit tests for request_budget.py
+"""
+import unittest
+from unittest.mock import MagicMock
+
+func = __import__("request_budget")
+
+
+class TestRequestBudget(unittest.TestCase):
+    def setUp(self):
+        self.clock = MagicMock(return_value=1000.0)
+
+    def test_remaining_bounded_by_slack_deadline(self):
+        budget = func.RequestBudget(safety_margin_ms=500, clock=self.clock)
+        self.clock.return_value += 1.0
+        self.assertAlmostEqual(budget.remaining_ms(), 1500)
+
+    def test_remaining_bounded_by_lambda_context(self):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 800
+        budget = func.RequestBudget(context, safety_margin_ms=500, clock=self.clock)
+        self.assertAlmostEqual(budget.remaining_ms(), 300)
+
+    def test_can_afford(self):
+        budget = func.RequestBudget(
+            safety_margin_ms=500, stage_estimates_ms={"slack_post": 800}, clock=self.clock
+        )
+        self.assertTrue(budget.can_afford("slack_post"))
+        self.clock.return_value += 1.8
+        self.assertFalse(budget.can_afford("slack_post"))
+
+    def test_stage_timings(self):
+        budget = func.RequestBudget(clock=self.clock)
+        with budget.stage("ssm"):
+            self.clock.return_value += 0.1
+        with budget.stage("ssm"):
+            self.clock.return_value += 0.05
+        with budget.stage("invoke"):
+            self.clock.return_value += 0.02
+
+        self.assertAlmostEqual(budget.timings["ssm"], 150)
+        self.assertAlmostEqual(budget.timings["invoke"], 20)
+        self.assertAlmostEqual(budget.elapsed_ms(), 170)
+
+
+if __name__ == "__main__":
+    unittest.main()
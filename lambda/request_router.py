@@ -0,0 +1,15 @@
+"""
+Classify a request as sync-capable or async from the text extracted by ImmediateResponse.
+
+A sync-capable request is expected to finish well within Slack's 3-second deadline. It can run in
+SyncWorker through a `RequestResponse` invoke, or directly inside the ImmediateResponse container
+when its estimated cost fits the remaining budget. Any other request goes to AsyncWorker.
+
+Routes come from the command registry, matching does not import any command module.
+"""
+from command_registry import ASYNC, SYNC, registry  # noqa: F401
+
+
+def classify(text, commands=registry):
+    """Return the command matching the text; it has the `mode` and `cost_ms` of the route"""
+    return commands.match(text)[0]
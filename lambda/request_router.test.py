@@ -0,0 +1,25 @@
+import unittest
+
+from command_registry import Command, CommandRegistry
+
+func = __import__("request_router")
+
+
+class TestFunction(unittest.TestCase):
+    def test_classify_sync(self):
+        self.assertEqual(func.classify(" sync").mode, func.SYNC)
+        self.assertEqual(func.classify("SYNC now").mode, func.SYNC)
+
+    def test_classify_default_async(self):
+        self.assertEqual(func.classify(" what\nline 2").mode, func.ASYNC)
+        self.assertEqual(func.classify("synced").mode, func.ASYNC)
+        self.assertEqual(func.classify("").mode, func.ASYNC)
+        self.assertEqual(func.classify(None).mode, func.ASYNC)
+
+    def test_classify_custom_commands(self):
+        commands = CommandRegistry([Command("report", func.SYNC, "commands.report", cost_ms=1000)])
+        self.assertEqual(func.classify("report weekly", commands).cost_ms, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+In-memory cache of decrypted SSM parameters, shared across warm invocations of a Lambda container.
+
+- Values are kept for `SecretsCacheTtlSeconds` (default 300). Within the last
+  `SecretsCacheRefreshAheadSeconds` (default 30) of their TTL the cached value is served and one
+  background thread refreshes it; a request only waits for SSM when its value is missing or expired.
+  The thread is frozen with the container between invocations and resumes in the next one.
+- Several keys are fetched with one batched `GetParameters` call.
+- When SSM is throttled or unavailable, the last good value is served until a refresh succeeds.
+- A parameter that does not exist raises KeyError, and is only looked up again after the TTL.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("SecretsCacheTtlSeconds", "300"))
+DEFAULT_REFRESH_AHEAD_SECONDS = int(os.environ.get("SecretsCacheRefreshAheadSeconds", "30"))
+DEFAULT_RETRY_AFTER_FAILURE_SECONDS = 5
+SSM_GET_PARAMETERS_MAX_NAMES = 10  # GetParameters accepts at most 10 names per call
+THROTTLING_ERROR_CODES = ["ThrottlingException", "TooManyRequestsException"]
+
+
+def start_thread(target):
+    threading.Thread(target=target, name="secrets-cache-refresh", daemon=True).start()
+
+
+@dataclass
+class CacheEntry:
+    value: str
+    fetched_at: float
+    next_attempt_at: float = 0.0
+
+
+class SecretsCache:
+    def __init__(
+        self,
+        ssm_client,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        refresh_ahead_seconds=DEFAULT_REFRESH_AHEAD_SECONDS,
+        retry_after_failure_seconds=DEFAULT_RETRY_AFTER_FAILURE_SECONDS,
+        clock=time.monotonic,
+        background=start_thread,
+    ):
+        self.ssm_client = ssm_client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, ttl_seconds)
+        self.retry_after_failure_seconds = retry_after_failure_seconds
+        self.clock = clock
+        self.background = background
+        self._entries = {}
+        self._missing = {}  # name => time to look up a parameter not found again
+        self._refreshing = threading.Lock()  # Held while a background refresh runs
+
+    def get(self, name):
+        """Return the decrypted value of a single parameter"""
+        return self.get_many([name])[name]
+
+    def get_many(self, names):
+        """
+        Return a dict of name => decrypted value, fetching missing/expired names in batches and
+        refreshing the names about to expire in the background
+        """
+        now = self.clock()
+        names = list(dict.fromkeys(names))
+        self._refresh_batches([name for name in names if self._needs_refresh(name, now, 0)], now)
+        missing = [name for name in names if name not in self._entries]
+        if missing:
+            raise KeyError(f"Parameters not found in parameter store: {missing}")
+        values = {name: self._entries[name].value for name in names}
+
+        ahead = [name for name in names if self._needs_refresh(name, now, self.refresh_ahead_seconds)]
+        if ahead:
+            self._refresh_in_background(ahead)
+        return values
+
+    def clear(self):
+        self._entries.clear()
+        self._missing.clear()
+
+    def _needs_refresh(self, name, now, ahead_seconds):
+        entry = self._entries.get(name)
+        if entry is None:
+            return now >= self._missing.get(name, 0)
+        if now < entry.next_attempt_at:
+            return False  # Backing off after a failed refresh, keep serving the last good value
+        return now - entry.fetched_at >= self.ttl_seconds - ahead_seconds
+
+    def _refresh_in_background(self, names):
+        if not self._refreshing.acquire(blocking=False):
+            return  # Single flight, a refresh is already running
+
+        def refresh():
+            try:
+                self._refresh_batches(names, self.clock())
+            except Exception as e:
+                logging.warning(f"Refreshing parameters {names} in the background failed: {e}")
+            finally:
+                self._refreshing.release()
+
+        try:
+            self.background(refresh)
+        except Exception as e:
+            self._refreshing.release()
+            logging.warning(f"Unable to refresh parameters {names} in the background: {e}")
+
+    def _refresh_batches(self, names, now):
+        batch_size = SSM_GET_PARAMETERS_MAX_NAMES
+        for batch in (names[i:i + batch_size] for i in range(0, len(names), batch_size)):
+            self._refresh(batch, now)
+
+    def _refresh(self, names, now):
+        try:
+            resp = self.ssm_client.get_parameters(Names=names, WithDecryption=True)
+        except Exception as e:
+            self._handle_refresh_error(names, now, e)
+            return
+
+        for param in resp.get("Parameters", []):
+            self._entries[param["Name"]] = CacheEntry(param["Value"], now)
+
+        invalid = resp.get("InvalidParameters", [])
+        if invalid:
+            logging.error(f"Parameters not found in parameter store: {invalid}")
+            for name in invalid:
+                if name not in self._entries:
+                    self._missing[name] = now + self.ttl_seconds
+
+    def _handle_refresh_error(self, names, now, error):
+        missing = [name for name in names if name not in self._entries]
+        if missing:
+            raise error
+
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        reason = "throttled" if code in THROTTLING_ERROR_CODES else f"failed ({error})"
+        logging.warning(f"Refreshing parameters {names} {reason}, serving last good values")
+        for name in names:
+            self._entries[name].next_attempt_at = now + self.retry_after_failure_seconds
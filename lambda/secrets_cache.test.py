@@ -0,0 +1,156 @@
+"""
+Unit tests for secrets_cache.py
+"""
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+func = __import__("secrets_cache")
+
+
+def mock_get_parameters_response(values, invalid=None):
+    return {
+        "Parameters": [{"Name": k, "Value": v} for k, v in values.items()],
+        "InvalidParameters": invalid or [],
+    }
+
+
+def throttling_error():
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "GetParameters"
+    )
+
+
+class TestSecretsCache(unittest.TestCase):
+    def setUp(self):
+        self.ssm_client = MagicMock()
+        self.clock = MagicMock(return_value=1000.0)
+        self.refreshes = []
+        self.cache = func.SecretsCache(
+            self.ssm_client,
+            ttl_seconds=300,
+            refresh_ahead_seconds=30,
+            clock=self.clock,
+            background=self.refreshes.append,
+        )
+
+    def test_get_cached_within_ttl(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "1"})
+
+        self.assertEqual(self.cache.get("/a"), "1")
+        self.clock.return_value += 200
+        self.assertEqual(self.cache.get("/a"), "1")
+
+        self.ssm_client.get_parameters.assert_called_once_with(Names=["/a"], WithDecryption=True)
+
+    def test_get_many_batched(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response(
+            {"/a": "1", "/b": "2"}
+        )
+
+        ret = self.cache.get_many(["/a", "/b"])
+
+        self.assertDictEqual(ret, {"/a": "1", "/b": "2"})
+        self.ssm_client.get_parameters.assert_called_once_with(
+            Names=["/a", "/b"], WithDecryption=True
+        )
+
+    def test_refresh_ahead_of_expiry(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "1"})
+        self.cache.get("/a")
+
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "2"})
+        self.clock.return_value += 275  # Inside the refresh-ahead window, before the TTL expires
+
+        # The cached value is served while one refresh runs in the background
+        self.assertEqual(self.cache.get("/a"), "1")
+        self.assertEqual(self.cache.get("/a"), "1")
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertEqual(self.ssm_client.get_parameters.call_count, 1)
+
+        self.refreshes.pop()()
+        self.assertEqual(self.ssm_client.get_parameters.call_count, 2)
+        self.assertEqual(self.cache.get("/a"), "2")
+        self.assertEqual(self.refreshes, [])
+
+    def test_refresh_after_expiry_blocks(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "1"})
+        self.cache.get("/a")
+
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "2"})
+        self.clock.return_value += 300
+
+        self.assertEqual(self.cache.get("/a"), "2")
+        self.assertEqual(self.refreshes, [])
+
+    def test_background_refresh_error(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "1"})
+        self.cache.get("/a")
+
+        self.ssm_client.get_parameters.side_effect = throttling_error()
+        self.clock.return_value += 275
+        self.cache.get("/a")
+        self.refreshes.pop()()
+
+        # Backing off, and a later refresh may run again
+        self.assertEqual(self.cache.get("/a"), "1")
+        self.assertEqual(self.refreshes, [])
+        self.clock.return_value += 5
+        self.cache.get("/a")
+        self.assertEqual(len(self.refreshes), 1)
+
+    def test_background_thread(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "1"})
+        cache = func.SecretsCache(self.ssm_client, ttl_seconds=300, refresh_ahead_seconds=300)
+
+        self.assertEqual(cache.get("/a"), "1")
+        # Acquired once the background refresh has released it
+        self.assertTrue(cache._refreshing.acquire(timeout=5))
+        self.assertEqual(self.ssm_client.get_parameters.call_count, 2)
+
+    def test_serve_last_good_value_when_throttled(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/a": "1"})
+        self.cache.get("/a")
+
+        self.ssm_client.get_parameters.side_effect = throttling_error()
+        self.clock.return_value += 600
+
+        self.assertEqual(self.cache.get("/a"), "1")
+        # Back off instead of calling SSM again straight away
+        self.assertEqual(self.cache.get("/a"), "1")
+        self.assertEqual(self.ssm_client.get_parameters.call_count, 2)
+
+    def test_raise_when_no_value_to_serve(self):
+        self.ssm_client.get_parameters.side_effect = throttling_error()
+
+        with self.assertRaises(ClientError):
+            self.cache.get("/a")
+
+    def test_raise_when_parameter_not_found(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response(
+            {}, invalid=["/a"]
+        )
+
+        with self.assertRaises(KeyError):
+            self.cache.get("/a")
+
+    def test_parameter_not_found_looked_up_after_ttl(self):
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response(
+            {"/a": "1"}, invalid=["/b"]
+        )
+
+        with self.assertRaises(KeyError):
+            self.cache.get_many(["/a", "/b"])
+        self.assertEqual(self.cache.get("/a"), "1")
+        with self.assertRaises(KeyError):
+            self.cache.get("/b")
+        self.ssm_client.get_parameters.assert_called_once()
+
+        self.ssm_client.get_parameters.return_value = mock_get_parameters_response({"/b": "2"})
+        self.clock.return_value += 300
+        self.assertEqual(self.cache.get("/b"), "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
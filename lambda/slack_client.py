@@ -0,0 +1,216 @@
+"""
+Shared Slack Web API client.
+
+- One tuned keep-alive urllib3 pool per container, with JSON request bodies.
+- HTTP 429 is retried after `Retry-After`, and 5xx/connection errors with jittered exponential backoff.
+  Methods that are not idempotent, e.g. chat.postMessage, are only retried when Slack did not act on
+  the request: on 429 or when the connection could not be made. A read timeout or a 5xx may come
+  after the message was posted, and a retry would post it twice.
+- Per-method rate-limit tiers give the default wait when Slack does not send `Retry-After`.
+- Responses are only parsed when their content is accessed.
+- With a rate limiter, each call first takes a token from the workspace's bucket of the method, and
+  from the channel's bucket as well for methods also limited per channel.
+
+For details see https://api.slack.com/web and https://api.slack.com/docs/rate-limits
+"""
+import json
+import logging
+import random
+import time
+
+import urllib3
+
+SLACK_API_BASE_URL = "https://slack.com/api"
+
+# Requests per minute of each rate-limit tier
+RATE_LIMIT_TIERS = {
+    "tier1": 1,
+    "tier2": 20,
+    "tier3": 50,
+    "tier4": 100,
+    "special": 300,  # chat.postMessage, several hundred messages per minute in a workspace
+}
+METHOD_TIERS = {
+    "api.test": "tier4",
+    "auth.test": "tier4",
+    "chat.postMessage": "special",
+    "chat.update": "tier3",
+    "oauth.v2.access": "tier4",
+}
+DEFAULT_TIER = "tier3"
+# Requests per minute in each channel of the methods also limited per channel
+PER_CHANNEL_RATE_LIMITS = {"chat.postMessage": 60}  # About 1 message per second
+
+# Methods whose retries may repeat their effect, e.g. post a message twice
+NON_IDEMPOTENT_METHODS = ["chat.postEphemeral", "chat.postMessage", "chat.scheduleMessage"]
+
+# Errors meaning the bot token is no longer valid, e.g. after the app is re-installed
+INVALID_TOKEN_ERRORS = ["account_inactive", "invalid_auth", "not_authed", "token_revoked"]
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_RETRY_WAIT_SECONDS = 30.0
+DEFAULT_BACKOFF_SECONDS = 0.5
+MIN_TIME_LIMIT_SECONDS = 0.05  # Still give a request a chance when the time limit is about spent
+
+
+def create_pool_manager(maxsize=10, connect_timeout=2.0, read_timeout=10.0):
+    """Keep-alive connection pool tuned for a single host; retries are handled by SlackClient"""
+    return urllib3.PoolManager(
+        num_pools=2,
+        maxsize=maxsize,
+        block=False,
+        retries=False,
+        timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+        headers={"Connection": "keep-alive"},
+    )
+
+
+def rate_limit_per_minute(method):
+    return RATE_LIMIT_TIERS[METHOD_TIERS.get(method, DEFAULT_TIER)]
+
+
+def response_outcome(resp):
+    """Short outcome of a Slack API call for metrics: ok, the Slack error, or skipped if not called"""
+    if resp is None:
+        return "skipped"
+    return "ok" if resp.ok else (resp.error or f"http_{resp.status}")
+
+
+class SlackResponse:
+    def __init__(self, method, status, headers, body):
+        self.method = method
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self._data = None
+
+    @property
+    def data(self):
+        """The JSON content, parsed on first access"""
+        if self._data is None:
+            try:
+                self._data = json.loads(self.body.decode("utf-8")) if self.body else {}
+            except ValueError:
+                self._data = {}
+        return self._data
+
+    @property
+    def ok(self):
+        return self.status == 200 and self.data.get("ok") is True
+
+    @property
+    def error(self):
+        if self.status == 429:
+            return "ratelimited"
+        return self.data.get("error")
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __repr__(self):
+        return f"SlackResponse({self.method}, status={self.status}, body={self.body!r})"
+
+
+class SlackClient:
+    def __init__(
+        self,
+        http=None,
+        base_url=SLACK_API_BASE_URL,
+        max_retries=DEFAULT_MAX_RETRIES,
+        max_retry_wait_seconds=DEFAULT_MAX_RETRY_WAIT_SECONDS,
+        backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+        rate_limiter=None,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        self.http = http or create_pool_manager()
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.max_retry_wait_seconds = max_retry_wait_seconds
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = rate_limiter
+        self.sleep = sleep
+        self.clock = clock
+
+    def api_call(self, method, token, payload, team_id=None, time_limit_seconds=None):
+        """
+        POST a JSON payload to a Web API method, retrying when rate limited or on server errors.
+        `time_limit_seconds` bounds the whole call, e.g. on the path of an acknowledgement to Slack:
+        the wait for the rate limiter, the retries and the timeout of each request.
+        """
+        deadline = None if time_limit_seconds is None else self.clock() + time_limit_seconds
+        if self.rate_limiter is not None and team_id is not None:
+            limit = {} if deadline is None else {"max_wait_seconds": self._time_left(deadline)}
+            if not self.rate_limiter.acquire(
+                team_id, method, channel_id=payload.get("channel"), **limit
+            ):
+                return SlackResponse(method, 429, {}, b'{"ok": false, "error": "ratelimited"}')
+
+        url = f"{self.base_url}/{method}"
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        waited = 0.0
+        attempt = 0
+        while True:
+            try:
+                timeout = {} if deadline is None else {"timeout": urllib3.Timeout(total=self._time_left(deadline))}
+                resp = self.http.request("POST", url, body=body, headers=headers, **timeout)
+                response = SlackResponse(method, resp.status, resp.headers, resp.data)
+                if resp.status != 429 and resp.status < 500:
+                    return response
+                delay = self._retry_delay(method, attempt, resp.headers.get("Retry-After"))
+            except urllib3.exceptions.HTTPError as e:
+                response = e
+                delay = self._retry_delay(method, attempt, None)
+
+            out_of_time = deadline is not None and delay >= self._time_left(deadline)
+            if (
+                attempt >= self.max_retries
+                or waited + delay > self.max_retry_wait_seconds
+                or out_of_time
+                or not self._retryable(method, response)
+            ):
+                if isinstance(response, Exception):
+                    raise response
+                logging.warning(f"Giving up {method} after {attempt + 1} attempt(s): {response}")
+                return response
+
+            logging.warning(f"Retrying {method} in {delay:.2f}s: {response}")
+            self.sleep(delay)
+            waited += delay
+            attempt += 1
+
+    def chat_post_message(
+        self, token, channel, text, thread_ts=None, team_id=None, time_limit_seconds=None, **kwargs
+    ):
+        payload = {"channel": channel, "text": text, **kwargs}
+        if thread_ts:
+            payload["thread_ts"] = thread_ts
+        return self.api_call(
+            "chat.postMessage", token, payload, team_id=team_id, time_limit_seconds=time_limit_seconds
+        )
+
+    def _retryable(self, method, response):
+        """Whether a failed call may be sent again without repeating its effect"""
+        if method not in NON_IDEMPOTENT_METHODS:
+            return True
+        if isinstance(response, Exception):
+            # Raised before the request was sent, unlike read timeouts and dropped connections
+            return isinstance(response, urllib3.exceptions.ConnectTimeoutError)
+        return response.status == 429
+
+    def _time_left(self, deadline):
+        return max(MIN_TIME_LIMIT_SECONDS, deadline - self.clock())
+
+    def _retry_delay(self, method, attempt, retry_after):
+        """Honor Retry-After when given, otherwise back off from the method's rate-limit tier"""
+        if retry_after is not None:
+            try:
+                return float(retry_after) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        base = max(self.backoff_seconds, 60.0 / rate_limit_per_minute(method) / 2)
+        return random.uniform(base, base * 2**attempt * 2)
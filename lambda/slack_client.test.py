@@ -0,0 +1,161 @@
+"""
+Unit tests for slack_client.py
+"""
+import json
+import unittest
+from dataclasses import dataclass, field
+from unittest.mock import MagicMock
+
+import urllib3
+
+func = __import__("slack_client")
+
+
+@dataclass
+class HttpResponse:
+    status: int = 200
+    data: bytes = b'{"ok": true}'
+    headers: dict = field(default_factory=dict)
+
+
+def rate_limited_response(retry_after="2"):
+    return HttpResponse(429, b"", {"Retry-After": retry_after})
+
+
+class TestSlackClient(unittest.TestCase):
+    def setUp(self):
+        self.http = MagicMock()
+        self.sleep = MagicMock()
+        self.client = func.SlackClient(http=self.http, sleep=self.sleep)
+
+    def test_chat_post_message_json_body(self):
+        self.http.request.return_value = HttpResponse()
+
+        resp = self.client.chat_post_message("xoxb-1", "C1", "hello", thread_ts="123.456")
+
+        self.http.request.assert_called_once_with(
+            "POST",
+            "https://slack.com/api/chat.postMessage",
+            body=json.dumps({"channel": "C1", "text": "hello", "thread_ts": "123.456"}).encode(),
+            headers={
+                "Content-Type": "application/json; charset=utf-8",
+                "Authorization": "Bearer xoxb-1",
+            },
+        )
+        self.assertTrue(resp.ok)
+        self.sleep.assert_not_called()
+
+    def test_response_parsed_lazily(self):
+        resp = func.SlackResponse("chat.postMessage", 200, {}, b'{"ok": false, "error": "invalid_auth"}')
+
+        self.assertIsNone(resp._data)
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.error, "invalid_auth")
+
+    def test_retry_after_honored(self):
+        self.http.request.side_effect = [rate_limited_response("2"), HttpResponse()]
+
+        resp = self.client.chat_post_message("xoxb-1", "C1", "hello")
+
+        self.assertTrue(resp.ok)
+        self.assertEqual(self.http.request.call_count, 2)
+        delay = self.sleep.call_args.args[0]
+        self.assertGreaterEqual(delay, 2)
+        self.assertLessEqual(delay, 3)
+
+    def test_retry_server_error_and_connection_error(self):
+        self.http.request.side_effect = [
+            HttpResponse(503, b""),
+            urllib3.exceptions.ProtocolError("Connection reset"),
+            HttpResponse(),
+        ]
+
+        resp = self.client.api_call("chat.update", "xoxb-1", {"channel": "C1", "ts": "1.2"})
+
+        self.assertTrue(resp.ok)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_post_not_retried_after_read_timeout(self):
+        self.http.request.side_effect = [
+            urllib3.exceptions.ReadTimeoutError(None, "/api/chat.postMessage", "Read timed out"),
+            HttpResponse(),
+        ]
+
+        # The message may have been posted, a retry could post it twice
+        with self.assertRaises(urllib3.exceptions.ReadTimeoutError):
+            self.client.chat_post_message("xoxb-1", "C1", "hello")
+        self.http.request.assert_called_once()
+        self.sleep.assert_not_called()
+
+    def test_post_not_retried_after_server_error(self):
+        self.http.request.side_effect = [HttpResponse(503, b""), HttpResponse()]
+
+        resp = self.client.chat_post_message("xoxb-1", "C1", "hello")
+
+        self.assertEqual(resp.status, 503)
+        self.http.request.assert_called_once()
+
+    def test_post_retried_after_connect_error(self):
+        self.http.request.side_effect = [
+            urllib3.exceptions.NewConnectionError(None, "Connection refused"),
+            HttpResponse(),
+        ]
+
+        resp = self.client.chat_post_message("xoxb-1", "C1", "hello")
+
+        self.assertTrue(resp.ok)
+        self.assertEqual(self.http.request.call_count, 2)
+
+    def test_give_up_after_max_retries(self):
+        self.http.request.return_value = rate_limited_response("1")
+
+        resp = self.client.chat_post_message("xoxb-1", "C1", "hello")
+
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.error, "ratelimited")
+        self.assertEqual(self.http.request.call_count, func.DEFAULT_MAX_RETRIES + 1)
+
+    def test_give_up_when_retry_after_exceeds_max_wait(self):
+        client = func.SlackClient(http=self.http, max_retry_wait_seconds=1.0, sleep=self.sleep)
+        self.http.request.return_value = rate_limited_response("30")
+
+        resp = client.chat_post_message("xoxb-1", "C1", "hello")
+
+        self.assertEqual(resp.status, 429)
+        self.http.request.assert_called_once()
+        self.sleep.assert_not_called()
+
+    def test_time_limit(self):
+        clock = MagicMock(return_value=100.0)
+        rate_limiter = MagicMock()
+        rate_limiter.acquire.return_value = True
+        client = func.SlackClient(http=self.http, rate_limiter=rate_limiter, sleep=self.sleep, clock=clock)
+        self.http.request.return_value = rate_limited_response("2")
+
+        resp = client.chat_post_message("xoxb-1", "C1", "hello", team_id="T1", time_limit_seconds=1.5)
+
+        # No wait or retry beyond the time limit
+        rate_limiter.acquire.assert_called_once_with(
+            "T1", "chat.postMessage", channel_id="C1", max_wait_seconds=1.5
+        )
+        self.assertEqual(self.http.request.call_args.kwargs["timeout"].total, 1.5)
+        self.assertEqual(resp.error, "ratelimited")
+        self.http.request.assert_called_once()
+        self.sleep.assert_not_called()
+
+    def test_rate_limiter_acquired_before_sending(self):
+        rate_limiter = MagicMock()
+        rate_limiter.acquire.side_effect = [True, False]
+        client = func.SlackClient(http=self.http, rate_limiter=rate_limiter, sleep=self.sleep)
+        self.http.request.return_value = HttpResponse()
+
+        self.assertTrue(client.chat_post_message("xoxb-1", "C1", "hello", team_id="T1").ok)
+        resp = client.chat_post_message("xoxb-1", "C1", "hello", team_id="T1")
+
+        rate_limiter.acquire.assert_called_with("T1", "chat.postMessage", channel_id="C1")
+        self.assertEqual(resp.error, "ratelimited")
+        self.http.request.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+Verify requests from Slack with the app's signing secret.
+
+For details see https://api.slack.com/authentication/verifying-requests-from-slack
+"""
+import hashlib
+import hmac
+import os
+import time
+
+SIGNATURE_VERSION = "v0"
+DEFAULT_MAX_AGE_SECONDS = int(os.environ.get("SlackRequestMaxAgeSeconds", "300"))
+
+
+def compute_signature(signing_secret, timestamp, body):
+    """Return the `X-Slack-Signature` value expected for the given timestamp and raw body"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    basestring = f"{SIGNATURE_VERSION}:{timestamp}:".encode("utf-8") + body
+    digest = hmac.new(signing_secret.encode("utf-8"), basestring, hashlib.sha256).hexdigest()
+    return f"{SIGNATURE_VERSION}={digest}"
+
+
+def verify_signature(
+    signing_secret, timestamp, body, signature, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, now=None
+):
+    """Return True if the signature matches and the timestamp is inside the replay window"""
+    if not signing_secret or not timestamp or not signature:
+        return False
+
+    try:
+        request_time = int(timestamp)
+    except (TypeError, ValueError):
+        return False
+
+    if abs((time.time() if now is None else now) - request_time) > max_age_seconds:
+        return False
+
+    expected = compute_signature(signing_secret, timestamp, body or "")
+    return hmac.compare_digest(expected.encode("utf-8"), signature.encode("utf-8"))
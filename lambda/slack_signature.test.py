@@ -0,0 +1,49 @@
+"""
+Unit tests for slack_signature.py
+"""
+import unittest
+
+func = __import__("slack_signature")
+
+# Example from https://api.slack.com/authentication/verifying-requests-from-slack
+SIGNING_SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+TIMESTAMP = "1531420618"
+BODY = (
+    "token=xyzz0WbapA4vBCDEFasx0q6G&team_id=T1DC2JH3J&team_domain=testteamnow&channel_id=G8PSS9T3V"
+    "&channel_name=foobar&user_id=U2CERLKJA&user_name=roadrunner&command=%2Fwebhook-collect"
+    "&text=&response_url=https%3A%2F%2Fhooks.slack.com%2Fcommands%2FT1DC2JH3J%2F397700885554"
+    "%2F96rGlfmibIGlgcZRskXaIFfN&trigger_id=398738663015.47445629121.803a0bc887a14d10d2c447fce8b6703c"
+)
+SIGNATURE = "v0=a2114d57b48eac39b9ad189dd8316235a7b4a8d21a10bd27519666489c69b503"
+
+
+class TestSlackSignature(unittest.TestCase):
+    def test_compute_signature(self):
+        self.assertEqual(func.compute_signature(SIGNING_SECRET, TIMESTAMP, BODY), SIGNATURE)
+
+    def test_verify_signature_all_good(self):
+        self.assertTrue(
+            func.verify_signature(SIGNING_SECRET, TIMESTAMP, BODY, SIGNATURE, now=1531420618 + 60)
+        )
+
+    def test_verify_signature_mismatch(self):
+        self.assertFalse(
+            func.verify_signature("invalid-secret", TIMESTAMP, BODY, SIGNATURE, now=1531420618)
+        )
+        self.assertFalse(
+            func.verify_signature(SIGNING_SECRET, TIMESTAMP, BODY + "&x=1", SIGNATURE, now=1531420618)
+        )
+
+    def test_verify_signature_replay_window(self):
+        self.assertFalse(
+            func.verify_signature(SIGNING_SECRET, TIMESTAMP, BODY, SIGNATURE, now=1531420618 + 301)
+        )
+
+    def test_verify_signature_missing_values(self):
+        self.assertFalse(func.verify_signature(SIGNING_SECRET, None, BODY, SIGNATURE))
+        self.assertFalse(func.verify_signature(SIGNING_SECRET, TIMESTAMP, BODY, None))
+        self.assertFalse(func.verify_signature(SIGNING_SECRET, "abc", BODY, SIGNATURE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Structured JSON logging with per-request sampling.
+
+- Each record is written as one JSON line with its fields, e.g. `log.info("Replied", team_id=t)`.
+  The message and fields are only formatted when the record is emitted, so records that are
+  filtered out or sampled away cost no formatting at all.
+- `LogSampleRates` (JSON, e.g. `{"DEBUG": 0, "INFO": 0.1}`) sets the share of requests whose
+  records of a level are emitted. The draw is made once per request, so a sampled request keeps
+  all its records. WARNING and above are never sampled.
+- Values of the `token`, `access_token` and `client_secret` fields are redacted, in nested dicts too.
+- A request can be logged in full at DEBUG: when `begin_request(debug=True)`, e.g. for the users in
+  `LogDebugUserIds` or a worker payload carrying `"debug": true`.
+
+The sampling draw and context of a request belong to the logger of its handler, so SyncWorker run
+in ImmediateResponse does not take over the records of ImmediateResponse. Records of the standard
+`logging` functions go through the same formatter, sampling and redaction, with the draw and context
+of the active logger: the one of the handler running (`scoped`), or the last to begin a request.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+
+LOG_LEVEL = os.environ.get("LogLevel", "INFO")
+LOG_SAMPLE_RATES = json.loads(os.environ.get("LogSampleRates") or "{}")
+LOG_DEBUG_USER_IDS = frozenset(
+    filter(None, map(str.strip, os.environ.get("LogDebugUserIds", "").split(",")))
+)
+REDACTED_FIELDS = frozenset(["token", "access_token", "client_secret"])
+REDACTED = "[REDACTED]"
+
+# The logger of the request being handled, for the records of the standard `logging` functions
+_active = contextvars.ContextVar("structured_logging_active", default=None)
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {k: REDACTED if k in REDACTED_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(v) for v in value)
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        if record.args:
+            record.args = redact(record.args)
+        context = getattr(record, "context", None)
+        if context is None:
+            active = _active.get()
+            context = active.request["context"] if active else {}
+        doc = {
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **context,
+            **redact(getattr(record, "fields", {})),
+        }
+        request_id = getattr(record, "aws_request_id", None)
+        if request_id:
+            doc["aws_request_id"] = request_id
+        if record.exc_info:
+            doc["exception"] = self.formatException(record.exc_info)
+        return json.dumps(doc, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Samples the records of the standard `logging` functions like those of the active logger"""
+
+    def filter(self, record):
+        if hasattr(record, "context"):
+            # A record of a StructuredLogger, sampled before it was built
+            return True
+        active = _active.get()
+        return active is None or active.sampled(record.levelno)
+
+
+class StructuredLogger:
+    def __init__(
+        self,
+        service,
+        level=LOG_LEVEL,
+        sample_rates=LOG_SAMPLE_RATES,
+        debug_user_ids=LOG_DEBUG_USER_IDS,
+        draw=random.random,
+    ):
+        self.service = service
+        self.level = logging.getLevelName(level)
+        self.sample_rates = sample_rates
+        self.debug_user_ids = debug_user_ids
+        self.draw = draw
+        # Sampling decision and context of the request being handled by this logger
+        self.request = {"draw": 0.0, "debug": False, "context": {"service": service}}
+        self.logger = logging.getLogger(service)
+        self.logger.setLevel(self.level)
+        self.setup()
+
+    def setup(self):
+        """
+        Format and sample the records of all loggers with the handlers of the root logger. Only the
+        first logger configures them, e.g. SyncWorker imported by ImmediateResponse leaves them as is.
+        """
+        root = logging.getLogger()
+        if any(isinstance(f, SamplingFilter) for handler in root.handlers for f in handler.filters):
+            return
+        root.setLevel(self.level)
+        if not root.handlers:
+            root.addHandler(logging.StreamHandler())
+        for handler in root.handlers:
+            handler.setFormatter(JsonFormatter())
+            handler.addFilter(SamplingFilter())
+
+    def begin_request(self, debug=False, **context):
+        """Draw the sample of a new request; `debug=True` logs the request in full at DEBUG"""
+        self.request = {"draw": self.draw(), "debug": debug, "context": {"service": self.service, **context}}
+        self.logger.setLevel(logging.DEBUG if debug else self.level)
+        _active.set(self)
+
+    def scoped(self, handler):
+        """
+        Decorator making this logger the active one while a Lambda handler runs, and restoring the
+        one of the caller when it returns, e.g. after SyncWorker runs in ImmediateResponse.
+        """
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            token = _active.set(self)
+            try:
+                return handler(event, context)
+            finally:
+                _active.reset(token)
+
+        return wrapper
+
+    def sampled(self, level):
+        if level >= logging.WARNING or self.request["debug"]:
+            return True
+        return self.request["draw"] < self.sample_rates.get(logging.getLevelName(level), 1.0)
+
+    def is_debug_user(self, user_id):
+        return user_id in self.debug_user_ids
+
+    @property
+    def debug_enabled(self):
+        return self.request["debug"]
+
+    def debug(self, msg, *args, **fields):
+        self._log(logging.DEBUG, msg, args, fields)
+
+    def info(self, msg, *args, **fields):
+        self._log(logging.INFO, msg, args, fields)
+
+    def warning(self, msg, *args, **fields):
+        self._log(logging.WARNING, msg, args, fields)
+
+    def error(self, msg, *args, **fields):
+        self._log(logging.ERROR, msg, args, fields)
+
+    def _log(self, level, msg, args, fields):
+        # Skip records that would be dropped before building them
+        if not self.logger.isEnabledFor(level) or not self.sampled(level):
+            return
+        self.logger.log(level, msg, *args, extra={"fields": fields, "context": self.request["context"]})
@@ -0,0 +1,142 @@
+"""
+Unit tests for structured_logging.py
+"""
+import io
+import json
+import logging
+import unittest
+
+func = __import__("structured_logging")
+
+
+class MockDraw:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError("formatted a record that was not emitted")
+
+
+class TestStructuredLogger(unittest.TestCase):
+    def setUp(self):
+        self.draw = MockDraw(0.5)
+        self.log = func.StructuredLogger(
+            "TestService",
+            level="INFO",
+            sample_rates={"INFO": 0.1},
+            debug_user_ids={"U_DEBUG"},
+            draw=self.draw,
+        )
+        self.stream = io.StringIO()
+        self.handler = logging.getLogger().handlers[0]
+        self.handler.setStream(self.stream)
+
+    def records(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_sampled_out(self):
+        self.log.begin_request(trace_id="T1")
+        self.log.info("Sampled out %s", Unformattable())
+        self.log.debug("Below level %s", Unformattable())
+        logging.info("Sampled out too")
+        self.log.error("Failed: %s", "boom", team_id="T1111111111")
+
+        self.assertEqual(
+            self.records(),
+            [
+                {
+                    "level": "ERROR",
+                    "logger": "TestService",
+                    "message": "Failed: boom",
+                    "service": "TestService",
+                    "trace_id": "T1",
+                    "team_id": "T1111111111",
+                }
+            ],
+        )
+
+    def test_sampled_in(self):
+        self.draw.value = 0.05
+        self.log.begin_request()
+        self.log.info("Mention", user_id="U1")
+        logging.info("From the root logger")
+
+        mention, root = self.records()
+        self.assertEqual(mention["message"], "Mention")
+        self.assertEqual(mention["user_id"], "U1")
+        self.assertEqual(root["logger"], "root")
+
+    def test_debug_override(self):
+        self.assertTrue(self.log.is_debug_user("U_DEBUG"))
+        self.assertFalse(self.log.is_debug_user("U1"))
+
+        self.log.begin_request(debug=True)
+        self.assertTrue(self.log.debug_enabled)
+        self.log.debug("Received event", event={"user": "U_DEBUG"})
+        self.log.info("Mention")
+        self.assertEqual([r["level"] for r in self.records()], ["DEBUG", "INFO"])
+
+        # The override ends with the request
+        self.log.begin_request()
+        self.log.debug("Received event")
+        self.assertEqual(len(self.records()), 2)
+
+    def test_redaction(self):
+        self.log.begin_request(debug=True)
+        event = {"token": "secret", "event": {"user": "U1"}, "items": [{"access_token": "xoxb"}]}
+        self.log.debug("Received event", event=event)
+        self.log.debug("Event %s", event)
+
+        fields, args = self.records()
+        self.assertEqual(
+            fields["event"],
+            {"token": "[REDACTED]", "event": {"user": "U1"}, "items": [{"access_token": "[REDACTED]"}]},
+        )
+        self.assertNotIn("secret", args["message"])
+        self.assertNotIn("xoxb", args["message"])
+        # The logged dict is left as is
+        self.assertEqual(event["token"], "secret")
+
+    def test_setup_is_idempotent(self):
+        func.StructuredLogger("OtherService", level="DEBUG", draw=self.draw)
+        filters = [f for f in self.handler.filters if isinstance(f, func.SamplingFilter)]
+        self.assertEqual(len(filters), 1)
+        # The root logger keeps the level of the first logger
+        self.assertEqual(logging.getLogger().level, logging.INFO)
+
+    def test_nested_handler(self):
+        nested = func.StructuredLogger("NestedService", sample_rates={"INFO": 1.0}, draw=MockDraw(0.9))
+
+        @nested.scoped
+        def nested_handler(event, context):
+            nested.begin_request(trace_id="T2")
+            nested.info("Nested")
+            logging.info("Nested root")
+
+        @self.log.scoped
+        def handler(event, context):
+            self.draw.value = 0.05
+            self.log.begin_request(trace_id="T1")
+            nested_handler(event, context)
+            self.log.info("Stage timings")
+            logging.info("Root")
+
+        handler({}, None)
+        self.assertEqual(
+            [(r["message"], r["service"], r["trace_id"]) for r in self.records()],
+            [
+                ("Nested", "NestedService", "T2"),
+                ("Nested root", "NestedService", "T2"),
+                ("Stage timings", "TestService", "T1"),
+                ("Root", "TestService", "T1"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
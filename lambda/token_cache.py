@@ -0,0 +1,74 @@
+"""
+Per-container LRU+TTL cache of bot tokens, in front of the OAuth DynamoDB table.
+
+- Entries are keyed by (app_id, team_id) and only `access_token` is read.
+- Unknown teams get a short negative-cache entry.
+- A token written by a re-installation is picked up when the entry expires, or at once when Slack
+  rejects the cached token (see `slack_client.INVALID_TOKEN_ERRORS`) and the caller invalidates it.
+"""
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("BotTokenCacheTtlSeconds", "300"))
+DEFAULT_NEGATIVE_TTL_SECONDS = int(os.environ.get("BotTokenCacheNegativeTtlSeconds", "30"))
+DEFAULT_MAX_SIZE = int(os.environ.get("BotTokenCacheMaxSize", "256"))
+PROJECTION_EXPRESSION = "access_token"
+
+
+@dataclass
+class CacheEntry:
+    access_token: str
+    expires_at: float
+
+
+class BotTokenCache:
+    def __init__(
+        self,
+        table,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        negative_ttl_seconds=DEFAULT_NEGATIVE_TTL_SECONDS,
+        max_size=DEFAULT_MAX_SIZE,
+        clock=time.monotonic,
+    ):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+
+    def get(self, app_id, team_id):
+        """Return the bot token of the given app installation, or None if it is not installed"""
+        key = (app_id, team_id)
+        now = self.clock()
+
+        entry = self._entries.get(key)
+        if entry is not None and now < entry.expires_at:
+            self._entries.move_to_end(key)
+            return entry.access_token
+
+        item = self.table.get_item(
+            Key={"app_id": app_id, "team_id": team_id},
+            ProjectionExpression=PROJECTION_EXPRESSION,
+        ).get("Item")
+
+        if item and item.get("access_token"):
+            entry = CacheEntry(item["access_token"], now + self.ttl_seconds)
+        else:
+            entry = CacheEntry(None, now + self.negative_ttl_seconds)
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        return entry.access_token
+
+    def invalidate(self, app_id, team_id):
+        """Drop the cached token, e.g. after Slack rejected it"""
+        self._entries.pop((app_id, team_id), None)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,83 @@
+"""
+Unit tests for token_cache.py
+"""
+import unittest
+from unittest.mock import MagicMock
+
+func = __import__("token_cache")
+
+
+def mock_item(access_token="dummy-bot-token"):
+    return {"Item": {"access_token": access_token}}
+
+
+class TestBotTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.clock = MagicMock(return_value=1000.0)
+        self.cache = func.BotTokenCache(
+            self.table, ttl_seconds=300, negative_ttl_seconds=30, max_size=2, clock=self.clock
+        )
+
+    def test_get_cached_within_ttl(self):
+        self.table.get_item.return_value = mock_item()
+
+        self.assertEqual(self.cache.get("A1", "T1"), "dummy-bot-token")
+        self.clock.return_value += 299
+        self.assertEqual(self.cache.get("A1", "T1"), "dummy-bot-token")
+
+        self.table.get_item.assert_called_once_with(
+            Key={"app_id": "A1", "team_id": "T1"},
+            ProjectionExpression="access_token",
+        )
+
+    def test_get_reloaded_after_ttl(self):
+        self.table.get_item.return_value = mock_item()
+        self.cache.get("A1", "T1")
+
+        self.clock.return_value += 300
+        self.cache.get("A1", "T1")
+
+        self.assertEqual(self.table.get_item.call_count, 2)
+
+    def test_negative_cache_for_unknown_team(self):
+        self.table.get_item.return_value = {}
+
+        self.assertIsNone(self.cache.get("A1", "T9"))
+        self.clock.return_value += 29
+        self.assertIsNone(self.cache.get("A1", "T9"))
+        self.assertEqual(self.table.get_item.call_count, 1)
+
+        self.clock.return_value += 1
+        self.cache.get("A1", "T9")
+        self.assertEqual(self.table.get_item.call_count, 2)
+
+    def test_lru_eviction(self):
+        self.table.get_item.return_value = mock_item()
+        self.cache.get("A1", "T1")
+        self.cache.get("A1", "T2")
+        self.cache.get("A1", "T1")  # T2 is now the least recently used
+        self.cache.get("A1", "T3")
+
+        self.table.get_item.reset_mock()
+        self.cache.get("A1", "T1")
+        self.table.get_item.assert_not_called()
+        self.cache.get("A1", "T2")
+        self.table.get_item.assert_called_once()
+
+    def test_invalidate(self):
+        self.table.get_item.return_value = mock_item()
+        self.cache.get("A1", "T1")
+
+        # Re-read once the token was rejected, e.g. after a re-installation
+        self.table.get_item.return_value = mock_item("new-bot-token")
+        self.cache.invalidate("A1", "T1")
+        self.assertEqual(self.cache.get("A1", "T1"), "new-bot-token")
+        self.assertEqual(self.table.get_item.call_count, 2)
+
+        # Nothing cached
+        self.cache.invalidate("A1", "T2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Lightweight tracing of a Slack request across ImmediateResponse and the workers.
+
+ImmediateResponse starts a trace per request and passes `trace_id` and `span_id` to the workers
+in their payload, where the trace is continued. Spans are recorded around each I/O call and
+exported once per invocation. Exporters follow the `export(spans)`/`shutdown()` interface of
+OpenTelemetry's `SpanExporter`, and `ConsoleSpanExporter` writes each span as an OTLP/JSON-like line.
+
+When X-Ray is active, the trace ID is taken from the X-Ray trace header (`_X_AMZN_TRACE_ID`) of the
+first function, so the spans can be matched with the X-Ray trace.
+"""
+import functools
+import json
+import os
+import secrets
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+TRACING_EXPORTER = os.environ.get("TracingExporter", "none")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str = None
+    start_time_ns: int = 0
+    end_time_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    status: str = "OK"
+
+    @property
+    def duration_ms(self):
+        return (self.end_time_ns - self.start_time_ns) / 1e6
+
+    def to_otlp(self, service):
+        return {
+            "resource": {"service.name": service},
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_time_ns,
+            "endTimeUnixNano": self.end_time_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+
+
+class SpanExporter:
+    """Same interface as OpenTelemetry's SpanExporter; discards the spans"""
+
+    def export(self, spans):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    def __init__(self, service, stream=None):
+        self.service = service
+        self.stream = stream
+
+    def export(self, spans):
+        stream = self.stream or sys.stdout
+        for span in spans:
+            stream.write(json.dumps(span.to_otlp(self.service)) + "\n")
+        stream.flush()
+
+
+def create_exporter(service, name=TRACING_EXPORTER):
+    if name == "console":
+        return ConsoleSpanExporter(service)
+    return SpanExporter()
+
+
+def trace_id_from_xray(header):
+    """Convert the Root of an X-Ray trace header (Root=1-5759e988-bd862e3fe1be46a994272793) to a trace ID"""
+    for part in (header or "").split(";"):
+        if part.startswith("Root="):
+            root = part[len("Root=") :].split("-")  # noqa: E203
+            if len(root) == 3:
+                return root[1] + root[2]
+
+
+class Tracer:
+    def __init__(self, service, exporter=None, id_generator=secrets.token_hex, clock=time.time_ns):
+        self.service = service
+        self.exporter = exporter or create_exporter(service)
+        self.id_generator = id_generator
+        self.clock = clock
+        self.trace_id = None
+        self._parent_span_id = None
+        self._stack = []
+        self._finished = []
+
+    def start_trace(self, trace_id=None, parent_span_id=None):
+        """Start a new trace, or continue the one of the caller"""
+        self.trace_id = (
+            trace_id
+            or trace_id_from_xray(os.environ.get("_X_AMZN_TRACE_ID"))
+            or self.id_generator(16)
+        )
+        self._parent_span_id = parent_span_id
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if self.trace_id is None:
+            self.start_trace()
+
+        span = Span(
+            name,
+            self.trace_id,
+            self.id_generator(8),
+            parent_span_id=self._stack[-1].span_id if self._stack else self._parent_span_id,
+            start_time_ns=self.clock(),
+            attributes=attributes,
+        )
+        self._stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "ERROR"
+            span.attributes["exception"] = str(e)
+            raise
+        finally:
+            span.end_time_ns = self.clock()
+            self._stack.pop()
+            self._finished.append(span)
+
+    def traced(self, name):
+        """Decorator recording a span around each call of a function"""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def inject(self, payload):
+        """Add the context of the current span to a worker payload"""
+        if self.trace_id is not None:
+            payload["trace_id"] = self.trace_id
+            payload["span_id"] = self._stack[-1].span_id if self._stack else self._parent_span_id
+        return payload
+
+    def flush(self):
+        """Export the spans finished since the last flush"""
+        spans, self._finished = self._finished, []
+        self.trace_id = None
+        self._parent_span_id = None
+        if spans:
+            self.exporter.export(spans)
+
+    def flush_after(self, handler):
+        """Decorator exporting the spans when a Lambda handler returns or raises"""
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                self.flush()
+
+        return wrapper
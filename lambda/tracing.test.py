@@ -0,0 +1,131 @@
+"""
+Unit tests for tracing.py
+"""
+import io
+import json
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+func = __import__("tracing")
+
+
+class MockIdGenerator:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, nbytes):
+        self.count += 1
+        return f"{self.count:0{nbytes * 2}x}"
+
+
+class RecordingExporter(func.SpanExporter):
+    def __init__(self):
+        self.exported = []
+
+    def export(self, spans):
+        self.exported.append(spans)
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.clock = MagicMock(return_value=1_000_000_000)
+        self.exporter = RecordingExporter()
+        self.tracer = func.Tracer(
+            "TestService", exporter=self.exporter, id_generator=MockIdGenerator(), clock=self.clock
+        )
+
+    def test_nested_spans(self):
+        self.tracer.start_trace()
+        with self.tracer.span("handler", team_id="T1"):
+            self.clock.return_value += 5_000_000
+            with self.tracer.span("lookup"):
+                self.clock.return_value += 20_000_000
+
+        lookup, handler = self.tracer._finished
+        self.assertEqual(handler.trace_id, "00000000000000000000000000000001")
+        self.assertEqual(lookup.trace_id, handler.trace_id)
+        self.assertIsNone(handler.parent_span_id)
+        self.assertEqual(lookup.parent_span_id, handler.span_id)
+        self.assertEqual(handler.attributes, {"team_id": "T1"})
+        self.assertEqual(lookup.duration_ms, 20.0)
+        self.assertEqual(handler.duration_ms, 25.0)
+
+    def test_continue_trace(self):
+        self.tracer.start_trace("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331")
+        with self.tracer.span("worker"):
+            pass
+
+        span = self.tracer._finished[0]
+        self.assertEqual(span.trace_id, "0af7651916cd43dd8448eb211c80319c")
+        self.assertEqual(span.parent_span_id, "b7ad6b7169203331")
+
+    def test_trace_id_from_xray(self):
+        header = "Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1"
+        self.assertEqual(func.trace_id_from_xray(header), "5759e988bd862e3fe1be46a994272793")
+        self.assertIsNone(func.trace_id_from_xray(None))
+
+        with patch.dict(os.environ, {"_X_AMZN_TRACE_ID": header}):
+            self.tracer.start_trace()
+        self.assertEqual(self.tracer.trace_id, "5759e988bd862e3fe1be46a994272793")
+
+    def test_inject(self):
+        self.assertEqual(self.tracer.inject({"app_id": "A1"}), {"app_id": "A1"})
+
+        self.tracer.start_trace()
+        with self.tracer.span("handler") as span:
+            payload = self.tracer.inject({"app_id": "A1"})
+        self.assertEqual(
+            payload, {"app_id": "A1", "trace_id": span.trace_id, "span_id": span.span_id}
+        )
+
+    def test_traced_error(self):
+        @self.tracer.traced("lookup")
+        def lookup():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            lookup()
+
+        span = self.tracer._finished[0]
+        self.assertEqual(span.status, "ERROR")
+        self.assertEqual(span.attributes["exception"], "boom")
+
+    def test_flush_after(self):
+        @self.tracer.flush_after
+        def handler(event, context):
+            with self.tracer.span("lookup"):
+                return "done"
+
+        self.assertEqual(handler({}, None), "done")
+        self.assertEqual([[s.name for s in spans] for spans in self.exporter.exported], [["lookup"]])
+        self.assertIsNone(self.tracer.trace_id)
+
+        # Nothing to export
+        self.tracer.flush()
+        self.assertEqual(len(self.exporter.exported), 1)
+
+    def test_console_exporter(self):
+        stream = io.StringIO()
+        self.tracer.exporter = func.ConsoleSpanExporter("TestService", stream=stream)
+        self.tracer.start_trace()
+        with self.tracer.span("lookup", table="T"):
+            self.clock.return_value += 1_000
+        self.tracer.flush()
+
+        span = json.loads(stream.getvalue())
+        self.assertEqual(span["resource"], {"service.name": "TestService"})
+        self.assertEqual(span["name"], "lookup")
+        self.assertEqual(span["traceId"], "00000000000000000000000000000001")
+        self.assertEqual(span["parentSpanId"], "")
+        self.assertEqual(span["endTimeUnixNano"] - span["startTimeUnixNano"], 1_000)
+        self.assertEqual(span["attributes"], {"table": "T"})
+        self.assertEqual(span["status"], {"code": "OK"})
+
+    def test_create_exporter(self):
+        self.assertIsInstance(func.create_exporter("S", "console"), func.ConsoleSpanExporter)
+        self.assertEqual(type(func.create_exporter("S", "none")), func.SpanExporter)
+
+
+if __name__ == "__main__":
+    unittest.main()
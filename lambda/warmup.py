@@ -0,0 +1,22 @@
+"""
+Fast path for the warm-up events sent by the scheduled EventBridge rules of the stacks.
+
+A warm-up event does no work at all: no logging of the payload, no AWS or Slack calls. When the
+rule pings a function from several targets at once, each ping holds its container for `hold_ms`
+so that the concurrent pings cannot all be served by the same container.
+"""
+import time
+
+# Must match WARMUP_SOURCE in slack_app_constructs_cdk/lambda_warmup.py
+WARMUP_SOURCE = "slack-chat-app.warmup"
+
+
+def is_warmup_event(event):
+    return isinstance(event, dict) and event.get("source") == WARMUP_SOURCE
+
+
+def warmup_response(event, sleep=time.sleep):
+    hold_ms = event.get("hold_ms", 0)
+    if hold_ms:
+        sleep(hold_ms / 1000)
+    return {"statusCode": 200}
@@ -0,0 +1,27 @@
+"""
+Unit tests for warmup.py
+"""
+import unittest
+from unittest.mock import MagicMock
+
+func = __import__("warmup")
+
+
+class TestWarmup(unittest.TestCase):
+    def test_is_warmup_event(self):
+        self.assertTrue(func.is_warmup_event({"source": func.WARMUP_SOURCE}))
+        self.assertFalse(func.is_warmup_event({"source": "aws.events"}))
+        self.assertFalse(func.is_warmup_event({"body": "{}"}))
+        self.assertFalse(func.is_warmup_event(None))
+
+    def test_warmup_response(self):
+        sleep = MagicMock()
+        self.assertEqual(func.warmup_response({"source": func.WARMUP_SOURCE}, sleep), {"statusCode": 200})
+        sleep.assert_not_called()
+
+        func.warmup_response({"source": func.WARMUP_SOURCE, "hold_ms": 100}, sleep)
+        sleep.assert_called_once_with(0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+SQS-buffered work queue between ImmediateResponse and AsyncWorker.
+
+In queue mode ImmediateResponse enqueues worker payloads to SQS and AsyncWorker consumes them in
+batches, reporting partial batch failures so only the failed messages are retried.
+`LocalQueue` is an in-process stand-in for the queue with the same send/receive shapes.
+"""
+import json
+import logging
+import uuid
+from collections import deque
+
+
+def is_sqs_event(event):
+    records = event.get("Records") if isinstance(event, dict) else None
+    return bool(records) and records[0].get("eventSource") == "aws:sqs"
+
+
+def process_batch(event, process_record):
+    """Call `process_record` with each message payload; return the IDs of failed messages"""
+    failures = []
+    for record in event["Records"]:
+        try:
+            process_record(json.loads(record["body"]))
+        except Exception as e:
+            logging.error(f"Failed to process message {record['messageId']}: {e}")
+            failures.append({"itemIdentifier": record["messageId"]})
+
+    return {"batchItemFailures": failures}
+
+
+class LocalQueue:
+    """In-process stand-in for an SQS queue feeding a Lambda event source mapping"""
+
+    def __init__(self, max_receive_count=3):
+        self.max_receive_count = max_receive_count
+        self.messages = deque()
+        self.dead_letters = []
+        self._in_flight = {}
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = str(uuid.uuid4())
+        self.messages.append({"messageId": message_id, "body": MessageBody, "receive_count": 0})
+        return {"MessageId": message_id, "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def receive_event(self, batch_size=10):
+        """Return up to `batch_size` messages as an SQS event, or None when the queue is empty"""
+        records = []
+        while self.messages and len(records) < batch_size:
+            message = self.messages.popleft()
+            message["receive_count"] += 1
+            records.append(message)
+
+        if not records:
+            return None
+
+        self._in_flight = {m["messageId"]: m for m in records}
+        return {
+            "Records": [
+                {
+                    "messageId": m["messageId"],
+                    "receiptHandle": m["messageId"],
+                    "body": m["body"],
+                    "attributes": {"ApproximateReceiveCount": str(m["receive_count"])},
+                    "eventSource": "aws:sqs",
+                }
+                for m in records
+            ]
+        }
+
+    def complete(self, response):
+        """Requeue the failed messages of the last batch, or dead-letter them after too many tries"""
+        for failure in (response or {}).get("batchItemFailures", []):
+            message = self._in_flight[failure["itemIdentifier"]]
+            if message["receive_count"] >= self.max_receive_count:
+                self.dead_letters.append(message)
+            else:
+                self.messages.append(message)
+        self._in_flight = {}
+
+    def drain(self, handler, batch_size=10):
+        """Feed all messages to a Lambda handler in batches until the queue is empty"""
+        while True:
+            event = self.receive_event(batch_size)
+            if event is None:
+                return
+            self.complete(handler(event, None))
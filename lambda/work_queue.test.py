@@ -0,0 +1,59 @@
+"""
+Unit tests for work_queue.py
+"""
+import json
+import unittest
+
+func = __import__("work_queue")
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = func.LocalQueue(max_receive_count=2)
+        for i in range(3):
+            self.queue.send_message(QueueUrl="local", MessageBody=json.dumps({"n": i}))
+
+    def test_receive_event_in_batches(self):
+        event = self.queue.receive_event(batch_size=2)
+
+        self.assertTrue(func.is_sqs_event(event))
+        self.assertEqual([json.loads(r["body"]) for r in event["Records"]], [{"n": 0}, {"n": 1}])
+        self.assertEqual(len(self.queue.receive_event(batch_size=2)["Records"]), 1)
+        self.assertIsNone(self.queue.receive_event())
+
+    def test_is_sqs_event(self):
+        self.assertFalse(func.is_sqs_event({"app_id": "A1"}))
+        self.assertFalse(func.is_sqs_event({"Records": []}))
+
+    def test_process_batch_partial_failures(self):
+        event = self.queue.receive_event()
+
+        def process_record(payload):
+            if payload["n"] == 1:
+                raise RuntimeError("failed")
+
+        resp = func.process_batch(event, process_record)
+
+        self.assertEqual(
+            resp, {"batchItemFailures": [{"itemIdentifier": event["Records"][1]["messageId"]}]}
+        )
+
+    def test_drain_retries_then_dead_letters(self):
+        processed = []
+
+        def handler(event, context):
+            def process_record(payload):
+                processed.append(payload["n"])
+                if payload["n"] == 2:
+                    raise RuntimeError("failed")
+
+            return func.process_batch(event, process_record)
+
+        self.queue.drain(handler, batch_size=10)
+
+        self.assertEqual(processed, [0, 1, 2, 2])
+        self.assertEqual([json.loads(m["body"]) for m in self.queue.dead_letters], [{"n": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ import boto3
 AWS_REGION = "ap-southeast-2"
 DATA = {
     "verification_token": None,  # Slack Verification Token
+    "signing_secret": None,  # optional: Slack Signing Secret for verifying X-Slack-Signature
     "client_id": None,  # optional: required for deploying K-CDK-SlackChatAppSharing for app sharing with oauth 2.0
     "client_secret": None,  # optional: required for deploying K-CDK-SlackChatAppSharing for app sharing with oauth 2.0
 }
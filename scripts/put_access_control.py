@@ -0,0 +1,82 @@
+"""
+Load the teams and channels under `access` of env_<stage>.json into the access control table, or
+disable teams, without redeploying the stack. Running functions pick up the changes within
+`AccessControlRefreshSeconds` (default 60). A disabled team is denied even when it is also given in
+`SlackTeamIds` (`access_control.environment_allowlist`).
+
+    ENV_STAGE=dev python scripts/put_access_control.py
+    ENV_STAGE=dev python scripts/put_access_control.py --disable T1111111111 T2222222222
+"""
+import argparse
+import json
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+ENV_STAGE = os.environ.get("ENV_STAGE", "dev")
+TARGET_REGION = os.environ.get("AWS_REGION", "ap-southeast-2")
+VERSION_KEY = "#version"
+ENTRY_TYPE = "team"
+
+with open(f"env_{ENV_STAGE}.json") as json_file:
+    stage_settings = json.load(json_file)
+
+DDB_TABLE_NAME = f'{stage_settings["name"]}-SlackChatApp-AccessControl'
+
+table = boto3.resource("dynamodb", region_name=TARGET_REGION).Table(DDB_TABLE_NAME)
+
+
+def put_team(team_id, channel_ids, version, enabled=True):
+    # entry_type and updated_at are the keys of the index the functions query for changes
+    item = {"team_id": team_id, "enabled": enabled, "updated_at": version, "entry_type": ENTRY_TYPE}
+    if channel_ids:
+        item["channel_ids"] = set(channel_ids)
+    table.put_item(Item=item)
+    print(item)
+
+
+def check_version(version):
+    """Stop before writing any item if a change with a newer version stamp was already made"""
+    item = table.get_item(Key={"team_id": VERSION_KEY}, ConsistentRead=True).get("Item") or {}
+    if int(item.get("version", 0)) >= version:
+        raise SystemExit(f"A newer change (version {item['version']}) was made, run this again")
+
+
+def bump_version(version):
+    """Raise the version stamp after the items are written, so readers only see complete changes"""
+    try:
+        table.update_item(
+            Key={"team_id": VERSION_KEY},
+            UpdateExpression="SET version = :version",
+            ConditionExpression="attribute_not_exists(version) OR version < :version",
+            ExpressionAttributeValues={":version": version},
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        # Readers that loaded the newer version skip the items of this one
+        raise SystemExit(f"A newer change was made while writing version {version}, run this again")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--disable", nargs="+", metavar="TEAM_ID", help="Team IDs to disable")
+    args = parser.parse_args()
+
+    version = int(time.time() * 1000)
+    check_version(version)
+    if args.disable:
+        for team_id in args.disable:
+            put_team(team_id, None, version, enabled=False)
+    else:
+        for v in stage_settings["access"].values():
+            if v.get("team_id"):
+                put_team(v["team_id"], list(v.get("channels", {}).keys()), version)
+
+    bump_version(version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Per-function Lambda assets, packaging only the handler module and the local modules it imports.
+
+The imports of each handler are followed through the modules in `lambda/` at synth time. Modules
+needed by more than one function of a stack can instead be shipped once in a shared Lambda layer.
+"""
+import ast
+import os
+import shutil
+
+from aws_cdk import Annotations, Names, Stage
+from aws_cdk import aws_lambda as lambda_
+from constructs import Construct
+
+LAMBDA_DIR = "lambda"
+ALWAYS_EXCLUDE = ["*.test.py", "requirements.txt", "__pycache__", "*.pyc"]
+
+# Modules loaded with importlib at runtime, which cannot be found by following the imports
+DYNAMIC_IMPORTS = {
+    "command_registry": ["commands"],
+}
+
+
+def local_modules(lambda_dir=LAMBDA_DIR):
+    """Top-level module and package names in the lambda directory => their path"""
+    ret = {}
+    for entry in os.listdir(lambda_dir):
+        path = os.path.join(lambda_dir, entry)
+        if entry.endswith(".py") and not entry.endswith(".test.py"):
+            ret[entry[:-3]] = path
+        elif os.path.isfile(os.path.join(path, "__init__.py")):
+            ret[entry] = path
+    return ret
+
+
+def _source_files(path):
+    if os.path.isfile(path):
+        return [path]
+    ret = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        ret.extend(
+            os.path.join(root, f)
+            for f in sorted(files)
+            if f.endswith(".py") and not f.endswith(".test.py")
+        )
+    return ret
+
+
+def _imported_names(file_path):
+    with open(file_path) as f:
+        tree = ast.parse(f.read(), filename=file_path)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            yield node.module.split(".")[0]
+
+
+def module_dependencies(modules, lambda_dir=LAMBDA_DIR):
+    """Names of the given local modules and of all local modules they import, recursively"""
+    available = local_modules(lambda_dir)
+    found = set()
+    pending = list(modules)
+    while pending:
+        name = pending.pop()
+        if name in found:
+            continue
+        if name not in available:
+            raise ValueError(f"Module {name} not found in {lambda_dir}")
+        found.add(name)
+        pending.extend(DYNAMIC_IMPORTS.get(name, []))
+        for file_path in _source_files(available[name]):
+            pending.extend(n for n in _imported_names(file_path) if n in available)
+    return found
+
+
+def package_size(modules, lambda_dir=LAMBDA_DIR):
+    """Total size in bytes of the source files of the modules"""
+    available = local_modules(lambda_dir)
+    return sum(
+        os.path.getsize(f) for name in modules for f in _source_files(available[name])
+    )
+
+
+def asset_code(modules, lambda_dir=LAMBDA_DIR) -> lambda_.Code:
+    """Asset of the lambda directory with everything but the given modules excluded"""
+    excluded = [
+        os.path.basename(path)
+        for name, path in local_modules(lambda_dir).items()
+        if name not in modules
+    ]
+    return lambda_.Code.from_asset(lambda_dir, exclude=ALWAYS_EXCLUDE + sorted(excluded))
+
+
+def layer_code(scope: Construct, modules, lambda_dir=LAMBDA_DIR) -> lambda_.Code:
+    """
+    Asset of a layer with the given modules under `python/`, which Lambda adds to sys.path. The
+    layer is built in the cloud assembly directory, replacing the one of the previous synth.
+    """
+    available = local_modules(lambda_dir)
+    staging_dir = os.path.join(Stage.of(scope).outdir, f"layer.{Names.unique_id(scope)}")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    for name in sorted(modules):
+        for file_path in _source_files(available[name]):
+            target = os.path.join(staging_dir, "python", os.path.relpath(file_path, lambda_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(file_path, target)
+    return lambda_.Code.from_asset(staging_dir)
+
+
+def shared_modules(function_modules):
+    """Modules needed by more than one function; function name => module names"""
+    seen, shared = set(), set()
+    for modules in function_modules.values():
+        shared |= seen & modules
+        seen |= modules
+    return shared
+
+
+def report_package_size(scope: Construct, function_name: str, modules, layer_modules=()):
+    size = package_size(modules)
+    message = f"{function_name} package: {len(modules)} module(s), {size / 1024:.1f} KiB"
+    if layer_modules:
+        message += f", plus {package_size(layer_modules) / 1024:.1f} KiB in the shared layer"
+    Annotations.of(scope).add_info(message)
@@ -0,0 +1,140 @@
+"""
+Per-function Lambda sizing from the `performance` block of the stage settings, e.g.
+
+    "performance": {
+        "default": {"architecture": "arm64", "memory_size": 256},
+        "ImmediateResponse": {"memory_size": 512, "timeout_seconds": 30, "provisioned_concurrency": 1}
+    }
+
+Settings of a function override the `default` ones. A function with provisioned concurrency gets
+a `live` alias, which its callers must invoke for the provisioned instances to be used.
+
+The `init_priming` block enables the priming of all functions during INIT, see lambda/priming.py.
+
+The `tracing` block switches on AWS X-Ray for all functions and API stages (`xray`), and selects the
+exporter of the spans recorded by the handlers (`exporter`), see lambda/tracing.py.
+
+The `logging` block sets the level and the sampling rates of the logs of each function, overriding
+the `default` ones like `performance`, see lambda/structured_logging.py.
+
+The `profiling` block sets the share of the invocations of each function that are profiled, and
+where their summaries go, overriding the `default` ones likewise, see lambda/profiling.py.
+"""
+import json
+
+from aws_cdk import Duration, Size
+from aws_cdk import aws_lambda as lambda_
+from constructs import Construct
+
+DEFAULT_TIMEOUT_SECONDS = 900
+LIVE_ALIAS_NAME = "live"
+
+ARCHITECTURES = {
+    "arm64": lambda_.Architecture.ARM_64,
+    "x86_64": lambda_.Architecture.X86_64,
+}
+
+
+def get_performance_settings(settings, function_name):
+    performance = settings.get("performance", {})
+    return {**performance.get("default", {}), **performance.get(function_name, {})}
+
+
+def get_timeout_seconds(settings, function_name):
+    return get_performance_settings(settings, function_name).get(
+        "timeout_seconds", DEFAULT_TIMEOUT_SECONDS
+    )
+
+
+def function_props(settings, function_name) -> dict:
+    """Keyword arguments of lambda_.Function for the sizing of the function"""
+    perf = get_performance_settings(settings, function_name)
+
+    architecture = perf.get("architecture", "x86_64")
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unsupported architecture {architecture} of {function_name}")
+
+    props = {
+        "architecture": ARCHITECTURES[architecture],
+        "timeout": Duration.seconds(get_timeout_seconds(settings, function_name)),
+    }
+    if perf.get("memory_size"):
+        props["memory_size"] = perf["memory_size"]
+    if perf.get("ephemeral_storage_size"):
+        props["ephemeral_storage_size"] = Size.mebibytes(perf["ephemeral_storage_size"])
+    if perf.get("reserved_concurrency") is not None:
+        props["reserved_concurrent_executions"] = perf["reserved_concurrency"]
+    # Active tracing also grants the function role the X-Ray write permissions
+    props["tracing"] = lambda_.Tracing.ACTIVE if xray_enabled(settings) else lambda_.Tracing.DISABLED
+    return props
+
+
+def xray_enabled(settings) -> bool:
+    return settings.get("tracing", {}).get("xray", False) is True
+
+
+def tracing_environment(settings) -> dict:
+    """Environment variables selecting the exporter of the spans, see lambda/tracing.py"""
+    exporter = settings.get("tracing", {}).get("exporter")
+    return {"TracingExporter": exporter} if exporter else {}
+
+
+def init_priming_environment(settings) -> dict:
+    """Environment variables enabling the priming of a function during INIT, see lambda/priming.py"""
+    priming = settings.get("init_priming", {})
+    if not priming.get("enabled"):
+        return {}
+
+    env = {
+        "InitPriming": "true",
+        "InitPrimingStepTimeoutSeconds": str(priming.get("step_timeout_seconds", 2.0)),
+        "SlackAppId": settings["slack_app_id"],
+    }
+    if priming.get("preload_owner_bot_token") and settings.get("slack_app_owner_team_id"):
+        env["SlackAppOwnerTeamId"] = settings["slack_app_owner_team_id"]
+    return env
+
+
+def logging_environment(settings, function_name) -> dict:
+    """Environment variables of the log level, sampling and debug override of a function"""
+    log_settings = settings.get("logging", {})
+    config = {**log_settings.get("default", {}), **log_settings.get(function_name, {})}
+
+    env = {}
+    if config.get("level"):
+        env["LogLevel"] = config["level"]
+    if config.get("sample_rates"):
+        env["LogSampleRates"] = json.dumps(config["sample_rates"])
+    if config.get("debug_user_ids"):
+        env["LogDebugUserIds"] = ",".join(config["debug_user_ids"])
+    return env
+
+
+def profiling_environment(settings, function_name) -> dict:
+    """Environment variables of the sampled profiling of a function"""
+    profiling = settings.get("profiling", {})
+    config = {**profiling.get("default", {}), **profiling.get(function_name, {})}
+
+    env = {}
+    if config.get("sample_rate"):
+        env["ProfilingSampleRate"] = str(config["sample_rate"])
+    if config.get("output"):
+        env["ProfilingOutput"] = config["output"]
+    if config.get("top"):
+        env["ProfilingTop"] = str(config["top"])
+    return env
+
+
+def create_live_alias(scope: Construct, func: lambda_.Function, settings, function_name):
+    """Create the `live` alias with provisioned concurrency, if any is set for the function"""
+    provisioned = get_performance_settings(settings, function_name).get("provisioned_concurrency")
+    if not provisioned:
+        return None
+
+    return lambda_.Alias(
+        scope,
+        f"{func.node.id}-{LIVE_ALIAS_NAME}",
+        alias_name=LIVE_ALIAS_NAME,
+        version=func.current_version,
+        provisioned_concurrent_executions=provisioned,
+    )
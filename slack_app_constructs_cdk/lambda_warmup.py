@@ -0,0 +1,58 @@
+"""
+Scheduled warm-up pings keeping a number of containers of each function warm, from the `warmup`
+block of the stage settings, e.g.
+
+    "warmup": {"enabled": true, "schedule_minutes": 5, "concurrency": {"ImmediateResponse": 2}}
+
+A function is pinged by `concurrency` rule targets at the same time (a rule has at most 5 targets).
+The handlers recognise the event and return without doing any work, see lambda/warmup.py.
+"""
+import math
+
+from aws_cdk import Duration
+from aws_cdk import aws_events as events_
+from aws_cdk import aws_events_targets as events_targets_
+from aws_cdk import aws_lambda as lambda_
+from constructs import Construct
+
+# Must match WARMUP_SOURCE in lambda/warmup.py
+WARMUP_SOURCE = "slack-chat-app.warmup"
+MAX_TARGETS_PER_RULE = 5
+DEFAULT_HOLD_MS = 100
+
+
+def get_warmup_concurrency(settings, function_name):
+    warmup = settings.get("warmup", {})
+    if not warmup.get("enabled"):
+        return 0
+    return warmup.get("concurrency", {}).get(function_name, 1)
+
+
+def create_warmup_rules(
+    scope: Construct, rule_id: str, target: lambda_.IFunction, settings, function_name: str
+):
+    """Schedule the warm-up pings of a function; return the rules"""
+    concurrency = get_warmup_concurrency(settings, function_name)
+    warmup = settings.get("warmup", {})
+    event = {
+        "source": WARMUP_SOURCE,
+        # Concurrent pings hold their containers briefly so each lands on a different one
+        "hold_ms": warmup.get("hold_ms", DEFAULT_HOLD_MS) if concurrency > 1 else 0,
+    }
+
+    rules = []
+    for i in range(math.ceil(concurrency / MAX_TARGETS_PER_RULE)):
+        rule = events_.Rule(
+            scope,
+            f"{rule_id}-Warmup{i}",
+            description=f"Keep {function_name} warm",
+            schedule=events_.Schedule.rate(Duration.minutes(warmup.get("schedule_minutes", 5))),
+        )
+        for _ in range(min(MAX_TARGETS_PER_RULE, concurrency - i * MAX_TARGETS_PER_RULE)):
+            rule.add_target(
+                events_targets_.LambdaFunction(
+                    target, event=events_.RuleTargetInput.from_object(event), retry_attempts=0
+                )
+            )
+        rules.append(rule)
+    return rules
@@ -1,12 +1,39 @@
-from aws_cdk import CfnParameter, Duration, RemovalPolicy, Stack
+from aws_cdk import CfnOutput, CfnParameter, Duration, RemovalPolicy, Stack
 from aws_cdk import aws_apigateway as apigw_
+from aws_cdk import aws_apigatewayv2 as apigwv2_
+from aws_cdk import aws_apigatewayv2_integrations as apigwv2_integrations_
 from aws_cdk import aws_dynamodb as ddb_
 from aws_cdk import aws_iam as iam_
 from aws_cdk import aws_lambda as lambda_
+from aws_cdk import aws_lambda_event_sources as lambda_event_sources_
+from aws_cdk import aws_sqs as sqs_
 from aws_cdk.aws_logs import LogGroup, RetentionDays
 from constructs import Construct
 
-LAMBDA_DIR = "lambda"
+from slack_app_constructs_cdk.lambda_bundling import (
+    asset_code,
+    layer_code,
+    module_dependencies,
+    report_package_size,
+    shared_modules,
+)
+from slack_app_constructs_cdk.lambda_performance import (
+    LIVE_ALIAS_NAME,
+    create_live_alias,
+    function_props,
+    get_timeout_seconds,
+    init_priming_environment,
+    logging_environment,
+    profiling_environment,
+    tracing_environment,
+    xray_enabled,
+)
+
+from slack_app_constructs_cdk.lambda_warmup import create_warmup_rules
+
+INGRESS_REST_API = "rest_api"
+INGRESS_HTTP_API = "http_api"
+INGRESS_FUNCTION_URL = "function_url"
 
 
 def get_channel_ids(settings):
@@ -25,6 +52,9 @@ class SlackAppConstructsStack(Stack):
     def __init__(self, scope: Construct, id: str, settings, **kwargs) -> None:
         super().__init__(scope, id, **kwargs)
         self.id = id
+        self.settings = settings
+        self.functions = {}
+        self.live_aliases = {}
 
         # cdk deploy --parameters StageName=v1
         stage = CfnParameter(
@@ -37,73 +67,212 @@ class SlackAppConstructsStack(Stack):
 
         table_name = f"{id}-OAuth"
         ssm_param_key_verification_token = settings["ssm_parameter_key_verification_token"]
+        ssm_param_key_signing_secret = settings.get("ssm_parameter_key_signing_secret")
+        ssm_param_keys = [ssm_param_key_verification_token]
+        if ssm_param_key_signing_secret:
+            ssm_param_keys.append(ssm_param_key_signing_secret)
 
         # Create dynamodb table for oauth tokens of all app installations
         self.oauth_table = self.create_dynamodb_table(table_name)
 
+        # Create dynamodb table for de-duplicating retried Slack event deliveries
+        event_dedup_table_name = f"{id}-EventDedup"
+        self.event_dedup_table = self.create_event_dedup_table(event_dedup_table_name)
+
+        # Create dynamodb table for the allowlist of teams and channels, see lambda/access_control.py
+        access_control_table_name = f"{id}-AccessControl"
+        self.access_control_table = self.create_access_control_table(access_control_table_name)
+
+        # Create dynamodb table for the per-workspace Slack API rate limits shared by all functions
+        rate_limit_table_name = f"{id}-RateLimit"
+        self.rate_limit_table = self.create_rate_limit_table(rate_limit_table_name)
+
+        # Package each function with only the local modules it imports
+        self.function_modules = {
+            "AsyncWorker": module_dependencies(["AsyncWorker"]),
+            "SyncWorker": module_dependencies(["SyncWorker"]),
+            "ImmediateResponse": module_dependencies(
+                # SyncWorker is imported at runtime when run in process
+                ["ImmediateResponse", "SyncWorker"]
+                if settings.get("sync_worker_in_process")
+                else ["ImmediateResponse"]
+            ),
+        }
+
+        # Optionally ship the modules shared by the functions once, in a layer
+        self.layer = None
+        self.layer_modules = set()
+        if settings.get("lambda_layer"):
+            self.layer_modules = shared_modules(self.function_modules) - set(self.function_modules)
+            self.layer = lambda_.LayerVersion(
+                self,
+                f"{id}-SharedLayer",
+                code=layer_code(self, self.layer_modules),
+                compatible_runtimes=[lambda_.Runtime.PYTHON_3_14],
+                description=f"{id} shared modules",
+                layer_version_name=f"{id}-SharedLayer",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+
         # Create function AsyncWorker
         self.func_async_worker = self.create_lambda(
             "AsyncWorker", self.oauth_table.table_arn, custom_role=None
         )
         self.func_async_worker.add_environment("OAuthDynamoDBTable", table_name)
+        self.func_async_worker.add_environment("RateLimitDynamoDBTable", rate_limit_table_name)
 
         # Create function SyncWorker
         self.func_sync_worker = self.create_lambda(
             "SyncWorker", self.oauth_table.table_arn, custom_role=None
         )
         self.func_sync_worker.add_environment("OAuthDynamoDBTable", table_name)
+        self.func_sync_worker.add_environment("RateLimitDynamoDBTable", rate_limit_table_name)
+
+        # Optionally buffer AsyncWorker requests in an SQS queue consumed in batches
+        self.work_queue = None
+        work_queue_settings = settings.get("work_queue", {})
+        if work_queue_settings.get("enabled"):
+            self.work_queue = self.create_work_queue(
+                f"{id}-AsyncWorker", get_timeout_seconds(settings, "AsyncWorker")
+            )
+            self.invoke_target("AsyncWorker").add_event_source(
+                lambda_event_sources_.SqsEventSource(
+                    self.work_queue,
+                    batch_size=work_queue_settings.get("batch_size", 10),
+                    max_batching_window=Duration.seconds(
+                        work_queue_settings.get("max_batching_window_seconds", 1)
+                    ),
+                    report_batch_item_failures=True,
+                )
+            )
 
         # Create function and role for ImmediateResponse
         func_immediate_response_role = self.create_immediate_response_execution_role(
-            f"{id}-ImmediateResponse", ssm_param_key_verification_token, self.oauth_table.table_arn
+            f"{id}-ImmediateResponse",
+            ssm_param_keys,
+            self.oauth_table.table_arn,
+            self.event_dedup_table.table_arn,
+            self.access_control_table.table_arn,
         )
         func_immediate_response = self.create_lambda(
             "ImmediateResponse", self.oauth_table.table_arn, func_immediate_response_role
         )
         func_immediate_response.add_environment("SlackAppId", settings["slack_app_id"])
+        # The allowlist is read from the access control table, the environment is limited to 4 KB
+        if settings.get("access_control", {}).get("environment_allowlist"):
+            func_immediate_response.add_environment(
+                "SlackChannelIds", ",".join(get_channel_ids(settings))
+            )
+            func_immediate_response.add_environment(
+                "SlackTeamIds", ",".join(get_team_ids(settings))
+            )
         func_immediate_response.add_environment(
-            "SlackChannelIds", ",".join(get_channel_ids(settings))
+            "SlackVerificationTokenParameterKey", ssm_param_key_verification_token
         )
-        func_immediate_response.add_environment("SlackTeamIds", ",".join(get_team_ids(settings)))
+        if ssm_param_key_signing_secret:
+            func_immediate_response.add_environment(
+                "SlackSigningSecretParameterKey", ssm_param_key_signing_secret
+            )
         func_immediate_response.add_environment(
-            "SlackVerificationTokenParameterKey", ssm_param_key_verification_token
+            "AsyncWorkerLambdaFunctionName", self.invoke_name("AsyncWorker")
         )
         func_immediate_response.add_environment(
-            "AsyncWorkerLambdaFunctionName", f"{id}-AsyncWorker"
+            "SyncWorkerLambdaFunctionName", self.invoke_name("SyncWorker")
+        )
+        if self.work_queue is not None:
+            func_immediate_response.add_environment("AsyncWorkerQueueUrl", self.work_queue.queue_url)
+            self.work_queue.grant_send_messages(func_immediate_response)
+        func_immediate_response.add_environment(
+            "AckFirst", "true" if settings.get("ack_first") else "false"
+        )
+        func_immediate_response.add_environment(
+            "SyncWorkerInProcess", "true" if settings.get("sync_worker_in_process") else "false"
         )
-        func_immediate_response.add_environment("SyncWorkerLambdaFunctionName", f"{id}-SyncWorker")
         func_immediate_response.add_environment("OAuthDynamoDBTable", table_name)
+        func_immediate_response.add_environment("EventDedupDynamoDBTable", event_dedup_table_name)
+        func_immediate_response.add_environment(
+            "AccessControlDynamoDBTable", access_control_table_name
+        )
+        func_immediate_response.add_environment("RateLimitDynamoDBTable", rate_limit_table_name)
 
+        # Optionally keep the functions warm with scheduled pings
+        for function_name in self.functions:
+            create_warmup_rules(
+                self,
+                f"{id}-{function_name}",
+                self.invoke_target(function_name),
+                settings,
+                function_name,
+            )
+
+        # Create the endpoint of ImmediateResponse for Slack
+        ingress = settings.get("ingress", INGRESS_REST_API)
+        if ingress == INGRESS_REST_API:
+            self.create_rest_api(self.invoke_target("ImmediateResponse"), stage)
+        elif ingress == INGRESS_HTTP_API:
+            self.create_http_api(self.invoke_target("ImmediateResponse"))
+        elif ingress == INGRESS_FUNCTION_URL:
+            self.create_function_url(self.invoke_target("ImmediateResponse"))
+        else:
+            raise ValueError(f"Unsupported ingress {ingress}")
+
+    def create_rest_api(self, handler: lambda_.IFunction, stage: str) -> apigw_.RestApi:
+        """Edge-optimized REST API, deployed to the given stage"""
         api = apigw_.LambdaRestApi(
             self,
-            f"{id}-API",
-            description=f"{id} API",
+            f"{self.id}-API",
+            description=f"{self.id} API",
             endpoint_configuration=apigw_.EndpointConfiguration(types=[apigw_.EndpointType.EDGE]),
-            handler=func_immediate_response,
+            handler=handler,
             deploy=False,
         )
 
         # Create APIGW Loggroup for setting retention
         LogGroup(
             self,
-            f"{id}-API-LogGroup",
+            f"{self.id}-API-LogGroup",
             log_group_name=f"API-Gateway-Execution-Logs_{api.rest_api_id}/{stage}",
             retention=RetentionDays.ONE_DAY,
         )
 
         # Do a new deployment on specific stage
-        new_deployment = apigw_.Deployment(self, f"{id}-API-Deployment", api=api)
+        new_deployment = apigw_.Deployment(self, f"{self.id}-API-Deployment", api=api)
         apigw_.Stage(
             self,
-            f"{id}-API-Stage",
+            f"{self.id}-API-Stage",
             data_trace_enabled=False,
             description=f"{stage} environment",
             deployment=new_deployment,
             logging_level=apigw_.MethodLoggingLevel.ERROR,
             metrics_enabled=True,
             stage_name=stage,
-            tracing_enabled=False,
+            tracing_enabled=xray_enabled(self.settings),
+        )
+        return api
+
+    def create_http_api(self, handler: lambda_.IFunction) -> apigwv2_.HttpApi:
+        """Regional HTTP API (API Gateway v2) with the default stage, proxying all routes"""
+        api = apigwv2_.HttpApi(
+            self,
+            f"{self.id}-HttpApi",
+            description=f"{self.id} API",
+            default_integration=apigwv2_integrations_.HttpLambdaIntegration(
+                f"{self.id}-HttpApi-Integration", handler
+            ),
         )
+        CfnOutput(self, "EndpointUrl", value=api.api_endpoint)
+        return api
+
+    def create_function_url(self, handler: lambda_.IFunction) -> lambda_.FunctionUrl:
+        """Lambda Function URL; requests are authenticated by ImmediateResponse itself"""
+        url = lambda_.FunctionUrl(
+            self,
+            f"{self.id}-FunctionUrl",
+            function=handler,
+            auth_type=lambda_.FunctionUrlAuthType.NONE,
+        )
+        CfnOutput(self, "EndpointUrl", value=url.url)
+        return url
 
     def create_dynamodb_table(self, table_name: str) -> ddb_.Table:
         return ddb_.Table(
@@ -116,24 +285,76 @@ class SlackAppConstructsStack(Stack):
             table_name=table_name,
         )
 
+    def create_event_dedup_table(self, table_name: str) -> ddb_.Table:
+        return ddb_.Table(
+            self,
+            table_name,
+            billing_mode=ddb_.BillingMode.PAY_PER_REQUEST,
+            partition_key=ddb_.Attribute(name="event_id", type=ddb_.AttributeType.STRING),
+            removal_policy=RemovalPolicy.DESTROY,
+            table_name=table_name,
+            time_to_live_attribute="expires_at",
+        )
+
+    def create_access_control_table(self, table_name: str) -> ddb_.Table:
+        table = ddb_.Table(
+            self,
+            table_name,
+            billing_mode=ddb_.BillingMode.PAY_PER_REQUEST,
+            partition_key=ddb_.Attribute(name="team_id", type=ddb_.AttributeType.STRING),
+            removal_policy=RemovalPolicy.DESTROY,
+            table_name=table_name,
+        )
+        # Queried by the functions for the items changed since the version they have loaded
+        table.add_global_secondary_index(
+            index_name="entry_type-updated_at-index",
+            partition_key=ddb_.Attribute(name="entry_type", type=ddb_.AttributeType.STRING),
+            sort_key=ddb_.Attribute(name="updated_at", type=ddb_.AttributeType.NUMBER),
+        )
+        return table
+
+    def create_rate_limit_table(self, table_name: str) -> ddb_.Table:
+        return ddb_.Table(
+            self,
+            table_name,
+            billing_mode=ddb_.BillingMode.PAY_PER_REQUEST,
+            partition_key=ddb_.Attribute(name="bucket", type=ddb_.AttributeType.STRING),
+            removal_policy=RemovalPolicy.DESTROY,
+            table_name=table_name,
+            time_to_live_attribute="expires_at",
+        )
+
+    def create_work_queue(self, queue_name: str, consumer_timeout_seconds: int) -> sqs_.Queue:
+        return sqs_.Queue(
+            self,
+            f"{queue_name}-Queue",
+            dead_letter_queue=sqs_.DeadLetterQueue(
+                max_receive_count=3,
+                queue=sqs_.Queue(
+                    self,
+                    f"{queue_name}-DLQ",
+                    queue_name=f"{queue_name}-DLQ",
+                    retention_period=Duration.days(14),
+                ),
+            ),
+            queue_name=f"{queue_name}-Queue",
+            # Must not be shorter than the timeout of the consuming function
+            visibility_timeout=Duration.seconds(consumer_timeout_seconds + 60),
+        )
+
     def create_lambda(
         self, function_name: str, table_arn: str, custom_role: iam_.Role
     ) -> lambda_.Function:
         if custom_role is None:
             custom_role: iam_.Role = self.create_default_role(
-                f"{self.id}-{function_name}", table_arn
+                f"{self.id}-{function_name}", table_arn, self.rate_limit_table.table_arn
             )
 
-        return lambda_.Function(
+        modules = self.function_modules[function_name]
+        func = lambda_.Function(
             self,
             f"{self.id}-{function_name}",
-            code=lambda_.Code.from_asset(
-                LAMBDA_DIR,
-                exclude=[
-                    "*.test.py",
-                    "requirements.txt",
-                ],
-            ),
+            code=asset_code(modules - self.layer_modules),
             current_version_options=lambda_.VersionOptions(
                 removal_policy=RemovalPolicy.DESTROY,
                 retry_attempts=2,
@@ -141,14 +362,45 @@ class SlackAppConstructsStack(Stack):
             function_name=f"{self.id}-{function_name}",
             handler=f"{function_name}.lambda_handler",
             log_retention=RetentionDays.ONE_DAY,
+            layers=[self.layer] if self.layer else None,
             role=custom_role,
             runtime=lambda_.Runtime.PYTHON_3_14,
-            timeout=Duration.seconds(900),
-            tracing=lambda_.Tracing.DISABLED,
+            **function_props(self.settings, function_name),
+        )
+        report_package_size(
+            func, function_name, modules - self.layer_modules, modules & self.layer_modules
         )
+        for k, v in {
+            **init_priming_environment(self.settings),
+            **tracing_environment(self.settings),
+            **logging_environment(self.settings, function_name),
+            **profiling_environment(self.settings, function_name),
+        }.items():
+            func.add_environment(k, v)
+
+        self.functions[function_name] = func
+        alias = create_live_alias(self, func, self.settings, function_name)
+        if alias is not None:
+            self.live_aliases[function_name] = alias
+        return func
+
+    def invoke_target(self, function_name: str) -> lambda_.IFunction:
+        """The `live` alias of the function when it has provisioned concurrency, else the function"""
+        return self.live_aliases.get(function_name) or self.functions[function_name]
+
+    def invoke_name(self, function_name: str) -> str:
+        """The name to invoke the function with, qualified when it has a `live` alias"""
+        if function_name in self.live_aliases:
+            return f"{self.id}-{function_name}:{LIVE_ALIAS_NAME}"
+        return f"{self.id}-{function_name}"
 
     def create_immediate_response_execution_role(
-        self, function_name: str, parameter_key: str, table_arn: str
+        self,
+        function_name: str,
+        parameter_keys: list,
+        table_arn: str,
+        event_dedup_table_arn: str,
+        access_control_table_arn: str,
     ) -> iam_.Role:
         role_name = f"{function_name}-ExecutionRole"
         return iam_.Role(
@@ -171,6 +423,36 @@ class SlackAppConstructsStack(Stack):
                                 table_arn,
                             ],
                         ),
+                        iam_.PolicyStatement(
+                            actions=[
+                                "dynamodb:DeleteItem",
+                                "dynamodb:PutItem",
+                            ],
+                            effect=iam_.Effect.ALLOW,
+                            resources=[
+                                event_dedup_table_arn,
+                            ],
+                        ),
+                        iam_.PolicyStatement(
+                            actions=[
+                                "dynamodb:GetItem",
+                                "dynamodb:Query",
+                            ],
+                            effect=iam_.Effect.ALLOW,
+                            resources=[
+                                access_control_table_arn,
+                                f"{access_control_table_arn}/index/*",
+                            ],
+                        ),
+                        iam_.PolicyStatement(
+                            actions=[
+                                "dynamodb:UpdateItem",
+                            ],
+                            effect=iam_.Effect.ALLOW,
+                            resources=[
+                                self.rate_limit_table.table_arn,
+                            ],
+                        ),
                         iam_.PolicyStatement(
                             actions=[
                                 "lambda:InvokeFunction",
@@ -179,16 +461,20 @@ class SlackAppConstructsStack(Stack):
                             effect=iam_.Effect.ALLOW,
                             resources=[
                                 self.func_async_worker.function_arn,
+                                f"{self.func_async_worker.function_arn}:*",
                                 self.func_sync_worker.function_arn,
+                                f"{self.func_sync_worker.function_arn}:*",
                             ],
                         ),
                         iam_.PolicyStatement(
                             actions=[
                                 "ssm:GetParameter",
+                                "ssm:GetParameters",
                             ],
                             effect=iam_.Effect.ALLOW,
                             resources=[
-                                f"arn:aws:ssm:{self.region}:{self.account}:parameter{parameter_key}",
+                                f"arn:aws:ssm:{self.region}:{self.account}:parameter{parameter_key}"
+                                for parameter_key in parameter_keys
                             ],
                         ),
                     ]
@@ -203,7 +489,9 @@ class SlackAppConstructsStack(Stack):
             role_name=role_name,
         )
 
-    def create_default_role(self, function_name: str, table_arn: str) -> iam_.Role:
+    def create_default_role(
+        self, function_name: str, table_arn: str, rate_limit_table_arn: str
+    ) -> iam_.Role:
         role_name = f"{function_name}-ExecutionRole"
         return iam_.Role(
             self,
@@ -225,6 +513,15 @@ class SlackAppConstructsStack(Stack):
                                 table_arn,
                             ],
                         ),
+                        iam_.PolicyStatement(
+                            actions=[
+                                "dynamodb:UpdateItem",
+                            ],
+                            effect=iam_.Effect.ALLOW,
+                            resources=[
+                                rate_limit_table_arn,
+                            ],
+                        ),
                     ]
                 )
             },
@@ -1,4 +1,4 @@
-from aws_cdk import CfnParameter, Duration, RemovalPolicy, Stack
+from aws_cdk import CfnParameter, RemovalPolicy, Stack
 from aws_cdk import aws_apigateway as apigw_
 from aws_cdk import aws_dynamodb as ddb_
 from aws_cdk import aws_iam as iam_
@@ -6,7 +6,21 @@ from aws_cdk import aws_lambda as lambda_
 from aws_cdk.aws_logs import LogGroup, RetentionDays
 from constructs import Construct
 
-LAMBDA_DIR = "lambda"
+from slack_app_constructs_cdk.lambda_bundling import (
+    asset_code,
+    module_dependencies,
+    report_package_size,
+)
+from slack_app_constructs_cdk.lambda_performance import (
+    create_live_alias,
+    function_props,
+    init_priming_environment,
+    logging_environment,
+    profiling_environment,
+    tracing_environment,
+    xray_enabled,
+)
+from slack_app_constructs_cdk.lambda_warmup import create_warmup_rules
 
 
 def get_team_ids(settings):
@@ -15,10 +29,17 @@ def get_team_ids(settings):
 
 class SlackAppOAuthConstructsStack(Stack):
     def __init__(
-        self, scope: Construct, id: str, oauth_table: ddb_.Table, settings, **kwargs
+        self,
+        scope: Construct,
+        id: str,
+        oauth_table: ddb_.Table,
+        access_control_table: ddb_.Table,
+        settings,
+        **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
         self.id = id
+        self.settings = settings
 
         # cdk deploy --parameters StageName=v1
         stage = CfnParameter(
@@ -38,13 +59,18 @@ class SlackAppOAuthConstructsStack(Stack):
             ssm_param_key_client_id,
             ssm_param_key_client_secret,
             oauth_table.table_arn,
+            access_control_table.table_arn,
         )
         func_oauth = self.create_lambda("OAuth", custom_role=func_oauth_role)
+        func_oauth_target = create_live_alias(self, func_oauth, settings, "OAuth") or func_oauth
+        create_warmup_rules(self, f"{id}-OAuth", func_oauth_target, settings, "OAuth")
         func_oauth.add_environment("SlackAppId", settings["slack_app_id"])
         func_oauth.add_environment("SlackAppClientIdParameterKey", ssm_param_key_client_id)
         func_oauth.add_environment("SlackAppClientSecretParameterKey", ssm_param_key_client_secret)
-        func_oauth.add_environment("SlackTeamIds", ",".join(get_team_ids(settings)))
+        if settings.get("access_control", {}).get("environment_allowlist"):
+            func_oauth.add_environment("SlackTeamIds", ",".join(get_team_ids(settings)))
         func_oauth.add_environment("OAuthDynamoDBTable", oauth_table.table_name)
+        func_oauth.add_environment("AccessControlDynamoDBTable", access_control_table.table_name)
 
         api = apigw_.LambdaRestApi(
             self,
@@ -53,13 +79,13 @@ class SlackAppOAuthConstructsStack(Stack):
             endpoint_configuration=apigw_.EndpointConfiguration(
                 types=[apigw_.EndpointType.REGIONAL]
             ),
-            handler=func_oauth,
+            handler=func_oauth_target,
             deploy=False,
             proxy=False,
         )
 
         item = api.root.add_resource("oauth2")
-        item.add_method("ANY", apigw_.LambdaIntegration(func_oauth))
+        item.add_method("ANY", apigw_.LambdaIntegration(func_oauth_target))
 
         # Create APIGW Loggroup for setting retention
         LogGroup(
@@ -80,20 +106,16 @@ class SlackAppOAuthConstructsStack(Stack):
             logging_level=apigw_.MethodLoggingLevel.INFO,
             metrics_enabled=True,
             stage_name=stage,
-            tracing_enabled=False,
+            tracing_enabled=xray_enabled(settings),
         )
 
     def create_lambda(self, function_name: str, custom_role: iam_.Role) -> lambda_.Function:
-        return lambda_.Function(
+        # Package the function with only the local modules it imports
+        modules = module_dependencies([function_name])
+        func = lambda_.Function(
             self,
             f"{self.id}-{function_name}",
-            code=lambda_.Code.from_asset(
-                LAMBDA_DIR,
-                exclude=[
-                    "*.test.py",
-                    "requirements.txt",
-                ],
-            ),
+            code=asset_code(modules),
             current_version_options=lambda_.VersionOptions(
                 removal_policy=RemovalPolicy.DESTROY,
                 retry_attempts=2,
@@ -103,12 +125,25 @@ class SlackAppOAuthConstructsStack(Stack):
             log_retention=RetentionDays.ONE_DAY,
             role=custom_role,
             runtime=lambda_.Runtime.PYTHON_3_14,
-            timeout=Duration.seconds(900),
-            tracing=lambda_.Tracing.DISABLED,
+            **function_props(self.settings, function_name),
         )
+        report_package_size(func, function_name, modules)
+        for k, v in {
+            **init_priming_environment(self.settings),
+            **tracing_environment(self.settings),
+            **logging_environment(self.settings, function_name),
+            **profiling_environment(self.settings, function_name),
+        }.items():
+            func.add_environment(k, v)
+        return func
 
     def create_func_oauth_execution_role(
-        self, function_name: str, client_id_key: str, client_secret_key: str, table_arn: str
+        self,
+        function_name: str,
+        client_id_key: str,
+        client_secret_key: str,
+        table_arn: str,
+        access_control_table_arn: str,
     ) -> iam_.Role:
         role_name = f"{function_name}-ExecutionRole"
         return iam_.Role(
@@ -125,9 +160,21 @@ class SlackAppOAuthConstructsStack(Stack):
                             effect=iam_.Effect.ALLOW,
                             resources=[table_arn],
                         ),
+                        iam_.PolicyStatement(
+                            actions=[
+                                "dynamodb:GetItem",
+                                "dynamodb:Query",
+                            ],
+                            effect=iam_.Effect.ALLOW,
+                            resources=[
+                                access_control_table_arn,
+                                f"{access_control_table_arn}/index/*",
+                            ],
+                        ),
                         iam_.PolicyStatement(
                             actions=[
                                 "ssm:GetParameter",
+                                "ssm:GetParameters",
                             ],
                             effect=iam_.Effect.ALLOW,
                             resources=[
@@ -0,0 +1,275 @@
+"""
+Micro-benchmarks of the hot functions of the handlers, with regression budgets.
+
+Each benchmark is timed as the best of `--repeat` runs, and its cost is stored relative to a
+fixed calibration workload, so the baselines hold across machines. The run fails when a cost
+exceeds its baseline by more than the budget (`budget_percent` of the benchmark, or the default
+one) in tests/benchmark_baselines.json.
+
+    python tests/benchmark.py             # compare with the baselines
+    python tests/benchmark.py --update    # record new baselines after an intended change
+    python tests/benchmark.py authorize --json
+
+AWS and slack.com are replaced by the stand-ins of tests/fakes.py, with no latency.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import timeit
+
+from fakes import Fakes
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+DEFAULT_BUDGET_PERCENT = 40
+TARGET_RUN_SECONDS = 0.01
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a setup function, called with the Fakes, returning the callable to time"""
+
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def slack_body(text=" what\nline 2\nline 3"):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "event_async.json")) as f:
+        body = json.loads(json.load(f)["body"])
+    body["event"]["blocks"][0]["elements"][0]["elements"][1]["text"] = text
+    return body
+
+
+def setup_handlers():
+    os.environ.update(
+        {
+            "AWS_REGION": "ap-southeast-2",
+            "SlackAppId": "dummy_app_id",
+            "SlackTeamIds": "dummy_team_id",
+            "SlackChannelIds": "dummy_channel_id",
+            "AsyncWorkerLambdaFunctionName": "Bench-AsyncWorker",
+            "OAuthDynamoDBTable": "Bench-OAuth",
+            "RateLimitDynamoDBTable": "Bench-RateLimit",
+            "MetricsEnabled": "false",
+            "LogLevel": "WARNING",
+        }
+    )
+    fakes = Fakes(latencies_ms={})
+    fakes.create_table("Bench-OAuth", ["app_id", "team_id"])
+    fakes.create_table("Bench-RateLimit", ["bucket"])
+    fakes.install()
+    fakes.register_function("Bench-AsyncWorker", lambda event, context: None)
+    return fakes
+
+
+@benchmark("lambda_handler.parse_body")
+def bench_parse_body(fakes):
+    import ImmediateResponse
+
+    event = {"body": json.dumps(slack_body())}
+    return lambda: json.loads(ImmediateResponse.get_body(event))
+
+
+@benchmark("lambda_handler.parse_base64_body")
+def bench_parse_base64_body(fakes):
+    import ImmediateResponse
+
+    event = {"body": base64.b64encode(json.dumps(slack_body()).encode()).decode(), "isBase64Encoded": True}
+    return lambda: json.loads(ImmediateResponse.get_body(event))
+
+
+@benchmark("app_mention_handler.get_text")
+def bench_get_text(fakes):
+    import ImmediateResponse
+
+    # A batch of messages, the extraction alone is too quick to time reliably
+    bodies = [slack_body(f" text {i}") for i in range(20)] + [{"event": {"blocks": []}}]
+    return lambda: [ImmediateResponse.get_text(body) for body in bodies]
+
+
+@benchmark("authorize")
+def bench_authorize(fakes):
+    import ImmediateResponse
+
+    requests = [("dummy_app_id", "dummy_channel_id", "dummy_team_id")] * 18 + [
+        ("dummy_app_id", "other_channel_id", "dummy_team_id"),
+        ("dummy_app_id", "dummy_channel_id", "other_team_id"),
+    ]
+    return lambda: [ImmediateResponse.authorize(*request) for request in requests]
+
+
+@benchmark("invoke_lambda.serialize")
+def bench_invoke_lambda(fakes):
+    import ImmediateResponse
+
+    payload = {
+        "app_id": "dummy_app_id",
+        "channel_id": "dummy_channel_id",
+        "team_id": "dummy_team_id",
+        "text": " what\nline 2\nline 3" * 10,
+        "ts": "1635741395.001300",
+        "user_id": "dummy_user_id",
+    }
+
+    def run():
+        ImmediateResponse.invoke_lambda("Bench-AsyncWorker", payload, is_async=True)
+        fakes.pending.clear()
+
+    return run
+
+
+@benchmark("put_data_to_dynamodb.flatten")
+def bench_put_data_to_dynamodb(fakes):
+    import OAuth
+
+    resp_data = {
+        "ok": True,
+        "app_id": "dummy_app_id",
+        "authed_user": {"id": "U1111111111"},
+        "scope": "app_mentions:read,chat:write",
+        "token_type": "bot",
+        "access_token": "xoxb-dummy",
+        "bot_user_id": "U2222222222",
+        "team": {"id": "dummy_team_id", "name": "Dummy"},
+        "enterprise": None,
+        "is_enterprise_install": False,
+    }
+    return lambda: OAuth.put_data_to_dynamodb(resp_data)
+
+
+@benchmark("call_slack_chat_post.build_body")
+def bench_call_slack_chat_post(fakes):
+    import AsyncWorker
+
+    # With the rate limiter, its stand-in table grants every lease
+    text = "AsyncWorker: <@dummy_user_id> said `what`\n" * 10
+    return lambda: AsyncWorker.call_slack_chat_post(
+        "dummy_channel_id", "1635741395.001300", "xoxb-dummy", text, team_id="dummy_team_id"
+    )
+
+
+def calibration():
+    """Fixed reference workload the costs are relative to"""
+    doc = {"key": list(range(20)), "text": "x" * 200}
+    return lambda: json.loads(json.dumps(doc))
+
+
+def measure(func, repeat):
+    """Best time per call of `func` in microseconds"""
+    number, _ = timeit.Timer(func).autorange()
+    number = max(1, int(number * TARGET_RUN_SECONDS / 0.2))
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def run(fakes, names, repeat):
+    reference = calibration()
+    results = {}
+    for name in names:
+        func = BENCHMARKS[name](fakes)
+        func()  # warm up, e.g. lazy imports and caches
+        per_call_us = measure(func, repeat)
+        # Calibrated next to each benchmark, so drifts of the machine speed cancel out
+        reference_us = measure(reference, repeat)
+        results[name] = {"per_call_us": round(per_call_us, 3), "relative_cost": round(per_call_us / reference_us, 4)}
+    return results
+
+
+def run_rounds(fakes, names, repeat, rounds, pick):
+    """Run the benchmarks `rounds` times; keep the result picked from the rounds of each benchmark"""
+    runs = [run(fakes, names, repeat) for _ in range(rounds)]
+    return {
+        name: pick(sorted((r[name] for r in runs), key=lambda result: result["relative_cost"]))
+        for name in names
+    }
+
+
+def compare(results, baselines, default_budget_percent):
+    """Return the (name, relative cost, baseline, budget %) of the benchmarks over their budget"""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get("benchmarks", {}).get(name)
+        if baseline is None:
+            continue
+        budget = baseline.get("budget_percent", default_budget_percent)
+        if result["relative_cost"] > baseline["relative_cost"] * (1 + budget / 100):
+            regressions.append((name, result["relative_cost"], baseline["relative_cost"], budget))
+    return regressions
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results, baselines, path=BASELINES_PATH):
+    previous = baselines.get("benchmarks", {})
+    benchmarks = {}
+    for name in sorted(set(previous) | set(results)):
+        entry = dict(previous.get(name, {}))
+        if name in results:
+            entry["relative_cost"] = results[name]["relative_cost"]
+        benchmarks[name] = entry
+    doc = {"budget_percent": baselines.get("budget_percent", DEFAULT_BUDGET_PERCENT), "benchmarks": benchmarks}
+    with open(path, "w") as f:
+        f.write(json.dumps(doc, indent=2) + "\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--repeat", type=int, default=25)
+    parser.add_argument("--rounds", type=int, default=3, help="rounds of which --update keeps the median")
+    parser.add_argument("--retries", type=int, default=2, help="rounds measuring a regression again")
+    parser.add_argument("--budget", type=float, help="default budget in percent, overrides the baselines file")
+    parser.add_argument("--update", action="store_true", help="record the results as the new baselines")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    fakes = setup_handlers()
+    names = args.names or list(BENCHMARKS)
+    baselines = load_baselines()
+    if args.update:
+        # The median of a few rounds, so a baseline is not set by one lucky or noisy run
+        results = run_rounds(fakes, names, args.repeat, args.rounds, lambda r: r[len(r) // 2])
+        save_baselines(results, baselines)
+    else:
+        results = run(fakes, names, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            baseline = baselines.get("benchmarks", {}).get(name, {}).get("relative_cost")
+            print(f"{name}: {result['per_call_us']:.3f}us, relative cost {result['relative_cost']} (baseline {baseline})")
+
+    if args.update:
+        return 0
+    budget = args.budget if args.budget is not None else baselines.get("budget_percent", DEFAULT_BUDGET_PERCENT)
+    regressions = compare(results, baselines, budget)
+    if regressions:
+        # Measure again, so only consistent regressions fail the run and not noisy neighbours
+        names = [name for name, *_ in regressions]
+        results.update(run_rounds(fakes, names, args.repeat, args.retries, lambda r: r[0]))
+        regressions = compare(results, baselines, budget)
+    for name, cost, baseline, budget_percent in regressions:
+        print(f"REGRESSION {name}: relative cost {cost} is over {baseline} + {budget_percent}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+In-process stand-ins for the AWS services and slack.com called by the Lambda handlers, with
+injected latencies and a count of the outbound calls, for running the handlers offline
+(see tests/load_test.py).
+
+    fakes = Fakes(latencies_ms={"lambda": 20, "dynamodb": 5, "ssm": 15, "slack": 80})
+    fakes.create_table("Dev-OAuth", ["app_id", "team_id"])
+    fakes.install()  # before the handlers are imported
+    import ImmediateResponse
+
+Event invokes of a function and SQS messages are held until `run_pending()`, so the time to
+acknowledge the request can be measured apart from the work of the workers.
+"""
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda"))
+
+import slack_client  # noqa: E402
+from work_queue import LocalQueue  # noqa: E402
+
+DEFAULT_LATENCIES_MS = {"lambda": 20, "sqs": 10, "dynamodb": 5, "ssm": 15, "slack": 80}
+
+
+def client_error(code, operation):
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class FakeContext:
+    def __init__(self, remaining_ms=30000):
+        self.started_at = time.perf_counter()
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return int(self.remaining_ms - (time.perf_counter() - self.started_at) * 1000)
+
+
+class FakeTable:
+    def __init__(self, fakes, name, key_names, items=None):
+        self.fakes = fakes
+        self.name = name
+        self.key_names = key_names
+        self.items = {}
+        for item in items or []:
+            self.items[self.key(item)] = dict(item)
+
+    def key(self, item):
+        return tuple(item[k] for k in self.key_names)
+
+    def get_item(self, Key, **kwargs):
+        self.fakes.call("dynamodb.get_item")
+        item = self.items.get(self.key(Key))
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        self.fakes.call("dynamodb.put_item")
+        # Only the attribute_not_exists(<key>) condition is supported
+        if ConditionExpression and self.key(Item) in self.items:
+            raise client_error("ConditionalCheckFailedException", "PutItem")
+        self.items[self.key(Item)] = dict(Item)
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self.fakes.call("dynamodb.delete_item")
+        self.items.pop(self.key(Key), None)
+        return {}
+
+    def update_item(self, Key, **kwargs):
+        # The update and its condition are not evaluated, e.g. every rate limit lease is granted
+        self.fakes.call("dynamodb.update_item")
+        item = self.items.setdefault(self.key(Key), dict(Key))
+        return {"Attributes": dict(item)}
+
+    def query(self, **kwargs):
+        # The key condition is not evaluated, every item matches
+        self.fakes.call("dynamodb.query")
+        return {"Items": [dict(item) for item in self.items.values()]}
+
+
+class FakeDynamoDBResource:
+    def __init__(self, fakes):
+        self.fakes = fakes
+
+    def Table(self, name):
+        if name not in self.fakes.tables:
+            # Created for handlers that build a table they never call, e.g. with no name set
+            self.fakes.create_table(name, [])
+        return self.fakes.tables[name]
+
+
+class FakeSSMClient:
+    def __init__(self, fakes):
+        self.fakes = fakes
+
+    def get_parameters(self, Names, WithDecryption=False):
+        self.fakes.call("ssm.get_parameters")
+        params = self.fakes.parameters
+        return {
+            "Parameters": [{"Name": n, "Value": params[n]} for n in Names if n in params],
+            "InvalidParameters": [n for n in Names if n not in params],
+        }
+
+
+class FakeLambdaClient:
+    def __init__(self, fakes):
+        self.fakes = fakes
+
+    def invoke(self, FunctionName, InvocationType="RequestResponse", Payload=b"{}"):
+        self.fakes.call("lambda.invoke")
+        name = FunctionName.split(":")[0]
+        if name not in self.fakes.functions:
+            raise client_error("ResourceNotFoundException", "Invoke")
+
+        event = json.loads(Payload)
+        if InvocationType == "Event":
+            self.fakes.invoke_event(name, event)
+            return {"StatusCode": 202, "ResponseMetadata": {"HTTPStatusCode": 202}}
+
+        resp = {"StatusCode": 200, "ResponseMetadata": {"HTTPStatusCode": 200}}
+        try:
+            result = self.fakes.run(name, event)
+        except Exception as e:
+            result = {"errorMessage": str(e)}
+            resp["FunctionError"] = "Unhandled"
+        resp["Payload"] = io.BytesIO(json.dumps(result).encode("utf-8"))
+        return resp
+
+
+class FakeSQSClient:
+    def __init__(self, fakes):
+        self.fakes = fakes
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.fakes.call("sqs.send_message")
+        resp = self.fakes.queue(QueueUrl).send_message(QueueUrl, MessageBody)
+        self.fakes.message_sent(QueueUrl)
+        return resp
+
+
+class FakeHTTPResponse:
+    def __init__(self, status, data, headers=None):
+        self.status = status
+        self.data = data
+        self.headers = headers or {}
+
+
+class FakeSlackHttp:
+    """Stand-in for the urllib3 pool of SlackClient; every Web API call succeeds"""
+
+    def __init__(self, fakes):
+        self.fakes = fakes
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        if method == "HEAD":
+            self.fakes.call("slack.connect")
+            return FakeHTTPResponse(200, b"")
+        self.fakes.call(f"slack.{url.rsplit('/', 1)[-1]}")
+        return FakeHTTPResponse(200, json.dumps({"ok": True, "ts": f"{time.time():.6f}"}).encode())
+
+
+class Fakes:
+    def __init__(self, latencies_ms=None, jitter=0.0, parameters=None, sleep=time.sleep):
+        self.latencies_ms = dict(DEFAULT_LATENCIES_MS if latencies_ms is None else latencies_ms)
+        self.jitter = jitter
+        self.parameters = dict(parameters or {})
+        self.sleep = sleep
+        self.calls = Counter()
+        self.tables = {}
+        self.functions = {}
+        self.queues = {}
+        self.queue_consumers = {}
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def call(self, name):
+        """Count an outbound call and wait for the latency of its service"""
+        with self._lock:
+            self.calls[name] += 1
+        latency_ms = self.latencies_ms.get(name.split(".")[0], 0)
+        if latency_ms:
+            self.sleep(latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+    def create_table(self, name, key_names, items=None):
+        self.tables[name] = FakeTable(self, name, key_names, items)
+        return self.tables[name]
+
+    def queue(self, url):
+        return self.queues.setdefault(url, LocalQueue())
+
+    def register_function(self, name, handler, queue_url=None):
+        """Route invokes of the function name to a handler, and the messages of a queue if given"""
+        self.functions[name] = handler
+        if queue_url:
+            self.queue_consumers[queue_url] = handler
+
+    def invoke_event(self, name, event):
+        """Hold an Event invoke until `run_pending()`"""
+        self.pending.append((name, event))
+
+    def message_sent(self, url):
+        """Called after a message is sent to a queue; its messages are run by `run_pending()`"""
+
+    def run(self, name, event):
+        return self.functions[name](event, FakeContext())
+
+    def run_pending(self, batch_size=10):
+        """Run the held Event invokes and queued messages; return the duration of each run in ms"""
+        durations = []
+        while self.pending or any(q.messages for q in self.queues.values()):
+            while self.pending:
+                name, event = self.pending.pop(0)
+                started_at = time.perf_counter()
+                self.run(name, event)
+                durations.append((time.perf_counter() - started_at) * 1000)
+            for url, queue in self.queues.items():
+                event = queue.receive_event(batch_size)
+                if event is not None:
+                    started_at = time.perf_counter()
+                    queue.complete(self.queue_consumers[url](event, FakeContext()))
+                    durations.append((time.perf_counter() - started_at) * 1000)
+        return durations
+
+    def client(self, service_name, *args, **kwargs):
+        clients = {"lambda": FakeLambdaClient, "sqs": FakeSQSClient, "ssm": FakeSSMClient}
+        return clients[service_name](self)
+
+    def resource(self, service_name, *args, **kwargs):
+        if service_name != "dynamodb":
+            raise ValueError(f"No stand-in for the {service_name} resource")
+        return FakeDynamoDBResource(self)
+
+    def install(self):
+        """Have boto3 and SlackClient use the stand-ins; call before the handlers are imported"""
+        boto3.client = self.client
+        boto3.resource = self.resource
+        slack_client.create_pool_manager = lambda: FakeSlackHttp(self)
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
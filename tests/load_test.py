@@ -0,0 +1,262 @@
+"""
+Offline load test: replays app_mention events through ImmediateResponse.lambda_handler and on into
+SyncWorker and AsyncWorker, with the in-process stand-ins of tests/fakes.py for Lambda, SQS,
+DynamoDB, SSM and slack.com.
+
+    python tests/load_test.py --events 1000 --teams 20 --channels 5
+    python tests/load_test.py --latency lambda=20,dynamodb=5,ssm=15,slack=80 --jitter 0.2
+    python tests/load_test.py --replay tests/event_async.json tests/event_sync.json --events 200
+    python tests/load_test.py --ack-first --queue --json
+
+Events run one at a time, as in a single container; the worker invokes held by an event run after
+its acknowledgement. The report has the throughput, the p50/p95/p99 latency of the
+acknowledgement and of the worker runs, and the outbound calls per event by service and operation.
+A failure is an event that was not acknowledged with a 200 or whose reply was not posted to Slack.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+from fakes import FakeContext, Fakes
+
+APP_ID = "ALOADTEST01"
+VERIFICATION_TOKEN = "load-test-verification-token"
+VERIFICATION_TOKEN_KEY = "/load-test/verification_token"
+FUNCTION_PREFIX = "LoadTest"
+QUEUE_URL = "https://sqs.local/LoadTest-AsyncWorker-Queue"
+TABLES = {
+    "OAuthDynamoDBTable": ("LoadTest-OAuth", ["app_id", "team_id"]),
+    "EventDedupDynamoDBTable": ("LoadTest-EventDedup", ["event_id"]),
+    # Grants every lease, so the run is not throttled but the cost of the limiter is counted
+    "RateLimitDynamoDBTable": ("LoadTest-RateLimit", ["bucket"]),
+}
+
+
+def parse_latencies(value):
+    """lambda=20,dynamodb=5 => {"lambda": 20.0, "dynamodb": 5.0}; "none" => no latency"""
+    if value is None:
+        return None
+    if value == "none":
+        return {}
+    return {k: float(v) for k, v in (part.split("=") for part in value.split(","))}
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of the values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def mention_body(team_id, channel_id, user_id, text, n):
+    ts = f"{1700000000 + n}.{n % 1000000:06d}"
+    return {
+        "token": VERIFICATION_TOKEN,
+        "team_id": team_id,
+        "api_app_id": APP_ID,
+        "event": {
+            "type": "app_mention",
+            "text": f"<@{APP_ID}>{text}",
+            "user": user_id,
+            "ts": ts,
+            "team": team_id,
+            "blocks": [
+                {
+                    "type": "rich_text",
+                    "elements": [
+                        {
+                            "type": "rich_text_section",
+                            "elements": [
+                                {"type": "user", "user_id": APP_ID},
+                                {"type": "text", "text": text},
+                            ],
+                        }
+                    ],
+                }
+            ],
+            "channel": channel_id,
+            "event_ts": ts,
+        },
+        "type": "event_callback",
+        "event_id": f"EvLOAD{n:08d}",
+        "event_time": 1700000000 + n,
+    }
+
+
+def generate_bodies(args, rng):
+    """Mentions from `teams` teams with `channels` channels each and texts of varied sizes"""
+    teams = [f"TLOAD{t:05d}" for t in range(args.teams)]
+    channels = {team: [f"C{team[1:]}{c:03d}" for c in range(args.channels)] for team in teams}
+    for n in range(args.events):
+        team = rng.choice(teams)
+        size = rng.randint(args.min_text, args.max_text)
+        if rng.random() < args.sync_share:
+            text = " sync"
+        else:
+            text = " " + "".join(rng.choice(string.ascii_letters + " ") for _ in range(size))
+        yield mention_body(team, rng.choice(channels[team]), f"U{n % 97:08d}", text, n)
+
+
+def replay_bodies(args):
+    """The Slack bodies of the given API Gateway event (.json) or Slack body (.jsonl) files, in turn"""
+    bodies = []
+    for path in args.replay:
+        with open(path) as f:
+            docs = [json.load(f)] if path.endswith(".json") else [json.loads(line) for line in f if line.strip()]
+        for doc in docs:
+            bodies.append(json.loads(doc["body"]) if "body" in doc else doc)
+
+    for n in range(args.events):
+        body = json.loads(json.dumps(bodies[n % len(bodies)]))
+        # Replayed events must pass authentication and de-duplication like new ones
+        body["token"] = VERIFICATION_TOKEN
+        body["api_app_id"] = APP_ID
+        body["event_id"] = f"EvREPLAY{n:08d}"
+        yield body
+
+
+def configure_environment(args, bodies):
+    teams = sorted({b["team_id"] for b in bodies})
+    env = {
+        "AWS_REGION": "ap-southeast-2",
+        "SlackAppId": APP_ID,
+        "SlackTeamIds": ",".join(teams),
+        "SlackChannelIds": ",".join(sorted({b["event"]["channel"] for b in bodies})),
+        "SlackVerificationTokenParameterKey": VERIFICATION_TOKEN_KEY,
+        "AsyncWorkerLambdaFunctionName": f"{FUNCTION_PREFIX}-AsyncWorker",
+        "SyncWorkerLambdaFunctionName": f"{FUNCTION_PREFIX}-SyncWorker",
+        "AckFirst": "true" if args.ack_first else "false",
+        "SyncWorkerInProcess": "true" if args.sync_in_process else "false",
+        "MetricsEnabled": "false",
+        "TracingExporter": "none",
+        "LogLevel": "WARNING",
+    }
+    if args.queue:
+        env["AsyncWorkerQueueUrl"] = QUEUE_URL
+    for name, (table, _) in TABLES.items():
+        env[name] = table
+    os.environ.update(env)
+    return teams
+
+
+def create_fakes(args, teams):
+    fakes = Fakes(
+        latencies_ms=parse_latencies(args.latency),
+        jitter=args.jitter,
+        parameters={VERIFICATION_TOKEN_KEY: VERIFICATION_TOKEN},
+    )
+    for name, key_names in TABLES.values():
+        fakes.create_table(name, key_names)
+    fakes.tables["LoadTest-OAuth"].items.update(
+        {
+            (APP_ID, team): {"app_id": APP_ID, "team_id": team, "access_token": f"xoxb-{team}"}
+            for team in teams
+        }
+    )
+    fakes.install()
+    return fakes
+
+
+def import_handlers(fakes, rate_limit):
+    import AsyncWorker
+    import ImmediateResponse
+    import SyncWorker
+
+    fakes.register_function(f"{FUNCTION_PREFIX}-AsyncWorker", AsyncWorker.lambda_handler, QUEUE_URL)
+    fakes.register_function(f"{FUNCTION_PREFIX}-SyncWorker", SyncWorker.lambda_handler)
+    if not rate_limit:
+        for module in [AsyncWorker, ImmediateResponse, SyncWorker]:
+            if module.slack_client is not None:
+                module.slack_client.rate_limiter = None
+    return ImmediateResponse
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    bodies = list(replay_bodies(args) if args.replay else generate_bodies(args, rng))
+    teams = configure_environment(args, bodies)
+    fakes = create_fakes(args, teams)
+    handler = import_handlers(fakes, not args.no_rate_limit).lambda_handler
+    fakes.reset_calls()
+
+    ack_ms, worker_ms, failures = [], [], 0
+    started_at = time.perf_counter()
+    for body in bodies:
+        event = {"body": json.dumps(body), "headers": {}}
+        posts = fakes.calls["slack.chat.postMessage"]
+        event_started_at = time.perf_counter()
+        resp = handler(event, FakeContext())
+        ack_ms.append((time.perf_counter() - event_started_at) * 1000)
+        worker_ms.extend(fakes.run_pending())
+        # ImmediateResponse acknowledges with 200 whatever happens next, so a failure is a mention
+        # without a reply posted by the workers
+        if resp.get("statusCode") != 200 or fakes.calls["slack.chat.postMessage"] == posts:
+            failures += 1
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "events": len(bodies),
+        "failures": failures,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(bodies) / elapsed, 1) if elapsed else None,
+        "ack_ms": {f"p{p}": round(percentile(ack_ms, p), 3) for p in (50, 95, 99)},
+        "worker_ms": {f"p{p}": round(percentile(worker_ms, p), 3) for p in (50, 95, 99)}
+        if worker_ms
+        else {},
+        "worker_runs": len(worker_ms),
+        "calls_per_event": {
+            name: round(count / len(bodies), 3) for name, count in sorted(fakes.calls.items())
+        },
+    }
+
+
+def print_report(report):
+    print(f"events: {report['events']} (failures: {report['failures']}) in {report['elapsed_seconds']}s")
+    print(f"throughput: {report['throughput_per_second']} events/s")
+    print("ack latency (ms): " + " ".join(f"{k}={v}" for k, v in report["ack_ms"].items()))
+    print(
+        f"worker latency (ms, {report['worker_runs']} runs): "
+        + " ".join(f"{k}={v}" for k, v in report["worker_ms"].items())
+    )
+    print("outbound calls per event:")
+    for name, count in report["calls_per_event"].items():
+        print(f"  {name}: {count}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--channels", type=int, default=3, help="channels per team")
+    parser.add_argument("--min-text", type=int, default=1, help="min text length")
+    parser.add_argument("--max-text", type=int, default=400, help="max text length")
+    parser.add_argument("--sync-share", type=float, default=0.2, help="share of `sync` commands")
+    parser.add_argument("--replay", nargs="+", help="replay these events instead of generating them")
+    parser.add_argument("--latency", help="injected latency in ms by service, e.g. lambda=20,slack=80, or none")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative jitter of the latencies")
+    parser.add_argument("--ack-first", action="store_true")
+    parser.add_argument("--queue", action="store_true", help="queue mode, AsyncWorker fed by SQS")
+    parser.add_argument("--sync-in-process", action="store_true")
+    parser.add_argument("--no-rate-limit", action="store_true", help="without the rate limiter, to compare its cost")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
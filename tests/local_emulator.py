@@ -0,0 +1,476 @@
+"""
+Local in-process emulator of the whole Slack app, a lighter alternative to `sam local` for
+iterating on the handlers.
+
+ImmediateResponse and OAuth are served over HTTP on localhost by a thread-pool server, as behind
+API Gateway: `/oauth2` goes to OAuth and every other path to ImmediateResponse. The handlers run
+their real code paths, including authentication and posting, against the stand-ins of
+tests/fakes.py:
+
+- Event invokes of the workers and SQS messages run in background threads; RequestResponse
+  invokes run inline, in the thread of the request.
+- The OAuth, event de-duplication tables and SSM parameters are in-memory stores. The configured
+  teams are installed in the OAuth table, unless `--no-preinstall`; `GET /oauth2?code=<team id>`
+  installs a team through OAuth.
+- slack.com is a fake that records the messages posted, listed by `GET /_emulator/posts` (cleared
+  by `DELETE /_emulator/posts`). `GET /_emulator/stats` has the containers of each function, the
+  outbound calls by service and operation, and the count of failed worker runs.
+- Like in Lambda, a container (a copy of the handler module) serves one request at a time, and a
+  new one is started when all the containers of the function are busy.
+
+    python tests/local_emulator.py --port 3000 --teams T0001,T0002 --channels C0001
+    python tests/local_emulator.py --latency lambda=20,dynamodb=5,slack=80 --ack-first --queue
+    python tests/local_emulator.py --smoke 200   # send mentions to itself, check the replies, exit
+
+Requests are signed with `--signing-secret` if given, otherwise they are authenticated by the
+`token` field of the body, `--verification-token`. The containers share the process, so the
+request context added to the logs of concurrent requests may be mixed up.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from fakes import FakeContext, FakeHTTPResponse, Fakes, FakeSlackHttp
+from load_test import mention_body, parse_latencies
+
+import slack_client  # noqa: E402, on the path set by fakes
+from slack_signature import compute_signature  # noqa: E402
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda")
+FUNCTIONS = ["ImmediateResponse", "OAuth", "AsyncWorker", "SyncWorker"]
+FUNCTION_PREFIX = "Local"
+QUEUE_URL = "https://sqs.local/Local-AsyncWorker-Queue"
+OAUTH_TABLE = ("Local-OAuth", ["app_id", "team_id"])
+EVENT_DEDUP_TABLE = ("Local-EventDedup", ["event_id"])
+RATE_LIMIT_TABLE = ("Local-RateLimit", ["bucket"])  # Grants every lease
+PARAMETER_KEYS = {
+    "verification_token": "/local/verification_token",
+    "signing_secret": "/local/signing_secret",
+    "client_id": "/local/client_id",
+    "client_secret": "/local/client_secret",
+}
+
+
+class EmulatorFakes(Fakes):
+    """Stand-ins running Event invokes and queued messages in background threads"""
+
+    def __init__(self, worker_threads, **kwargs):
+        super().__init__(**kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="worker")
+        self.queue_locks = {}
+        self.outstanding = set()
+        self.errors = 0
+
+    def invoke_event(self, name, event):
+        self.submit(self.run, name, event)
+
+    def message_sent(self, url):
+        self.submit(self.drain_queue, url)
+
+    def drain_queue(self, url):
+        # One batch of a queue at a time, LocalQueue tracks the messages of a single batch
+        with self._lock:
+            lock = self.queue_locks.setdefault(url, threading.Lock())
+        with lock:
+            queue = self.queue(url)
+            while True:
+                event = queue.receive_event()
+                if event is None:
+                    return
+                queue.complete(self.queue_consumers[url](event, FakeContext()))
+
+    def submit(self, func, *args):
+        future = self.executor.submit(self.logged, func, *args)
+        with self._lock:
+            self.outstanding.add(future)
+        future.add_done_callback(self.done)
+
+    def logged(self, func, *args):
+        try:
+            func(*args)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            traceback.print_exc()
+
+    def done(self, future):
+        with self._lock:
+            self.outstanding.discard(future)
+
+    def wait_idle(self, timeout):
+        """Wait until no worker is running or queued, including those they started; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                outstanding = list(self.outstanding)
+            if not outstanding:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            wait_futures(outstanding, timeout=max(0.0, deadline - time.monotonic()))
+
+
+class RecordingSlackHttp(FakeSlackHttp):
+    """Fake slack.com recording the posted messages, and installing the team of an OAuth code"""
+
+    def __init__(self, fakes, app_id):
+        super().__init__(fakes)
+        self.app_id = app_id
+        self.posts = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        parts = urlsplit(url)
+        api_method = parts.path.rsplit("/", 1)[-1]
+        if api_method == "oauth.v2.access":
+            self.fakes.call("slack.oauth.v2.access")
+            return FakeHTTPResponse(200, json.dumps(self.installation(dict(parse_qsl(parts.query)))).encode())
+
+        resp = super().request(method, url, body=body, headers=headers, **kwargs)
+        if api_method == "chat.postMessage":
+            post = {**json.loads(body), "ts": json.loads(resp.data)["ts"]}
+            with self._lock:
+                self.posts.append(post)
+        return resp
+
+    def installation(self, params):
+        """oauth.v2.access response; the code is the ID of the team to install"""
+        team_id = params.get("code")
+        return {
+            "ok": True,
+            "app_id": self.app_id,
+            "authed_user": {"id": "ULOCAL00001"},
+            "scope": "app_mentions:read,chat:write",
+            "token_type": "bot",
+            "access_token": f"xoxb-local-{team_id}",
+            "bot_user_id": "ULOCALBOT01",
+            "team": {"id": team_id, "name": f"Local {team_id}"},
+            "enterprise": None,
+            "is_enterprise_install": False,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.posts.clear()
+
+
+def configure_environment(args):
+    env = {
+        "AWS_REGION": "ap-southeast-2",
+        "SlackAppId": args.app_id,
+        "SlackAppOwnerTeamId": args.teams[0],
+        "SlackTeamIds": ",".join(args.teams),
+        "SlackChannelIds": ",".join(args.channels),
+        "SlackVerificationTokenParameterKey": PARAMETER_KEYS["verification_token"],
+        "SlackAppClientIdParameterKey": PARAMETER_KEYS["client_id"],
+        "SlackAppClientSecretParameterKey": PARAMETER_KEYS["client_secret"],
+        "AsyncWorkerLambdaFunctionName": f"{FUNCTION_PREFIX}-AsyncWorker",
+        "SyncWorkerLambdaFunctionName": f"{FUNCTION_PREFIX}-SyncWorker",
+        "OAuthDynamoDBTable": OAUTH_TABLE[0],
+        "EventDedupDynamoDBTable": EVENT_DEDUP_TABLE[0],
+        "RateLimitDynamoDBTable": RATE_LIMIT_TABLE[0],
+        "AckFirst": "true" if args.ack_first else "false",
+        "SyncWorkerInProcess": "true" if args.sync_in_process else "false",
+        "MetricsEnabled": "false",
+        "TracingExporter": "none",
+        "LogLevel": args.log_level,
+    }
+    if args.signing_secret:
+        env["SlackSigningSecretParameterKey"] = PARAMETER_KEYS["signing_secret"]
+    if args.queue:
+        env["AsyncWorkerQueueUrl"] = QUEUE_URL
+    os.environ.update(env)
+    # The handlers run their real authentication and posting code
+    os.environ.pop("AWS_SAM_LOCAL", None)
+
+
+def create_fakes(args):
+    fakes = EmulatorFakes(
+        args.worker_threads,
+        latencies_ms=parse_latencies(args.latency),
+        jitter=args.jitter,
+        parameters={
+            PARAMETER_KEYS["verification_token"]: args.verification_token,
+            PARAMETER_KEYS["signing_secret"]: args.signing_secret or "",
+            PARAMETER_KEYS["client_id"]: "local-client-id",
+            PARAMETER_KEYS["client_secret"]: "local-client-secret",
+        },
+    )
+    fakes.create_table(*OAUTH_TABLE)
+    fakes.create_table(*EVENT_DEDUP_TABLE)
+    fakes.create_table(*RATE_LIMIT_TABLE)
+    if args.preinstall:
+        fakes.tables[OAUTH_TABLE[0]].items.update(
+            {
+                (args.app_id, team): {"app_id": args.app_id, "team_id": team, "access_token": f"xoxb-local-{team}"}
+                for team in args.teams
+            }
+        )
+    fakes.install()
+    return fakes
+
+
+def load_module(name, setup):
+    """A private copy of a handler module, the state of one container"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(LAMBDA_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    setup(module)
+    return module
+
+
+class Function:
+    """
+    The containers of a function, each a copy of the handler module serving one request at a time,
+    as in Lambda; a container is added (a cold start) when all are busy.
+    """
+
+    def __init__(self, name, setup):
+        self.name = name
+        self.setup = setup
+        self.containers = 0
+        self.idle = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event, context):
+        with self._lock:
+            module = self.idle.pop() if self.idle else None
+        if module is None:
+            module = load_module(self.name, self.setup)
+            with self._lock:
+                self.containers += 1
+        try:
+            return module.lambda_handler(event, context)
+        finally:
+            with self._lock:
+                self.idle.append(module)
+
+
+class Emulator:
+    def __init__(self, args):
+        configure_environment(args)
+        self.fakes = create_fakes(args)
+        self.slack = RecordingSlackHttp(self.fakes, args.app_id)
+        self.rate_limit = not args.no_rate_limit
+        # SlackClient creates its pool with this factory, OAuth has its own pool
+        slack_client.create_pool_manager = lambda: self.slack
+
+        self.functions = {name: Function(name, self.setup) for name in FUNCTIONS}
+        self.fakes.register_function(f"{FUNCTION_PREFIX}-AsyncWorker", self.functions["AsyncWorker"], QUEUE_URL)
+        self.fakes.register_function(f"{FUNCTION_PREFIX}-SyncWorker", self.functions["SyncWorker"])
+
+    def setup(self, module):
+        """Point a new container at the fakes"""
+        if module.__name__ == "OAuth":
+            module.http = self.slack
+        if module.__name__ == "ImmediateResponse" and module.sync_worker is not None:
+            # The in-process SyncWorker as a copy of its own, with the clients of the container
+            module.sync_worker = load_module("SyncWorker", self.setup)
+            module.sync_worker.use_clients(module.slack_client, module.token_cache)
+        if not self.rate_limit and getattr(module, "slack_client", None) is not None:
+            module.slack_client.rate_limiter = None
+
+    def invoke(self, function_name, event):
+        """Run a function like API Gateway, which answers 502 when the handler fails"""
+        try:
+            return self.functions[function_name](event, FakeContext())
+        except Exception:
+            traceback.print_exc()
+            return {"statusCode": 502, "body": json.dumps({"message": "Internal server error"})}
+
+    def stats(self):
+        with self.fakes._lock:
+            calls = dict(self.fakes.calls)
+            errors = self.fakes.errors
+        return {
+            "containers": {name: function.containers for name, function in self.functions.items()},
+            "calls": calls,
+            "worker_errors": errors,
+        }
+
+
+def api_event(method, url, headers, body):
+    """API Gateway REST API proxy event of an HTTP request"""
+    parts = urlsplit(url)
+    return {
+        "resource": "/{proxy+}",
+        "path": parts.path,
+        "httpMethod": method,
+        "headers": dict(headers),
+        "queryStringParameters": dict(parse_qsl(parts.query)) or None,
+        "body": body.decode("utf-8") if body else None,
+        "isBase64Encoded": False,
+        "requestContext": {"requestId": str(uuid.uuid4()), "stage": "local"},
+    }
+
+
+class EmulatorRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def do_DELETE(self):
+        self.dispatch()
+
+    def dispatch(self):
+        emulator = self.server.emulator
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        path = urlsplit(self.path).path
+
+        if path == "/_emulator/posts":
+            if self.command == "DELETE":
+                emulator.slack.clear()
+            with emulator.slack._lock:
+                posts = list(emulator.slack.posts)
+            return self.respond(200, json.dumps(posts))
+        if path == "/_emulator/stats":
+            return self.respond(200, json.dumps(emulator.stats()))
+
+        function_name = "OAuth" if path.rstrip("/") == "/oauth2" else "ImmediateResponse"
+        resp = emulator.invoke(function_name, api_event(self.command, self.path, self.headers.items(), body))
+        self.respond(resp.get("statusCode", 200), resp.get("body") or "", resp.get("headers"))
+
+    def respond(self, status, body, headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        for k, v in (headers or {"Content-Type": "application/json"}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer handling the requests in a bounded pool of threads"""
+
+    # Room for bursts of connections, the default backlog of 5 resets them
+    request_queue_size = 128
+
+    def __init__(self, address, handler_class, emulator, threads, verbose=False):
+        super().__init__(address, handler_class)
+        self.emulator = emulator
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def smoke_test(server, args):
+    """Send `args.smoke` mentions to the server concurrently; check each was acknowledged and replied to"""
+    base_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+    def send(n):
+        body = mention_body(args.teams[n % len(args.teams)], args.channels[n % len(args.channels)], "ULOCAL00001", f" smoke {n}", n)
+        body.update(token=args.verification_token, api_app_id=args.app_id)
+        data = json.dumps(body).encode()
+        headers = {}
+        if args.signing_secret:
+            timestamp = str(int(time.time()))
+            headers = {
+                "X-Slack-Request-Timestamp": timestamp,
+                "X-Slack-Signature": compute_signature(args.signing_secret, timestamp, data),
+            }
+        request = urllib.request.Request(f"{base_url}/slack/events", data=data, headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=30) as resp:
+            return resp.status
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as clients:
+        statuses = list(clients.map(send, range(args.smoke)))
+    idle = server.emulator.fakes.wait_idle(timeout=60)
+    elapsed = time.perf_counter() - started_at
+
+    with urllib.request.urlopen(f"{base_url}/_emulator/posts", timeout=30) as resp:
+        replied = {post["thread_ts"] for post in json.loads(resp.read())}
+    acknowledged = statuses.count(200)
+    print(
+        f"smoke: {acknowledged}/{args.smoke} acknowledged, {len(replied)} replied to"
+        f" in {elapsed:.2f}s ({args.smoke / elapsed:.0f} mentions/s), worker errors: {server.emulator.fakes.errors}"
+    )
+    return acknowledged == args.smoke and len(replied) == args.smoke and idle and not server.emulator.fakes.errors
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000, help="0 for any free port")
+    parser.add_argument("--threads", type=int, default=16, help="threads serving HTTP requests")
+    parser.add_argument("--worker-threads", type=int, default=16, help="threads running Event invokes and queues")
+    parser.add_argument("--app-id", default="ALOCALAPP01")
+    parser.add_argument("--teams", type=lambda v: v.split(","), default=["TLOCAL00001"], help="first is the owner")
+    parser.add_argument("--channels", type=lambda v: v.split(","), default=["CLOCAL00001"])
+    parser.add_argument("--verification-token", default="local-verification-token")
+    parser.add_argument("--signing-secret", help="verify the X-Slack-Signature of the requests")
+    parser.add_argument("--preinstall", action=argparse.BooleanOptionalAction, default=True,
+                        help="install the teams in the OAuth table")
+    parser.add_argument("--latency", default="none", help="injected latency in ms by service, e.g. lambda=20,slack=80")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative jitter of the latencies")
+    parser.add_argument("--ack-first", action="store_true")
+    parser.add_argument("--queue", action="store_true", help="queue mode, AsyncWorker fed by SQS")
+    parser.add_argument("--sync-in-process", action="store_true")
+    parser.add_argument("--no-rate-limit", action="store_true", help="without the rate limiter")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--verbose", action="store_true", help="log each HTTP request")
+    parser.add_argument("--smoke", type=int, metavar="N", help="send N mentions to the emulator, check the replies, exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    emulator = Emulator(args)
+    server = ThreadPoolHTTPServer(
+        (args.host, 0 if args.smoke else args.port), EmulatorRequestHandler, emulator, args.threads, args.verbose
+    )
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    try:
+        if args.smoke:
+            return 0 if smoke_test(server, args) else 1
+
+        host, port = server.server_address[:2]
+        print(f"Serving ImmediateResponse on http://{host}:{port}/ and OAuth on http://{host}:{port}/oauth2")
+        serving.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        emulator.fakes.executor.shutdown(wait=False, cancel_futures=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Cold-start profiler of the Lambda handler modules.
+
+Each handler is imported in a fresh interpreter (`python -X importtime`), as in the INIT phase of
+a new container, with dummy AWS credentials. The boto3 and urllib3 clients are built for real,
+but their requests are answered locally, so nothing leaves the machine. The INIT time of each
+function is broken down into:
+
+- imports: boto3, urllib3 and each module imported by the handler (cumulative),
+- clients: construction of the boto3 clients/resources and urllib3 pools at module load,
+- init I/O: AWS and HTTP calls made while the module loads, e.g. by init priming,
+- module code: the rest of the handler module body.
+
+    python tests/profile_cold_start.py
+    python tests/profile_cold_start.py ImmediateResponse --runs 10 --priming --io-latency-ms 20
+    python tests/profile_cold_start.py --output cold_start.json
+    python tests/profile_cold_start.py --baseline cold_start.json   # show the change of each figure
+
+The report of `--output` can be compared with later runs with `--baseline`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda")
+HANDLERS = ["ImmediateResponse", "AsyncWorker", "SyncWorker", "OAuth"]
+PRELOADED = ["boto3", "urllib3"]
+
+ENVIRONMENT = {
+    "AWS_REGION": "ap-southeast-2",
+    "AWS_DEFAULT_REGION": "ap-southeast-2",
+    "AWS_ACCESS_KEY_ID": "cold-start-profile",
+    "AWS_SECRET_ACCESS_KEY": "cold-start-profile",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "SlackAppId": "APROFILE01",
+    "SlackAppOwnerTeamId": "TPROFILE01",
+    "SlackTeamIds": "TPROFILE01",
+    "SlackChannelIds": "CPROFILE01",
+    "SlackVerificationTokenParameterKey": "/profile/verification_token",
+    "SlackSigningSecretParameterKey": "/profile/signing_secret",
+    "SlackAppClientIdParameterKey": "/profile/client_id",
+    "SlackAppClientSecretParameterKey": "/profile/client_secret",
+    "AsyncWorkerLambdaFunctionName": "Profile-AsyncWorker",
+    "SyncWorkerLambdaFunctionName": "Profile-SyncWorker",
+    "OAuthDynamoDBTable": "Profile-OAuth",
+    "EventDedupDynamoDBTable": "Profile-EventDedup",
+    "RateLimitDynamoDBTable": "Profile-RateLimit",
+    "AccessControlDynamoDBTable": "Profile-AccessControl",
+    "MetricsEnabled": "false",
+    "LogLevel": "WARNING",
+}
+
+
+class StubbedBody:
+    def __init__(self, data):
+        self.data = data
+
+    def stream(self, **kwargs):
+        yield self.data
+
+
+def profile_module(module, io_latency_ms):
+    """Import the handler in this interpreter and return the timings of the phases in ms"""
+    sys.path.insert(0, LAMBDA_DIR)
+    started_at = time.perf_counter()
+
+    import boto3
+    import urllib3
+    from botocore.awsrequest import AWSResponse
+
+    preload_ms = (time.perf_counter() - started_at) * 1000
+    clients, calls = [], []
+
+    def stub_send(request, event_name=None, **kwargs):
+        call_started_at = time.perf_counter()
+        time.sleep(io_latency_ms / 1000)
+        calls.append((event_name.split(".", 1)[1], call_started_at * 1000, time.perf_counter() * 1000))
+        return AWSResponse(request.url, 200, {}, StubbedBody(b"{}"))
+
+    # boto3 clients build their own urllib3 pools, which are part of the client construction
+    building = []
+
+    def timed_factory(factory, kind, events_of):
+        def create(service_name, *args, **kwargs):
+            created_at = time.perf_counter()
+            building.append(service_name)
+            try:
+                obj = factory(service_name, *args, **kwargs)
+            finally:
+                building.pop()
+            events_of(obj).register("before-send", stub_send)
+            clients.append((f"{kind}({service_name})", (time.perf_counter() - created_at) * 1000))
+            return obj
+
+        return create
+
+    boto3.client = timed_factory(boto3.client, "boto3.client", lambda c: c.meta.events)
+    boto3.resource = timed_factory(boto3.resource, "boto3.resource", lambda r: r.meta.client.meta.events)
+
+    pool_init = urllib3.PoolManager.__init__
+
+    def timed_pool_init(self, *args, **kwargs):
+        created_at = time.perf_counter()
+        pool_init(self, *args, **kwargs)
+        if not building:
+            clients.append(("urllib3.PoolManager", (time.perf_counter() - created_at) * 1000))
+
+    def stub_urlopen(self, method, url, *args, **kwargs):
+        call_started_at = time.perf_counter()
+        time.sleep(io_latency_ms / 1000)
+        host = urllib3.util.parse_url(url).host
+        calls.append((f"{method} {host}", call_started_at * 1000, time.perf_counter() * 1000))
+        return urllib3.HTTPResponse(body=b"{}", status=200, preload_content=True)
+
+    urllib3.PoolManager.__init__ = timed_pool_init
+    urllib3.PoolManager.urlopen = stub_urlopen
+
+    module_started_at = time.perf_counter()
+    __import__(module)
+    module_ms = (time.perf_counter() - module_started_at) * 1000
+
+    return {
+        "preload_ms": preload_ms,
+        "module_ms": module_ms,
+        "clients": clients,
+        "calls": calls,
+    }
+
+
+def parse_importtime(stderr, module):
+    """Cumulative ms of the preloaded packages and of the direct imports of the module, and its self ms"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((level, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+
+    imports = {name: cumulative for level, name, _, cumulative in entries if level == 0 and name in PRELOADED}
+    module_self_ms = 0.0
+    for i, (level, name, self_ms, _) in enumerate(entries):
+        if level == 0 and name == module:
+            module_self_ms = self_ms
+            # Imports are listed before their importer, nested one level deeper
+            for child_level, child, _, child_cumulative in reversed(entries[:i]):
+                if child_level <= level:
+                    break
+                if child_level == level + 1:
+                    imports[child] = child_cumulative
+    return imports, module_self_ms
+
+
+def wall_time_ms(intervals):
+    """Time covered by the (start, end) intervals; priming steps make their calls concurrently"""
+    total, covered_until = 0.0, None
+    for start, end in sorted(intervals):
+        if covered_until is not None and start < covered_until:
+            start = covered_until
+        if end > start:
+            total += end - start
+            covered_until = end if covered_until is None else max(covered_until, end)
+    return total
+
+
+def run_child(module, args):
+    env = {**os.environ, **ENVIRONMENT, "InitPriming": "true" if args.priming else "false"}
+    command = [
+        sys.executable,
+        "-X",
+        "importtime",
+        os.path.abspath(__file__),
+        "--child",
+        module,
+        "--io-latency-ms",
+        str(args.io_latency_ms),
+    ]
+    started_at = time.perf_counter()
+    proc = subprocess.run(command, env=env, capture_output=True, text=True, cwd=LAMBDA_DIR)
+    process_ms = (time.perf_counter() - started_at) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"Profiling {module} failed:\n{proc.stderr[-2000:]}")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    imports, module_self_ms = parse_importtime(proc.stderr, module)
+    clients_ms = sum(ms for _, ms in result["clients"])
+    io_ms = wall_time_ms([(start, end) for _, start, end in result["calls"]])
+    return {
+        "process_ms": process_ms,
+        "init_ms": result["preload_ms"] + result["module_ms"],
+        "imports_ms": sum(imports.values()),
+        "clients_ms": clients_ms,
+        "init_io_ms": io_ms,
+        "module_code_ms": max(0.0, module_self_ms - clients_ms - io_ms),
+        "imports": imports,
+        "clients": [name for name, _ in result["clients"]],
+        "init_io_calls": [name for name, *_ in result["calls"]],
+    }
+
+
+def profile(module, args):
+    """Median of the figures of `args.runs` fresh interpreters"""
+    runs = [run_child(module, args) for _ in range(args.runs)]
+    report = {
+        key: round(statistics.median(r[key] for r in runs), 2)
+        for key in ["process_ms", "init_ms", "imports_ms", "clients_ms", "init_io_ms", "module_code_ms"]
+    }
+    report["imports"] = {
+        name: round(statistics.median(r["imports"].get(name, 0.0) for r in runs), 2)
+        for name in sorted(runs[0]["imports"], key=lambda n: -runs[0]["imports"][n])
+    }
+    report["clients"] = runs[0]["clients"]
+    report["init_io_calls"] = runs[0]["init_io_calls"]
+    return report
+
+
+def delta(value, baseline):
+    if baseline is None:
+        return ""
+    return f" ({value - baseline:+.1f})"
+
+
+def print_report(reports, baselines, top):
+    for module, report in reports.items():
+        base = baselines.get(module, {})
+        print(f"{module}: INIT {report['init_ms']:.1f}ms{delta(report['init_ms'], base.get('init_ms'))}"
+              f", process {report['process_ms']:.1f}ms{delta(report['process_ms'], base.get('process_ms'))}")
+        for key, label in [
+            ("imports_ms", "imports"),
+            ("clients_ms", "clients"),
+            ("init_io_ms", "init I/O"),
+            ("module_code_ms", "module code"),
+        ]:
+            print(f"  {label}: {report[key]:.1f}ms{delta(report[key], base.get(key))}")
+        for name, ms in list(report["imports"].items())[:top]:
+            print(f"    import {name}: {ms:.1f}ms{delta(ms, base.get('imports', {}).get(name))}")
+        print(f"    clients: {', '.join(report['clients']) or '-'}")
+        print(f"    init I/O calls: {', '.join(report['init_io_calls']) or '-'}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", default=HANDLERS, help="handler modules, all by default")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--priming", action="store_true", help="profile with InitPriming=true")
+    parser.add_argument("--io-latency-ms", type=float, default=0.0, help="latency of each init-time call")
+    parser.add_argument("--top", type=int, default=8, help="imports to list per module")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--baseline", help="a report of --output to compare with")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(profile_module(args.child, args.io_latency_ms)))
+        return 0
+
+    reports = {module: profile(module, args) for module in args.modules}
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(reports, indent=2) + "\n")
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        baselines = {}
+        if args.baseline:
+            with open(args.baseline) as f:
+                baselines = json.load(f)
+        print_report(reports, baselines, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())